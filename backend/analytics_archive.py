@@ -0,0 +1,279 @@
+"""
+Retention for raw analytics events, with a compressed cold archive.
+
+Events older than ANALYTICS_RETENTION_DAYS are moved out of the `analytics`
+collection into gzip-compressed NDJSON files, partitioned by UTC day:
+
+    ANALYTICS_ARCHIVE_DIR/date=2026-01-15/part-<first event id>.ndjson.gz
+
+Each part holds up to ANALYTICS_ARCHIVE_PART_SIZE events of one day, in _id
+order, decoded to the API's event shape (see analytics_codec). Its events
+are first tagged with the part name (`archive_part`), then the part is
+written to a temp file, fsynced and renamed into place, and recorded in
+`analytics_archive_days` (one document per day, with the event count and
+weighted views of every part). Only then are the events carrying that tag
+deleted from Mongo, ANALYTICS_ARCHIVE_DELETE_BATCH at a time, so the job
+never holds a long write lock. Events that arrive later for the same day
+have no tag and go into a new part; nothing is deleted unless it was
+written. A run that dies half way is safe to repeat: a tagged part that was
+recorded is deleted, and one that was not is rewritten under the same name
+from the events carrying its tag.
+
+Nothing is archived while events in the original layout are still being
+converted (LegacyAnalyticsMigration): converted events land in old days,
+possibly ones already archived, and are picked up once the conversion is
+done.
+
+Only one worker runs the job at a time (a lease in `job_leases`), and
+within a worker a lock keeps the periodic run and a manual one apart. The
+admin re-queries the archive with GET /api/admin/analytics/archive/report
+and .../events; the day documents keep archived views in the all-time
+total of the analytics summary.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+from analytics_codec import decode_uuid, legacy_layout_converted
+from leases import Lease
+
+ANALYTICS_RETENTION_DAYS = int(os.environ.get("ANALYTICS_RETENTION_DAYS", 0))  # 0 = keep forever
+ANALYTICS_ARCHIVE_DIR = Path(os.environ.get("ANALYTICS_ARCHIVE_DIR", Path(__file__).parent / "analytics_archive"))
+ANALYTICS_ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ANALYTICS_ARCHIVE_INTERVAL_SECONDS", 6 * 3600))
+ANALYTICS_ARCHIVE_PART_SIZE = int(os.environ.get("ANALYTICS_ARCHIVE_PART_SIZE", 50000))
+ANALYTICS_ARCHIVE_DELETE_BATCH = int(os.environ.get("ANALYTICS_ARCHIVE_DELETE_BATCH", 1000))
+
+logger = logging.getLogger(__name__)
+
+
+def day_start(day: str) -> datetime:
+    return datetime.combine(datetime.strptime(day, "%Y-%m-%d").date(), time.min, tzinfo=timezone.utc)
+
+
+def day_query(day: str) -> dict:
+    """Events of one UTC day"""
+    start = day_start(day)
+    return {"t": {"$gte": start, "$lt": start + timedelta(days=1)}}
+
+
+def partition_dir(root: Path, day: str) -> Path:
+    return root / f"date={day}"
+
+
+def write_part(path: Path, events: list):
+    """Write events as gzip NDJSON; the file appears atomically and only once complete"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+            for event in events:
+                out.write(json.dumps(event, ensure_ascii=False, default=str).encode("utf-8"))
+                out.write(b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+
+
+def archived_days(root: Path, date_from: Optional[str] = None, date_to: Optional[str] = None) -> list:
+    days = []
+    if root.is_dir():
+        for entry in root.iterdir():
+            if entry.is_dir() and entry.name.startswith("date="):
+                day = entry.name[len("date="):]
+                if (not date_from or day >= date_from) and (not date_to or day <= date_to):
+                    days.append(day)
+    return sorted(days)
+
+
+def read_archive(root: Path, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                 section: Optional[str] = None) -> Iterator[dict]:
+    """Archived events of [date_from, date_to] (YYYY-MM-DD, inclusive), day by day; blocking"""
+    for day in archived_days(root, date_from, date_to):
+        for part in sorted(partition_dir(root, day).glob("part-*.ndjson.gz")):
+            with gzip.open(part, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    event = json.loads(line)
+                    if section is None or event.get("section") == section:
+                        yield event
+
+
+def summarize_events(events, limit_sections: int = 5) -> dict:
+    """Same shape as the live analytics summary, for any iterable of events"""
+    views = 0.0
+    visitors = set()
+    sections = {}
+    daily = {}
+    for event in events:
+        weight = event.get("weight", 1)
+        views += weight
+        visitors.add(event.get("visitor_id"))
+        if event.get("section") is not None:
+            sections[event["section"]] = sections.get(event["section"], 0) + weight
+        day = str(event.get("timestamp", ""))[:10]
+        daily[day] = daily.get(day, 0) + weight
+    popular = sorted(sections.items(), key=lambda item: -item[1])[:limit_sections]
+    return {
+        "total_views": round(views),
+        "unique_visitors": len(visitors),
+        "popular_sections": [{"section": s, "views": round(v)} for s, v in popular],
+        "daily_views": [{"date": d, "views": round(v)} for d, v in sorted(daily.items())],
+    }
+
+
+class AnalyticsArchiver:
+    def __init__(self, db, codec, root: Path = ANALYTICS_ARCHIVE_DIR,
+                 retention_days: int = ANALYTICS_RETENTION_DAYS,
+                 part_size: int = ANALYTICS_ARCHIVE_PART_SIZE,
+                 delete_batch: int = ANALYTICS_ARCHIVE_DELETE_BATCH):
+        self.db = db
+        self.codec = codec
+        self.root = root
+        self.retention_days = retention_days
+        self.part_size = part_size
+        self.delete_batch = delete_batch
+        # Renewed every run, so the worker that holds it keeps it until it stops
+        self.lease = Lease(db, "analytics_archive", ttl_seconds=2 * ANALYTICS_ARCHIVE_INTERVAL_SECONDS)
+        self._task = None
+        self._run_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    async def ensure_indexes(self):
+        await self.db.analytics.create_index("t")
+        # Only events of a part being archived carry the tag
+        await self.db.analytics.create_index(
+            "archive_part", partialFilterExpression={"archive_part": {"$exists": True}})
+
+    def cutoff_day(self, now: Optional[datetime] = None) -> str:
+        """Days before this one (UTC) are archived"""
+        now = now or datetime.now(timezone.utc)
+        return (now.date() - timedelta(days=self.retention_days)).isoformat()
+
+    async def _delete(self, query: dict) -> int:
+        deleted = 0
+        while True:
+            ids = [d["_id"] async for d in self.db.analytics.find(query, {"_id": 1}).limit(self.delete_batch)]
+            if not ids:
+                return deleted
+            result = await self.db.analytics.delete_many({"_id": {"$in": ids}})
+            deleted += result.deleted_count
+
+    async def _finish_part(self, day: str, name: str, stats: dict):
+        """Write (unless already recorded) and delete the events tagged with part `name`"""
+        record = await self.db.analytics_archive_days.find_one({"_id": day, f"parts.{name}": {"$exists": True}},
+                                                                {"_id": 1})
+        if record is None:
+            events = await self.db.analytics.find({"archive_part": name}).sort("_id", 1).to_list(None)
+            if events:
+                rows = [await self.codec.decode(event) for event in events]
+                await asyncio.to_thread(write_part, partition_dir(self.root, day) / f"{name}.ndjson.gz", rows)
+                await self.db.analytics_archive_days.update_one(
+                    {"_id": day},
+                    {"$set": {f"parts.{name}": {
+                        "first_id": events[0]["_id"], "last_id": events[-1]["_id"], "events": len(rows),
+                        "views": sum(row.get("weight", 1) for row in rows),
+                        "archived_at": datetime.now(timezone.utc),
+                    }}},
+                    upsert=True,
+                )
+                stats["archived"] += len(rows)
+                stats["parts"] += 1
+        stats["deleted"] += await self._delete({"archive_part": name})
+
+    async def archive_day(self, day: str) -> dict:
+        stats = {"day": day, "archived": 0, "deleted": 0, "parts": 0}
+        query = day_query(day)
+        while True:
+            # Left behind by a run that stopped between tagging a part and deleting it
+            pending = await self.db.analytics.find_one({**query, "archive_part": {"$exists": True}},
+                                                       {"archive_part": 1})
+            if pending is not None:
+                await self._finish_part(day, pending["archive_part"], stats)
+                continue
+            ids = [event["_id"] async for event in self.db.analytics.find(
+                {**query, "archive_part": {"$exists": False}}, {"_id": 1}).sort("_id", 1).limit(self.part_size)]
+            if not ids:
+                return stats
+            name = f"part-{decode_uuid(ids[0])}"
+            await self.db.analytics.update_many(
+                {"_id": {"$in": ids}, "archive_part": {"$exists": False}}, {"$set": {"archive_part": name}})
+            await self._finish_part(day, name, stats)
+
+    async def run(self, now: Optional[datetime] = None) -> dict:
+        """Archive every day before the retention cutoff; runs on this worker never overlap"""
+        async with self._run_lock:
+            return await self._run(now)
+
+    async def ready(self) -> bool:
+        return await legacy_layout_converted(self.db)
+
+    async def _run(self, now: Optional[datetime] = None) -> dict:
+        cutoff = self.cutoff_day(now)
+        summary = {"cutoff": cutoff, "days": []}
+        if not await self.ready():
+            logger.info("Analytics archive waits for the legacy event conversion to finish")
+            return summary
+        while True:
+            oldest = await self.db.analytics.find_one({"t": {"$lt": day_start(cutoff)}}, {"t": 1}, sort=[("t", 1)])
+            if oldest is None:
+                return summary
+            day = oldest["t"].strftime("%Y-%m-%d")
+            stats = await self.archive_day(day)
+            summary["days"].append(stats)
+            if stats["archived"] == 0 and stats["deleted"] == 0:
+                # Nothing matched the day's range; don't spin on it
+                logger.error(f"Analytics archive made no progress on {day}, stopping")
+                return summary
+
+    async def archived_views(self) -> float:
+        views = 0.0
+        async for record in self.db.analytics_archive_days.find({}, {"parts": 1}):
+            views += sum(part["views"] for part in record.get("parts", {}).values())
+        return views
+
+    async def partitions(self) -> list:
+        days = []
+        async for record in self.db.analytics_archive_days.find({}).sort("_id", 1):
+            parts = record.get("parts", {})
+            days.append({
+                "date": record["_id"],
+                "parts": len(parts),
+                "events": sum(p["events"] for p in parts.values()),
+                "views": round(sum(p["views"] for p in parts.values())),
+            })
+        return days
+
+    async def _run_periodically(self):
+        while True:
+            try:
+                if await self.lease.acquire():
+                    summary = await self.run()
+                    archived = sum(d["archived"] for d in summary["days"])
+                    if archived:
+                        logger.info(f"Archived {archived} analytics events before {summary['cutoff']}")
+            except Exception as e:
+                logger.error(f"Analytics archive run failed: {e}")
+            await asyncio.sleep(ANALYTICS_ARCHIVE_INTERVAL_SECONDS)
+
+    def start(self):
+        if self.retention_days > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.lease.release()
@@ -0,0 +1,287 @@
+"""
+Compact storage encoding for analytics events.
+
+The API speaks in events like
+    {"id": "<uuid>", "page": "/", "section": "services",
+     "visitor_id": "v_k3j9x8q2a", "timestamp": "2026-01-15T10:00:00+00:00"}
+but `analytics` stores them as
+    {"_id": BinData(4, <16 bytes>), "p": 1, "s": 3, "v": NumberLong(...), "t": ISODate(...)}
+
+- The event id is the _id, as a binary UUID. There is no ObjectId and no
+  second id field.
+- page and section are small integer codes. The code dictionary lives in
+  `analytics_dictionary` (kind, value, code), is cached in memory, and is
+  shared by all workers. Past ANALYTICS_MAX_DICTIONARY_CODES per kind, new
+  values are stored as plain strings so that free-text input can't grow the
+  dictionary forever. Once a worker sees the cap it stops looking unknown
+  values up, so a flood of new pages costs no extra round trips.
+- Visitor ids: a UUID becomes a binary UUID. The landing page's
+  "v_" + base36 ids become one 64-bit integer (a leading 1 digit keeps
+  leading zeros). Anything else stays a string.
+- The timestamp is a native date, `w` holds the sampling weight (omitted
+  when 1), and `synthetic` marks generated test data.
+
+AnalyticsCodec.encode/decode are the only places that know this layout.
+Routes, exports and the archive all work with API-shaped events.
+
+Reads only understand this layout. Events still in the original one (with a
+`timestamp` field) are converted by LegacyAnalyticsMigration, which the
+server starts when it finds any (one worker at a time, under a lease).
+Until it finishes, those events are missing from stats, exports and the
+archive, and a warning says how many are left. Once done it leaves a marker in
+`migrations`, so later startups skip the check. `compact_analytics.py
+migrate` does the same conversion from the command line.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from bson import Binary, Int64
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from leases import Lease
+
+ANALYTICS_MAX_DICTIONARY_CODES = int(os.environ.get("ANALYTICS_MAX_DICTIONARY_CODES", 1000))
+ANALYTICS_MIGRATION_BATCH_SIZE = int(os.environ.get("ANALYTICS_MIGRATION_BATCH_SIZE", 5000))
+
+LEGACY_FIELD = "timestamp"  # only documents in the original layout have it
+MIGRATION_MARKER = "analytics_compact"  # `migrations` document set once no legacy events are left
+
+logger = logging.getLogger(__name__)
+
+# 11 base36 digits plus the leading 1 still fit in a signed 64-bit integer
+COMPACT_VISITOR_ID = re.compile(r"v_[0-9a-z]{1,11}")
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def encode_uuid(value: str):
+    """Binary UUID for a canonical UUID string, so that decoding gives back the same string"""
+    try:
+        parsed = uuid.UUID(value)
+    except (ValueError, AttributeError, TypeError):
+        return value
+    return Binary.from_uuid(parsed) if str(parsed) == value else value
+
+
+def decode_uuid(value) -> str:
+    if isinstance(value, Binary) and value.subtype == 4:
+        return str(value.as_uuid())
+    return str(value)
+
+
+def encode_visitor_id(visitor_id: str):
+    if COMPACT_VISITOR_ID.fullmatch(visitor_id):
+        return Int64(int("1" + visitor_id[2:], 36))
+    return encode_uuid(visitor_id)
+
+
+def decode_visitor_id(value) -> str:
+    if isinstance(value, int):
+        digits = []
+        while value:
+            value, digit = divmod(value, 36)
+            digits.append(BASE36[digit])
+        return "v_" + "".join(reversed(digits))[1:]
+    return decode_uuid(value)
+
+
+def encode_timestamp(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def decode_timestamp(value: datetime) -> str:
+    # Motor hands back naive datetimes, which are UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+
+def encode_event(event: dict, page_code, section_code) -> dict:
+    """Storage document for an API-shaped event whose page/section codes are already known"""
+    doc = {
+        "_id": encode_uuid(event["id"]) if event.get("id") else Binary.from_uuid(uuid.uuid4()),
+        "p": page_code,
+        "v": encode_visitor_id(event["visitor_id"]),
+        "t": encode_timestamp(event["timestamp"]),
+    }
+    if section_code is not None:
+        doc["s"] = section_code
+    if event.get("weight", 1) != 1:
+        doc["w"] = event["weight"]
+    if event.get("synthetic"):
+        doc["synthetic"] = True
+    return doc
+
+
+class AnalyticsCodec:
+    KINDS = ("page", "section")
+
+    def __init__(self, db):
+        self.dictionary = db.analytics_dictionary
+        self.db = db
+        self.codes = {kind: {} for kind in self.KINDS}  # value -> code
+        self.values = {kind: {} for kind in self.KINDS}  # code -> value
+        self.full = {kind: False for kind in self.KINDS}  # cap reached: no more lookups
+
+    async def ensure_indexes(self):
+        await self.dictionary.create_index([("kind", 1), ("value", 1)], unique=True)
+
+    def _remember(self, entry: dict):
+        self.codes[entry["kind"]][entry["value"]] = entry["_id"]
+        self.values[entry["kind"]][entry["_id"]] = entry["value"]
+
+    async def load(self):
+        async for entry in self.dictionary.find({}):
+            self._remember(entry)
+
+    async def code_for(self, kind: str, value: str):
+        """Integer code for a value, assigning one if needed; the value itself once the dictionary is full"""
+        code = self.codes[kind].get(value)
+        if code is not None:
+            return code
+        if self.full[kind]:
+            return value
+        entry = await self.dictionary.find_one({"kind": kind, "value": value})
+        if entry is None:
+            if len(self.codes[kind]) >= ANALYTICS_MAX_DICTIONARY_CODES:
+                # Pick up codes other workers assigned, then stop looking values up
+                await self.load()
+                self.full[kind] = True
+                return self.codes[kind].get(value, value)
+            counter = await self.db.counters.find_one_and_update(
+                {"_id": "analytics_dictionary"}, {"$inc": {"value": 1}}, upsert=True,
+                return_document=ReturnDocument.AFTER)
+            entry = {"_id": counter["value"], "kind": kind, "value": value}
+            try:
+                await self.dictionary.insert_one(entry)
+            except DuplicateKeyError:
+                # Another worker assigned this value first; its code wins
+                entry = await self.dictionary.find_one({"kind": kind, "value": value})
+        self._remember(entry)
+        return entry["_id"]
+
+    async def value_for(self, kind: str, code) -> Optional[str]:
+        if not isinstance(code, int):
+            return code  # stored verbatim (None or beyond the dictionary cap)
+        value = self.values[kind].get(code)
+        if value is None:
+            entry = await self.dictionary.find_one({"_id": code})
+            if entry is None:
+                return None
+            self._remember(entry)
+            value = entry["value"]
+        return value
+
+    async def encode(self, event: dict) -> dict:
+        section = event.get("section")
+        return encode_event(
+            event,
+            await self.code_for("page", event["page"]),
+            await self.code_for("section", section) if section is not None else None,
+        )
+
+    async def decode(self, doc: dict) -> dict:
+        event = {
+            "id": decode_uuid(doc["_id"]),
+            "page": await self.value_for("page", doc.get("p")),
+            "section": await self.value_for("section", doc.get("s")),
+            "visitor_id": decode_visitor_id(doc["v"]),
+            "timestamp": decode_timestamp(doc["t"]),
+        }
+        if "w" in doc:
+            event["weight"] = doc["w"]
+        return event
+
+    async def decode_cursor(self, cursor):
+        async for doc in cursor:
+            yield await self.decode(doc)
+
+    async def decode_sections(self, codes: list) -> dict:
+        return {code: await self.value_for("section", code) for code in codes}
+
+
+async def legacy_layout_converted(db) -> bool:
+    """True once no events in the original layout are left (or there never were any)"""
+    return await db.migrations.find_one({"_id": MIGRATION_MARKER}, {"_id": 1}) is not None
+
+
+async def insert_ignoring_duplicates(collection, docs):
+    """Insert; documents already copied by an interrupted run are skipped"""
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+
+async def migrate_legacy_batch(db, codec: AnalyticsCodec, batch_size: int = ANALYTICS_MIGRATION_BATCH_SIZE) -> int:
+    """Convert up to batch_size events from the original layout; 0 when none are left"""
+    legacy = await db.analytics.find({LEGACY_FIELD: {"$exists": True}}).limit(batch_size).to_list(None)
+    if not legacy:
+        return 0
+    await insert_ignoring_duplicates(db.analytics, [await codec.encode(doc) for doc in legacy])
+    await db.analytics.delete_many({"_id": {"$in": [doc["_id"] for doc in legacy]}})
+    return len(legacy)
+
+
+class LegacyAnalyticsMigration:
+    """Converts events left in the original layout in the background"""
+
+    def __init__(self, db, codec: AnalyticsCodec, batch_size: int = ANALYTICS_MIGRATION_BATCH_SIZE):
+        self.db = db
+        self.codec = codec
+        self.batch_size = batch_size
+        self.lease = Lease(db, "analytics_migration", ttl_seconds=300)
+        self._task = None
+
+    async def _mark_done(self):
+        # Checked at startup instead of scanning `analytics` for a field that has no index
+        await self.db.migrations.update_one(
+            {"_id": MIGRATION_MARKER}, {"$set": {"done_at": datetime.now(timezone.utc)}}, upsert=True)
+
+    async def _run(self):
+        while True:
+            try:
+                if not await self.lease.acquire():
+                    await asyncio.sleep(60)  # another worker is migrating
+                    continue
+                migrated = await migrate_legacy_batch(self.db, self.codec, self.batch_size)
+                if not migrated:
+                    logger.info("Analytics events are all in the compact layout")
+                    await self._mark_done()
+                    await self.lease.release()
+                    return
+                await asyncio.sleep(0.1)  # leave room for live traffic
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Analytics migration failed: {e}")
+                await asyncio.sleep(60)
+
+    async def start(self):
+        """Start converting if any legacy events exist"""
+        if self._task is not None or await self.db.migrations.find_one({"_id": MIGRATION_MARKER}):
+            return
+        if await self.db.analytics.find_one({LEGACY_FIELD: {"$exists": True}}, {"_id": 1}) is None:
+            await self._mark_done()
+            return
+        pending = await self.db.analytics.count_documents({LEGACY_FIELD: {"$exists": True}})
+        logger.warning(f"{pending} analytics events are in the original layout and are not counted "
+                       "in stats, exports or the archive until converted; converting in the background")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.lease.release()
@@ -0,0 +1,162 @@
+"""
+Bot filtering and adaptive sampling for analytics events.
+
+Every POST /api/analytics/track goes through AnalyticsIngest.classify before
+anything is written:
+
+- Bots are dropped. An event counts as a bot if its User-Agent matches
+  BOT_USER_AGENT (crawlers, link previewers, uptime monitors, HTTP
+  libraries, headless browsers, or no User-Agent at all), or if its visitor
+  sent more than
+  ANALYTICS_MAX_EVENTS_PER_MINUTE events this minute. Dropped events only
+  increment in-memory counters. Those are flushed to `analytics_bot_counts`
+  (one document per UTC day) every ANALYTICS_COUNTER_FLUSH_SECONDS.
+- High-volume sections are sampled. ANALYTICS_SAMPLE_RATES fixes a rate per
+  section ("hero=0.25,services=0.5"). ANALYTICS_SECTION_BUDGET_PER_MINUTE
+  adapts the rate so that a section stores about that many events a minute,
+  based on the previous minute's traffic. A stored sampled event carries
+  `weight` = 1 / rate. Summing weights instead of counting documents gives
+  unbiased totals.
+- Sections in ANALYTICS_UNSAMPLED_SECTIONS (page_load by default, fired once
+  per visit) are never sampled, so unique visitor counts stay exact.
+
+Rate limits and budgets are tracked per worker.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from metrics import ANALYTICS_EVENTS
+
+ANALYTICS_BOT_FILTER_ENABLED = os.environ.get("ANALYTICS_BOT_FILTER_ENABLED", "true").lower() == "true"
+ANALYTICS_MAX_EVENTS_PER_MINUTE = int(os.environ.get("ANALYTICS_MAX_EVENTS_PER_MINUTE", 60))
+ANALYTICS_SECTION_BUDGET_PER_MINUTE = int(os.environ.get("ANALYTICS_SECTION_BUDGET_PER_MINUTE", 0))  # 0 = off
+ANALYTICS_UNSAMPLED_SECTIONS = {
+    s.strip() for s in os.environ.get("ANALYTICS_UNSAMPLED_SECTIONS", "page_load").split(",") if s.strip()
+}
+ANALYTICS_COUNTER_FLUSH_SECONDS = float(os.environ.get("ANALYTICS_COUNTER_FLUSH_SECONDS", 30))
+
+
+def parse_sample_rates(value: str) -> dict:
+    """"hero=0.25,services=0.5" -> {"hero": 0.25, "services": 0.5}"""
+    rates = {}
+    for part in value.split(","):
+        if "=" in part:
+            section, rate = part.split("=", 1)
+            rates[section.strip()] = min(max(float(rate), 0.001), 1.0)
+    return rates
+
+
+ANALYTICS_SAMPLE_RATES = parse_sample_rates(os.environ.get("ANALYTICS_SAMPLE_RATES", ""))
+
+BOT_USER_AGENT = re.compile(
+    r"(?<!cu)bot\b|crawl|spider|slurp|scrap|facebookexternalhit|facebookcatalog|embedly|"
+    r"whatsapp|telegram|skypeuripreview|bingpreview|google web preview|headless|phantomjs|lighthouse|"
+    # Uptime monitors by their own tokens; "monitor" alone also matches real browsers' extensions
+    r"pingdom|uptimerobot|uptime-kuma|statuscake|site24x7|newrelicpinger|datadogsynthetics|"
+    r"python-|curl/|wget/|go-http-client|okhttp|java/|axios/|node-fetch|libwww|httpclient",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_bot_user_agent(user_agent: Optional[str]) -> bool:
+    return not user_agent or BOT_USER_AGENT.search(user_agent) is not None
+
+
+class AnalyticsIngest:
+    def __init__(self, sample_rates: dict = ANALYTICS_SAMPLE_RATES,
+                 section_budget: int = ANALYTICS_SECTION_BUDGET_PER_MINUTE,
+                 max_events_per_visitor: int = ANALYTICS_MAX_EVENTS_PER_MINUTE,
+                 bot_filter: bool = ANALYTICS_BOT_FILTER_ENABLED):
+        self.sample_rates = sample_rates
+        self.section_budget = section_budget
+        self.max_events_per_visitor = max_events_per_visitor
+        self.bot_filter = bot_filter
+        self.bot_counts = Counter()  # (UTC date, reason) -> events not yet flushed
+        self._minute = None
+        self._visitor_counts = Counter()
+        self._section_counts = Counter()
+        self._previous_section_counts = Counter()
+        self._flush_task = None
+
+    def _roll_minute(self, minute: int):
+        if minute == self._minute:
+            return
+        consecutive = self._minute is not None and minute == self._minute + 1
+        self._previous_section_counts = self._section_counts if consecutive else Counter()
+        self._section_counts = Counter()
+        self._visitor_counts = Counter()
+        self._minute = minute
+
+    def sample_rate(self, section: Optional[str]) -> float:
+        if section in ANALYTICS_UNSAMPLED_SECTIONS:
+            return 1.0
+        rate = self.sample_rates.get(section, 1.0)
+        previous = self._previous_section_counts[section]
+        if self.section_budget and previous > self.section_budget:
+            rate = min(rate, self.section_budget / previous)
+        return rate
+
+    def classify(self, section: Optional[str], visitor_id: str, user_agent: Optional[str],
+                 now: Optional[float] = None) -> Tuple[str, float]:
+        """(outcome, weight): outcome is stored, sampled_out, bot_user_agent or bot_rate"""
+        self._roll_minute(int((now if now is not None else time.time()) // 60))
+        outcome, weight = "stored", 1.0
+        if self.bot_filter and is_bot_user_agent(user_agent):
+            outcome = "bot_user_agent"
+        else:
+            self._visitor_counts[visitor_id] += 1
+            if self.bot_filter and self._visitor_counts[visitor_id] > self.max_events_per_visitor:
+                outcome = "bot_rate"
+        if outcome == "stored":
+            self._section_counts[section] += 1
+            rate = self.sample_rate(section)
+            if rate < 1.0:
+                if random.random() < rate:
+                    weight = 1 / rate
+                else:
+                    outcome = "sampled_out"
+        else:
+            day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            self.bot_counts[(day, outcome[len("bot_"):])] += 1
+        ANALYTICS_EVENTS.labels(outcome).inc()
+        return outcome, weight
+
+    async def flush_bot_counts(self, db):
+        counts, self.bot_counts = self.bot_counts, Counter()
+        by_day = {}
+        for (day, reason), count in counts.items():
+            by_day.setdefault(day, {})[reason] = count
+        for day, increments in by_day.items():
+            try:
+                await db.analytics_bot_counts.update_one({"_id": day}, {"$inc": increments}, upsert=True)
+            except Exception as e:
+                logger.error(f"Failed to flush bot counts: {e}")
+                for reason, count in increments.items():
+                    self.bot_counts[(day, reason)] += count
+
+    async def _flush_periodically(self, db):
+        while True:
+            await asyncio.sleep(ANALYTICS_COUNTER_FLUSH_SECONDS)
+            await self.flush_bot_counts(db)
+
+    def start(self, db):
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_periodically(db))
+
+    async def stop(self, db):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush_bot_counts(db)
@@ -0,0 +1,237 @@
+"""
+Home service availability from per-day capacity bitmaps.
+
+Each day with at least one booking has a document in `slot_capacity`:
+
+    {_id: "2026-10-20", busy: [<int>, <int>, ...]}
+
+with one integer per slot in AVAILABILITY_SLOTS (the times offered by the
+booking form). Bit s of busy[i] is set while stylist s is taken at slot i.
+A booking holds one stylist for AVAILABILITY_SLOTS_PER_BOOKING consecutive
+slots (the service plus travel to the next client). Days without a document
+are entirely free.
+
+The bitmaps are maintained incrementally:
+- a new booking takes the lowest stylist free for its whole span,
+- cancelling a booking gives its stylist back,
+- reinstating a cancelled booking takes a stylist again.
+Taking and giving back are compare-and-swap updates on the slot words that
+were read. If another request changed them in between, the update matches
+nothing and is retried with fresh values, so two bookings can never take
+the same stylist. When no stylist is free the booking is a conflict:
+rejected when AVAILABILITY_ON_CONFLICT is "reject" (the default), or stored
+with `capacity_status: "conflict"` for the admin to resolve when it is
+"flag".
+
+The booking records what it holds (`capacity_status` held / released /
+conflict / untracked, `capacity_slot`, `capacity_slots`, `capacity_stylist`),
+so a status change releases exactly the slots that were taken, and only
+once, even if AVAILABILITY_SLOTS_PER_BOOKING changed in between. Bookings
+stored before `capacity_slots` existed release the current span. Bookings for times
+that are not on the slot grid, or already in the past, are untracked.
+Upcoming bookings made before tracking existed are backfilled once, by one
+worker under a lease, and a marker in `migrations` keeps later startups from
+scanning the bookings again.
+
+`GET /api/availability` reads one document per day in the range and counts
+free stylists per slot from a fixed number of words, so each day costs the
+same whatever its number of bookings.
+"""
+
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from booking_reminders import ACTIVE_BOOKING_STATUSES, BOOKING_TIMEZONE, parse_booking_start
+from leases import Lease
+
+AVAILABILITY_SLOTS = [slot.strip() for slot in os.environ.get(
+    "AVAILABILITY_SLOTS",
+    "9:00 AM,10:00 AM,11:00 AM,12:00 PM,1:00 PM,2:00 PM,3:00 PM,4:00 PM,5:00 PM",
+).split(",") if slot.strip()]
+# One bit per stylist in a 32-bit word
+AVAILABILITY_STYLISTS = min(31, max(1, int(os.environ.get("AVAILABILITY_STYLISTS", 2))))
+AVAILABILITY_SLOTS_PER_BOOKING = max(1, int(os.environ.get("AVAILABILITY_SLOTS_PER_BOOKING", 2)))
+AVAILABILITY_ON_CONFLICT = os.environ.get("AVAILABILITY_ON_CONFLICT", "reject").lower()
+AVAILABILITY_MAX_DAYS = int(os.environ.get("AVAILABILITY_MAX_DAYS", 62))
+
+ALL_STYLIST_BITS = (1 << 31) - 1
+# Any fixed day will do for comparing times of day
+REFERENCE_DAY = "2000-01-01"
+
+logger = logging.getLogger(__name__)
+
+
+def parse_day(value: str) -> Optional[date]:
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d").date()
+    except (ValueError, AttributeError):
+        return None
+
+
+class SlotCapacity:
+    def __init__(self, db, slots: list = AVAILABILITY_SLOTS, stylists: int = AVAILABILITY_STYLISTS,
+                 slots_per_booking: int = AVAILABILITY_SLOTS_PER_BOOKING):
+        self.capacity = db.slot_capacity
+        self.bookings = db.bookings
+        self.migrations = db.migrations
+        self.lease = Lease(db, "availability_backfill", ttl_seconds=300)
+        self.slots = slots
+        self.stylists = stylists
+        self.slots_per_booking = slots_per_booking
+        self.team = (1 << stylists) - 1
+        starts = [parse_booking_start(REFERENCE_DAY, slot) for slot in slots]
+        self._slot_index = {start: i for i, start in enumerate(starts) if start is not None}
+
+    def slot_for(self, preferred_time: str) -> Optional[int]:
+        """Index of the slot starting at preferred_time, or None if it is off the grid"""
+        return self._slot_index.get(parse_booking_start(REFERENCE_DAY, preferred_time))
+
+    def span(self, slot: int, slots: Optional[int] = None) -> range:
+        # A booking late in the day only holds the slots that are left
+        return range(slot, min(slot + (slots or self.slots_per_booking), len(self.slots)))
+
+    def _busy(self, doc: Optional[dict]) -> list:
+        busy = list(doc["busy"]) if doc else []
+        return busy + [0] * (len(self.slots) - len(busy))
+
+    async def _load(self, day: str) -> Optional[dict]:
+        doc = await self.capacity.find_one({"_id": day})
+        if doc is not None and len(doc["busy"]) < len(self.slots):
+            # Written before AVAILABILITY_SLOTS grew; the new slots start free
+            await self.capacity.update_one(
+                {"_id": day, "busy": {"$size": len(doc["busy"])}},
+                {"$push": {"busy": {"$each": [0] * (len(self.slots) - len(doc["busy"]))}}},
+            )
+            doc = await self.capacity.find_one({"_id": day})
+        return doc
+
+    def free_stylists(self, busy: list, slot: int) -> int:
+        """Bitmask of the stylists free for a whole booking starting at slot"""
+        taken = 0
+        for i in self.span(slot):
+            taken |= busy[i]
+        return self.team & ~taken
+
+    async def _compare_and_set(self, day: str, busy: list, span: range, update) -> bool:
+        words = {f"busy.{i}": busy[i] for i in span}
+        result = await self.capacity.update_one(
+            {"_id": day, **words},
+            {"$set": {key: update(value) for key, value in words.items()}},
+        )
+        return result.modified_count == 1
+
+    async def reserve(self, day: str, slot: int) -> Optional[int]:
+        """Take the lowest free stylist for a booking at slot; None if fully booked"""
+        while True:
+            doc = await self._load(day)
+            if doc is None:
+                try:
+                    await self.capacity.insert_one({"_id": day, "busy": [0] * len(self.slots)})
+                except DuplicateKeyError:
+                    pass
+                doc = await self._load(day)
+            busy = self._busy(doc)
+            free = self.free_stylists(busy, slot)
+            if not free:
+                return None
+            bit = free & -free
+            if await self._compare_and_set(day, busy, self.span(slot), lambda word: word | bit):
+                return bit.bit_length() - 1
+            # Someone else took or released a stylist in these slots; look again
+
+    async def release(self, day: str, slot: int, stylist: int, slots: Optional[int] = None):
+        """Give back the stylist taken for `slots` slots from slot (the current span if None)"""
+        bit = 1 << stylist
+        span = self.span(slot, slots)
+        while True:
+            doc = await self._load(day)
+            if doc is None:
+                return
+            if await self._compare_and_set(day, self._busy(doc), span,
+                                           lambda word: word & (ALL_STYLIST_BITS ^ bit)):
+                return
+
+    async def reserve_booking(self, preferred_date: str, preferred_time: str,
+                              now: Optional[datetime] = None) -> dict:
+        """Capacity fields for a booking that is (again) active"""
+        now = now or datetime.now(timezone.utc)
+        slot = self.slot_for(preferred_time)
+        start = parse_booking_start(preferred_date, preferred_time)
+        if slot is None or start is None or start <= now:
+            return {"capacity_status": "untracked"}
+        day = parse_day(preferred_date).isoformat()
+        stylist = await self.reserve(day, slot)
+        if stylist is None:
+            return {"capacity_status": "conflict", "capacity_slot": slot}
+        return {"capacity_status": "held", "capacity_slot": slot, "capacity_slots": len(self.span(slot)),
+                "capacity_stylist": stylist}
+
+    async def release_booking(self, booking: dict) -> bool:
+        """Give back the stylist a cancelled booking held; a no-op if it held none"""
+        claimed = await self.bookings.update_one(
+            {"id": booking["id"], "capacity_status": "held"},
+            {"$set": {"capacity_status": "released"}},
+        )
+        if not claimed.modified_count:
+            return False
+        await self.release(parse_day(booking["preferred_date"]).isoformat(), booking["capacity_slot"],
+                           booking["capacity_stylist"], booking.get("capacity_slots"))
+        return True
+
+    async def availability(self, first: date, last: date, now: Optional[datetime] = None) -> list:
+        """Free stylists per slot for every day from first to last"""
+        now = now or datetime.now(timezone.utc)
+        docs = {doc["_id"]: doc async for doc in self.capacity.find(
+            {"_id": {"$gte": first.isoformat(), "$lte": last.isoformat()}})}
+        days = []
+        for offset in range((last - first).days + 1):
+            day = (first + timedelta(days=offset)).isoformat()
+            busy = self._busy(docs.get(day))
+            slots = []
+            for i, label in enumerate(self.slots):
+                start = parse_booking_start(day, label)
+                free = 0 if start is None or start <= now else bin(self.free_stylists(busy, i)).count("1")
+                slots.append({"time": label, "available": free})
+            days.append({"date": day, "slots": slots})
+        return days
+
+    async def backfill(self, now: Optional[datetime] = None) -> int:
+        """Take capacity for upcoming bookings made before availability was tracked"""
+        if await self.migrations.find_one({"_id": "slot_capacity_backfill"}):
+            return 0
+        if not await self.lease.acquire():
+            return 0  # another worker is on it
+        now = now or datetime.now(timezone.utc)
+        today = now.astimezone(BOOKING_TIMEZONE).date().isoformat()
+        updated = 0
+        try:
+            # Checked again under the lease: the worker that held it may just have finished
+            if await self.migrations.find_one({"_id": "slot_capacity_backfill"}):
+                return 0
+            async for booking in self.bookings.find(
+                    {"capacity_status": {"$exists": False},
+                     "status": {"$in": list(ACTIVE_BOOKING_STATUSES)},
+                     "preferred_date": {"$gte": today}},
+                    {"_id": 0, "id": 1, "preferred_date": 1, "preferred_time": 1}).sort("created_at", 1):
+                # Existing bookings are never rejected; ones that don't fit are flagged
+                fields = await self.reserve_booking(booking["preferred_date"], booking["preferred_time"], now)
+                result = await self.bookings.update_one(
+                    {"id": booking["id"], "capacity_status": {"$exists": False}}, {"$set": fields})
+                if not result.modified_count and fields["capacity_status"] == "held":
+                    # Changed meanwhile (e.g. cancelled and tracked by the status update)
+                    await self.release(parse_day(booking["preferred_date"]).isoformat(), fields["capacity_slot"],
+                                       fields["capacity_stylist"], fields["capacity_slots"])
+                    continue
+                updated += 1
+            # Every booking created since has capacity fields; this scan is not needed again
+            await self.migrations.update_one(
+                {"_id": "slot_capacity_backfill"}, {"$set": {"done_at": now}}, upsert=True)
+        finally:
+            await self.lease.release()
+        if updated:
+            logger.info(f"Slot capacity backfilled for {updated} booking(s)")
+        return updated
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+BeautyBar609 Hot Path Microbenchmarks
+Times the CPU-bound helpers in server.py that run on every request (or on
+every login/booking), stores a baseline and flags regressions against it.
+
+Usage:
+    python benchmarks.py --save-baseline          # record benchmark_baseline.json
+    python benchmarks.py                          # compare against the baseline
+    python benchmarks.py --threshold 0.15 -k jwt  # stricter, only matching benchmarks
+
+Exits with status 1 if any benchmark is slower than baseline * (1 + threshold).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BACKEND_DIR / "benchmark_baseline.json"
+BCRYPT_COST_FACTORS = [4, 8, 10, 12]
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "beautybar609_bench")
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+
+def build_benchmarks():
+    """Return {name: zero-argument callable}; setup happens here, not in the timed call"""
+    token = server.create_token("3f1c2b9e-8d4a-4a57-9a0e-6c1d2f3e4b5a", "admin@beautybar609.com")
+    booking_payload = {
+        "name": "Amaka Okafor",
+        "phone": "0805 857-8131",
+        "email": "amaka@example.com",
+        "address": "12 Allen Avenue, Ikeja, Lagos",
+        "service": "Volume Lashes",
+        "preferred_date": "2026-03-14",
+        "preferred_time": "11:30",
+        "notes": "Second floor, blue gate"
+    }
+    booking = server.HomeBookingRequest(**booking_payload)
+    event_payload = {"page": "/", "section": "gallery", "visitor_id": "c0a8012e-7f3b-4d2a-9b1c-5e6f7a8b9c0d"}
+    price_table = server.PriceTable()
+    price_table.compile([
+        {"category": "NAILS", "service_type": "salon", "items": [
+            {"name": "Gel Extensions (Short)", "price": "₦15,000"},
+            {"name": "Gel Polish Only", "price": "₦8,000"},
+        ]},
+        {"category": "LASHES", "service_type": "salon", "items": [
+            {"name": "Volume Lashes", "price": "₦25,000"},
+            {"name": "Mega Volume", "price": "From ₦30,000"},
+        ]},
+    ])
+    promotion = {"id": "promo", "title": "Special Offer", "discount": "15% OFF"}
+    promotion_timeline = server.PromotionTimeline()
+    promotion_timeline.compile([
+        {"id": f"promo-{month}", "active": True, "discount": "10% OFF",
+         "starts_at": f"2026-{month:02d}-01T00:00:00+00:00", "ends_at": f"2026-{month:02d}-15T00:00:00+00:00"}
+        for month in range(1, 13)
+    ])
+    basket = [{"name": "Gel Polish Only", "quantity": 2}, {"name": "Volume Lashes"}, {"name": "Mega Volume"}]
+
+    benchmarks = {
+        "create_token": lambda: server.create_token("3f1c2b9e-8d4a-4a57-9a0e-6c1d2f3e4b5a", "admin@beautybar609.com"),
+        "jwt_decode": lambda: server.decode_token(token),
+        "normalize_phone_number[local]": lambda: server.normalize_phone_number("0805 857-8131"),
+        "normalize_phone_number[intl]": lambda: server.normalize_phone_number("+234 805 857 8131"),
+        "build_password_reset_email": lambda: server.build_password_reset_email(token, "Admin"),
+        "build_booking_notification_email": lambda: server.build_booking_notification_email(booking, True),
+        "validate_HomeBookingRequest": lambda: server.HomeBookingRequest.model_validate(booking_payload),
+        "validate_AnalyticsEvent": lambda: server.AnalyticsEvent.model_validate(event_payload),
+        "price_table_quote[3 items]": lambda: price_table.quote(basket, "salon", promotion),
+        "promotion_timeline_active_at[12 windows]": promotion_timeline.active_at,
+    }
+    for rounds in BCRYPT_COST_FACTORS:
+        hashed = server.hash_password("correct horse battery staple", rounds=rounds)
+        benchmarks[f"hash_password[rounds={rounds}]"] = (
+            lambda rounds=rounds: server.hash_password("correct horse battery staple", rounds=rounds)
+        )
+        benchmarks[f"verify_password[rounds={rounds}]"] = (
+            lambda hashed=hashed: server.verify_password("correct horse battery staple", hashed)
+        )
+    return benchmarks
+
+
+def time_benchmark(func, repeat=5, min_time=0.2):
+    """Per-call time in microseconds: the best and median of `repeat` timed batches"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # autorange targets 0.2s; scale so that each batch runs for at least min_time
+    number = max(1, int(number * min_time / 0.2))
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"min_us": round(min(runs), 3), "median_us": round(statistics.median(runs), 3), "calls": number}
+
+
+def compare(results, baseline, threshold):
+    """Return the benchmarks whose best time regressed beyond the threshold"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            result["change"] = None
+            continue
+        change = result["min_us"] / previous["min_us"] - 1
+        result["change"] = round(change, 4)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed batches per benchmark")
+    parser.add_argument("-k", dest="keyword", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--json", dest="json_path", help="Write this run's results to this file")
+    args = parser.parse_args()
+
+    benchmarks = build_benchmarks()
+    if args.keyword:
+        benchmarks = {k: v for k, v in benchmarks.items() if args.keyword in k}
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+
+    results = {}
+    for name, func in benchmarks.items():
+        results[name] = time_benchmark(func, repeat=args.repeat)
+    regressions = compare(results, baseline, args.threshold)
+
+    width = max(len(name) for name in results)
+    for name, result in results.items():
+        change = result.get("change")
+        change_text = "" if change is None else f"{change:+7.1%}"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<{width}}  {result['min_us']:12.3f} us  {change_text}{flag}")
+
+    run = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(run, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+SMS reminders the day before home bookings.
+
+When a booking is created, its preferred_date / preferred_time (as typed in
+the booking form, in BOOKING_TIMEZONE_OFFSET_HOURS local time) are parsed
+and `reminder_due_at` is set to BOOKING_REMINDER_LEAD_HOURS before the
+appointment, with `reminder_status: "pending"`. A partial index on pending
+due times makes "what is next?" a single index lookup.
+
+The scheduler does not poll the bookings. It looks up the next due
+reminder and sleeps until then. A booking created on this worker with an
+earlier due time wakes it early. Otherwise it wakes at least every
+BOOKING_REMINDER_LEASE_SECONDS / 3 to renew its lease. When it wakes, every
+reminder due within BOOKING_REMINDER_BATCH_WINDOW_SECONDS (up to
+BOOKING_REMINDER_BATCH_SIZE) is claimed with one update tagged with a
+claim id, and only the bookings carrying that id are sent (concurrently),
+with the results written back in one bulk write.
+
+Only the worker holding the `booking_reminders` lease dispatches; the others
+wait to take over. Reminders are sent at most once. A batch claimed by a
+worker that died mid-send is marked failed instead of being sent again.
+Bookings that were cancelled or completed by the time their reminder is
+due are skipped; reinstating one schedules its reminder again unless it was
+already sent.
+
+Bookings created before reminders existed are scheduled once, the first time
+a worker takes the lease, and a marker in `migrations` stops later workers
+from scanning the bookings for them again.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from leases import Lease
+
+BOOKING_REMINDERS_ENABLED = os.environ.get("BOOKING_REMINDERS_ENABLED", "true").lower() == "true"
+BOOKING_REMINDER_LEAD_HOURS = float(os.environ.get("BOOKING_REMINDER_LEAD_HOURS", 24))
+# Lagos (WAT) is UTC+1 all year
+BOOKING_TIMEZONE_OFFSET_HOURS = float(os.environ.get("BOOKING_TIMEZONE_OFFSET_HOURS", 1))
+BOOKING_REMINDER_BATCH_SIZE = int(os.environ.get("BOOKING_REMINDER_BATCH_SIZE", 20))
+BOOKING_REMINDER_BATCH_WINDOW_SECONDS = float(os.environ.get("BOOKING_REMINDER_BATCH_WINDOW_SECONDS", 60))
+BOOKING_REMINDER_RETRY_SECONDS = float(os.environ.get("BOOKING_REMINDER_RETRY_SECONDS", 15 * 60))
+BOOKING_REMINDER_MAX_ATTEMPTS = int(os.environ.get("BOOKING_REMINDER_MAX_ATTEMPTS", 3))
+BOOKING_REMINDER_LEASE_SECONDS = float(os.environ.get("BOOKING_REMINDER_LEASE_SECONDS", 90))
+
+BOOKING_TIMEZONE = timezone(timedelta(hours=BOOKING_TIMEZONE_OFFSET_HOURS))
+# "9:00 AM", "12:30 pm", "9 AM", "09:00", "17:30"
+TIME_PATTERN = re.compile(r"\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?\s*", re.IGNORECASE)
+ACTIVE_BOOKING_STATUSES = ("pending", "confirmed")
+
+logger = logging.getLogger(__name__)
+
+
+def parse_booking_start(preferred_date: str, preferred_time: str) -> Optional[datetime]:
+    """Appointment start in UTC, or None if the form values can't be read"""
+    try:
+        day = datetime.strptime(preferred_date.strip(), "%Y-%m-%d").date()
+    except (ValueError, AttributeError):
+        return None
+    match = TIME_PATTERN.fullmatch(preferred_time or "")
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower().replace(".", "")
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    local = datetime(day.year, day.month, day.day, hour, minute, tzinfo=BOOKING_TIMEZONE)
+    return local.astimezone(timezone.utc)
+
+
+def reminder_fields(preferred_date: str, preferred_time: str, now: Optional[datetime] = None) -> dict:
+    """Fields to store on a new booking"""
+    now = now or datetime.now(timezone.utc)
+    start = parse_booking_start(preferred_date, preferred_time)
+    if start is None:
+        return {"reminder_status": "unscheduled"}
+    if start <= now:
+        return {"reminder_status": "skipped"}
+    # Booked less than a lead time ahead: remind right away instead
+    return {"reminder_status": "pending",
+            "reminder_due_at": max(start - timedelta(hours=BOOKING_REMINDER_LEAD_HOURS), now)}
+
+
+def reinstated_reminder_fields(booking: dict, now: Optional[datetime] = None) -> dict:
+    """Fields to store when a cancelled or completed booking becomes active again"""
+    if booking.get("reminder_status") not in (None, "skipped", "unscheduled"):
+        return {}  # still scheduled, or it may already have gone out
+    return reminder_fields(booking.get("preferred_date"), booking.get("preferred_time"), now)
+
+
+def aware(value: datetime) -> datetime:
+    # Motor hands back naive datetimes, which are UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class BookingReminderScheduler:
+    def __init__(self, db, send, batch_size: int = BOOKING_REMINDER_BATCH_SIZE,
+                 batch_window: float = BOOKING_REMINDER_BATCH_WINDOW_SECONDS,
+                 lease_seconds: float = BOOKING_REMINDER_LEASE_SECONDS):
+        self.bookings = db.bookings
+        self.migrations = db.migrations
+        self.send = send  # blocking: send(booking) -> bool, run in a thread
+        self.batch_size = batch_size
+        self.batch_window = timedelta(seconds=batch_window)
+        self.lease = Lease(db, "booking_reminders", ttl_seconds=lease_seconds)
+        self.heartbeat = lease_seconds / 3
+        self.next_due = None
+        self._wake = asyncio.Event()
+        self._task = None
+
+    async def ensure_indexes(self):
+        await self.bookings.create_index(
+            "reminder_due_at", partialFilterExpression={"reminder_status": "pending"})
+
+    def notify(self, due_at: Optional[datetime]):
+        """A booking with a reminder was created; wake up if it is due before the current target"""
+        if due_at is not None and (self.next_due is None or due_at < self.next_due):
+            self._wake.set()
+
+    async def _sleep(self, seconds: float):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, seconds))
+        except asyncio.TimeoutError:
+            pass
+
+    async def recover(self):
+        """Fail batches claimed by a worker that died mid-send; their SMS may already be out"""
+        stale_before = datetime.now(timezone.utc) - self.lease.ttl
+        result = await self.bookings.update_many(
+            {"reminder_status": "sending", "reminder_claimed_at": {"$lt": stale_before}},
+            {"$set": {"reminder_status": "failed"}},
+        )
+        if result.modified_count:
+            logger.error(f"{result.modified_count} booking reminder(s) were interrupted mid-send, marked failed")
+
+    async def backfill(self, now: Optional[datetime] = None):
+        """Schedule reminders for bookings created before reminders existed"""
+        if await self.migrations.find_one({"_id": "booking_reminders_backfill"}):
+            return
+        now = now or datetime.now(timezone.utc)
+        updates = []
+        async for booking in self.bookings.find(
+                {"reminder_status": {"$exists": False}, "status": {"$in": list(ACTIVE_BOOKING_STATUSES)}},
+                {"_id": 1, "preferred_date": 1, "preferred_time": 1}):
+            fields = reminder_fields(booking.get("preferred_date"), booking.get("preferred_time"), now)
+            updates.append(UpdateOne({"_id": booking["_id"]}, {"$set": fields}))
+            if len(updates) >= 500:
+                await self.bookings.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            await self.bookings.bulk_write(updates, ordered=False)
+        # Every booking created since has reminder fields; this scan is not needed again
+        await self.migrations.update_one(
+            {"_id": "booking_reminders_backfill"}, {"$set": {"done_at": now}}, upsert=True)
+
+    async def dispatch_due(self, now: Optional[datetime] = None) -> dict:
+        """Send one batch of reminders due by now + the batch window"""
+        now = now or datetime.now(timezone.utc)
+        due = await self.bookings.find(
+            {"reminder_status": "pending", "reminder_due_at": {"$lte": now + self.batch_window}},
+            {"_id": 0, "id": 1},
+        ).sort("reminder_due_at", 1).limit(self.batch_size).to_list(None)
+        if not due:
+            return {"sent": 0, "failed": 0, "skipped": 0}
+        ids = [booking["id"] for booking in due]
+        claim = uuid.uuid4().hex
+        await self.bookings.update_many(
+            {"id": {"$in": ids}, "reminder_status": "pending"},
+            {"$set": {"reminder_status": "sending", "reminder_claimed_at": now, "reminder_claim": claim}},
+        )
+        # Only what this claim won: a booking cancelled, rescheduled or claimed
+        # by another worker since the find above is left alone
+        due = await self.bookings.find(
+            {"id": {"$in": ids}, "reminder_status": "sending", "reminder_claim": claim}, {"_id": 0},
+        ).to_list(None)
+        if not due:
+            return {"sent": 0, "failed": 0, "skipped": 0}
+
+        skipped, to_send = [], []
+        for booking in due:
+            start = parse_booking_start(booking.get("preferred_date"), booking.get("preferred_time"))
+            if booking.get("status") not in ACTIVE_BOOKING_STATUSES or start is None or start <= now:
+                skipped.append(booking)
+            else:
+                to_send.append(booking)
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.send, booking) for booking in to_send), return_exceptions=True)
+
+        updates = [UpdateOne({"id": b["id"]}, {"$set": {"reminder_status": "skipped"}}) for b in skipped]
+        counts = {"sent": 0, "failed": 0, "skipped": len(skipped)}
+        for booking, result in zip(to_send, results):
+            if result is True:
+                counts["sent"] += 1
+                updates.append(UpdateOne({"id": booking["id"]}, {"$set": {
+                    "reminder_status": "sent", "reminder_sent_at": datetime.now(timezone.utc)}}))
+                continue
+            if isinstance(result, Exception):
+                logger.error(f"Booking reminder for {booking['id']} failed: {result}")
+            attempts = booking.get("reminder_attempts", 0) + 1
+            if attempts < BOOKING_REMINDER_MAX_ATTEMPTS:
+                retry = {"reminder_status": "pending",
+                         "reminder_due_at": now + timedelta(seconds=BOOKING_REMINDER_RETRY_SECONDS)}
+            else:
+                counts["failed"] += 1
+                retry = {"reminder_status": "failed"}
+            updates.append(UpdateOne({"id": booking["id"]}, {"$set": {**retry, "reminder_attempts": attempts}}))
+        await self.bookings.bulk_write(updates, ordered=False)
+        return counts
+
+    async def _run(self):
+        leading = False
+        while True:
+            try:
+                if not await self.lease.acquire():
+                    leading = False
+                    await self._sleep(self.heartbeat)
+                    continue
+                if not leading:
+                    leading = True
+                    await self.recover()
+                    await self.backfill()
+                upcoming = await self.bookings.find_one(
+                    {"reminder_status": "pending"}, {"reminder_due_at": 1}, sort=[("reminder_due_at", 1)])
+                self.next_due = aware(upcoming["reminder_due_at"]) if upcoming else None
+                now = datetime.now(timezone.utc)
+                if self.next_due is not None and self.next_due <= now:
+                    counts = await self.dispatch_due(now)
+                    logger.info(f"Booking reminders: {counts}")
+                    continue
+                wait = (self.next_due - now).total_seconds() if self.next_due else self.heartbeat
+                await self._sleep(min(wait, self.heartbeat))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Booking reminder scheduler error: {e}")
+                await self._sleep(self.heartbeat)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.lease.release()
@@ -0,0 +1,143 @@
+"""
+In-memory cache for the public catalog (services, prices, testimonials,
+promotions, gallery) with cross-worker invalidation via MongoDB change streams.
+
+Every uvicorn worker keeps its own CatalogCache. Admin writes invalidate the
+local worker's cache directly; CatalogChangeWatcher tails a change stream on
+the catalog collections so the *other* workers drop their copies too. The
+watcher keeps the last resume token in memory only: a restarted process
+starts with an empty cache, so there is nothing to catch up on. When the
+stream drops it resumes from that token and misses nothing; only if there
+is no token yet, or it has expired from the oplog, is the whole cache
+dropped on (re)open.
+
+Change streams need a replica set. On a standalone mongod the watcher logs a
+warning and exits, and entries then expire after CATALOG_CACHE_FALLBACK_TTL
+seconds instead of CATALOG_CACHE_TTL.
+To try it locally, start a single-node replica set:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0"
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from pymongo.errors import OperationFailure
+
+CATALOG_CACHE_ENABLED = os.environ.get("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", 300))
+CATALOG_CACHE_FALLBACK_TTL = float(os.environ.get("CATALOG_CACHE_FALLBACK_TTL", 10))
+CATALOG_COLLECTIONS = ("services", "prices", "testimonials", "promotions", "gallery")
+
+# Server error codes meaning change streams can't work here / can't resume
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}  # standalone server, unrecognized stage
+RESUME_TOKEN_LOST = {260, 280, 286}  # InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    """Per-worker cache of catalog query results, keyed by (collection, key)"""
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, enabled: bool = CATALOG_CACHE_ENABLED):
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = {}
+        self._generations = dict.fromkeys(CATALOG_COLLECTIONS, 0)
+        self._listeners = []
+
+    async def get(self, collection: str, key, loader):
+        """Cached value, or the result of `await loader()` (which is then cached)"""
+        if not self.enabled:
+            return await loader()
+        entry = self._entries.get((collection, key))
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        generation = self._generations[collection]
+        value = await loader()
+        # Don't cache a result an invalidation raced with while it was loading
+        if self._generations[collection] == generation:
+            self._entries[(collection, key)] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, collection: str = None):
+        """Drop cached entries for one collection (or all) and notify listeners"""
+        collections = (collection,) if collection else CATALOG_COLLECTIONS
+        for name in collections:
+            self._generations[name] += 1
+        self._entries = {k: v for k, v in self._entries.items() if k[0] not in collections}
+        for name in collections:
+            for callback in self._listeners:
+                callback(name)
+
+    def add_listener(self, callback):
+        """Call `callback(collection)` whenever a collection is invalidated"""
+        self._listeners.append(callback)
+
+
+class CatalogChangeWatcher:
+    """Tails catalog changes and invalidates the local cache for every write"""
+
+    def __init__(self, db, cache: CatalogCache):
+        self.db = db
+        self.cache = cache
+        self.running = False
+        self._token = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": {"$in": list(CATALOG_COLLECTIONS)}},
+            {"operationType": {"$in": ["dropDatabase", "invalidate"]}},
+        ]}}]
+        backoff = 1
+        while True:
+            try:
+                async with self.db.watch(pipeline, resume_after=self._token) as stream:
+                    self.running = True
+                    backoff = 1
+                    if self._token is None:
+                        # Writes may have happened while no stream was open
+                        self.cache.invalidate()
+                    self._token = stream.resume_token
+                    async for change in stream:
+                        collection = change.get("ns", {}).get("coll")
+                        self.cache.invalidate(collection if collection in CATALOG_COLLECTIONS else None)
+                        self._token = stream.resume_token
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    # Other workers' writes can't be seen, so keep entries only briefly
+                    self.cache.ttl = min(self.cache.ttl, CATALOG_CACHE_FALLBACK_TTL)
+                    logger.warning("Change streams unavailable (not a replica set?); "
+                                   f"catalog cache falls back to a {self.cache.ttl:.0f}s TTL")
+                    self.running = False
+                    return
+                if e.code in RESUME_TOKEN_LOST:
+                    logger.warning("Catalog change stream resume token expired, starting fresh")
+                    self._token = None
+                else:
+                    logger.error(f"Catalog change stream failed: {e}")
+            except Exception as e:
+                # Keep retrying; until the stream is back, the TTL bounds staleness
+                logger.error(f"Catalog change stream failed: {e}")
+            self.running = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
@@ -0,0 +1,152 @@
+"""
+Delta sync for the admin catalog (services, prices, testimonials, promotions,
+gallery).
+
+Every catalog write takes the next value of a single counter
+(`counters._id == "catalog_revision"`) and stores it on the document as
+`revision`, next to `updated_at`. Deletes leave a tombstone in
+`catalog_tombstones` carrying the revision of the delete. A client that
+remembers the last revision it saw can then ask for only what changed:
+
+    GET /api/admin/changes?since=<revision>
+
+`since=0` (or a revision from before a database restore) returns a full
+snapshot; documents written before revisions existed only appear there.
+
+An update takes its revision only once it has matched a document (it is
+stamped right after the write), so a 404 doesn't use one up. Tombstones are
+kept for CATALOG_TOMBSTONE_TTL_DAYS. When older ones are pruned, the highest
+pruned revision is recorded, and a client asking for changes since before
+it gets a full snapshot, because some of its deletions are gone.
+
+A revision is taken before its write commits, so a later revision can be
+visible while an earlier one is not yet. Every write therefore runs inside
+catalog_write(), which leaves a marker in `catalog_writes` (with the counter
+value read before the revision was taken) until the write is done. The
+revision a client is told to resume from is never past the oldest marker,
+so a write still in flight is sent next time instead of being skipped.
+Markers of a worker that died mid-write stop counting after
+CATALOG_WRITE_TIMEOUT_SECONDS and are then removed by a TTL index.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from catalog_cache import CATALOG_COLLECTIONS
+
+CATALOG_TOMBSTONE_TTL_DAYS = float(os.environ.get("CATALOG_TOMBSTONE_TTL_DAYS", 30))
+CATALOG_WRITE_TIMEOUT_SECONDS = float(os.environ.get("CATALOG_WRITE_TIMEOUT_SECONDS", 60))
+
+REVISION_COUNTER = "catalog_revision"
+PRUNED_COUNTER = "catalog_tombstones_pruned"
+
+
+async def next_revision(db) -> dict:
+    """Fields to $set on a document being written: its new revision and updated_at
+
+    Only call it inside catalog_write(), which keeps the revision from being
+    overtaken while the write is in flight.
+    """
+    counter = await db.counters.find_one_and_update(
+        {"_id": REVISION_COUNTER},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return {"revision": counter["value"], "updated_at": datetime.now(timezone.utc).isoformat()}
+
+
+async def _counter(db, name: str) -> int:
+    counter = await db.counters.find_one({"_id": name})
+    return counter["value"] if counter else 0
+
+
+async def current_revision(db) -> int:
+    return await _counter(db, REVISION_COUNTER)
+
+
+@asynccontextmanager
+async def catalog_write(db):
+    """Yields the revision fields for a write done inside the block"""
+    # Read before the revision is taken, so the revision is always above it
+    floor = await current_revision(db)
+    marker = await db.catalog_writes.insert_one({"floor": floor, "started_at": datetime.now(timezone.utc)})
+    try:
+        yield await next_revision(db)
+    finally:
+        await db.catalog_writes.delete_one({"_id": marker.inserted_id})
+
+
+async def update_with_revision(collection, query: dict, fields: dict) -> bool:
+    """$set fields on the matching document and stamp it; False if none matched"""
+    result = await collection.update_one(query, {"$set": fields})
+    if result.matched_count == 0:
+        return False
+    async with catalog_write(collection.database) as stamp:
+        await collection.update_one(query, {"$set": stamp})
+    return True
+
+
+async def committed_revision(db) -> int:
+    """Highest revision below which every write is visible"""
+    # Counter first: a write with a revision up to it has its marker in place by now,
+    # or is already done
+    revision = await current_revision(db)
+    live_after = datetime.now(timezone.utc) - timedelta(seconds=CATALOG_WRITE_TIMEOUT_SECONDS)
+    oldest = await db.catalog_writes.find_one({"started_at": {"$gte": live_after}}, sort=[("floor", 1)])
+    return min(revision, oldest["floor"]) if oldest else revision
+
+
+async def ensure_indexes(db):
+    await db.catalog_tombstones.create_index("deleted_at")
+    await db.catalog_tombstones.create_index("revision")
+    await db.catalog_writes.create_index("floor")
+    await db.catalog_writes.create_index("started_at", expireAfterSeconds=int(CATALOG_WRITE_TIMEOUT_SECONDS))
+
+
+async def prune_tombstones(db, now: datetime = None):
+    """Drop tombstones older than CATALOG_TOMBSTONE_TTL_DAYS"""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=CATALOG_TOMBSTONE_TTL_DAYS)
+    newest = await db.catalog_tombstones.find_one({"deleted_at": {"$lt": cutoff}}, sort=[("revision", -1)])
+    if newest is None:
+        return
+    # Recorded first, so clients are sent a full snapshot before anything is lost
+    await db.counters.update_one({"_id": PRUNED_COUNTER}, {"$max": {"value": newest["revision"]}}, upsert=True)
+    await db.catalog_tombstones.delete_many({"revision": {"$lte": newest["revision"]}})
+
+
+async def record_deletion(db, collection: str, doc_id: str):
+    async with catalog_write(db) as stamp:
+        await db.catalog_tombstones.insert_one({
+            "collection": collection, "id": doc_id, "deleted_at": datetime.now(timezone.utc), **stamp
+        })
+    await prune_tombstones(db)
+
+
+async def changes_since(db, since: int = 0, collections=CATALOG_COLLECTIONS) -> dict:
+    """Documents written and ids deleted after `since`, per collection"""
+    # Read before the documents: anything written meanwhile is sent again next time
+    latest = await current_revision(db)
+    revision = await committed_revision(db)
+    full = since <= 0 or since > latest or since < await _counter(db, PRUNED_COUNTER)
+    if not full:
+        # A write that started before `since` was handed out is above it anyway
+        revision = max(revision, since)
+    query = {} if full else {"revision": {"$gt": since}}
+
+    changes = {}
+    for name in collections:
+        changes[name] = await db[name].find(query, {"_id": 0}).sort("revision", 1).to_list(None)
+
+    deleted = {name: [] for name in collections}
+    if not full:
+        tombstones = db.catalog_tombstones.find(
+            {"revision": {"$gt": since}, "collection": {"$in": list(collections)}}, {"_id": 0}
+        )
+        async for tombstone in tombstones:
+            deleted[tombstone["collection"]].append(tombstone["id"])
+
+    return {"revision": revision, "full": full, "changes": changes, "deleted": deleted}
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+BeautyBar609 Analytics Compaction
+Converts analytics events stored in the original layout (string id, page,
+section, visitor_id and ISO timestamp) to the compact layout described in
+analytics_codec.py, and measures how much each layout takes on disk.
+
+Usage:
+    python compact_analytics.py migrate [--batch-size 5000]
+    python compact_analytics.py measure [--events 200000] [--json sizes.json]
+
+`migrate` is safe to interrupt and re-run. `measure` writes the same
+synthetic events in both layouts to two scratch collections, prints
+collStats for each and drops them again. Reads MONGO_URL and DB_NAME from
+the environment / backend/.env.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from analytics_codec import LEGACY_FIELD, AnalyticsCodec, migrate_legacy_batch  # noqa: E402
+from generate_synthetic_data import Generator  # noqa: E402
+
+
+async def migrate(db, batch_size):
+    codec = AnalyticsCodec(db)
+    await codec.ensure_indexes()
+    await codec.load()
+    total = await db.analytics.count_documents({LEGACY_FIELD: {"$exists": True}})
+    migrated = 0
+    start = time.perf_counter()
+    while True:
+        batch = await migrate_legacy_batch(db, codec, batch_size)
+        if not batch:
+            break
+        migrated += batch
+        rate = migrated / (time.perf_counter() - start)
+        print(f"\r  analytics: {migrated:,}/{total:,} ({rate:,.0f} docs/s)", end="", flush=True)
+    print()
+
+    await db.analytics.create_index("t")
+    indexes = await db.analytics.index_information()
+    if "timestamp_1" in indexes:
+        await db.analytics.drop_index("timestamp_1")
+    return {"migrated": migrated, "seconds": round(time.perf_counter() - start, 2)}
+
+
+async def collection_sizes(db, name):
+    stats = await db.command("collStats", name)
+    return {
+        "documents": stats["count"],
+        "avg_document_bytes": stats.get("avgObjSize", 0),
+        "data_bytes": stats["size"],
+        "storage_bytes": stats["storageSize"],
+        "index_bytes": stats["totalIndexSize"],
+        "index_sizes": stats["indexSizes"],
+    }
+
+
+async def measure(db, events, seed):
+    codec = AnalyticsCodec(db)
+    await codec.ensure_indexes()
+    generator = Generator(random.Random(seed), 6, datetime.now(timezone.utc))
+    visitors = generator.visitor_ids(max(1, events // 6))
+    legacy, compact = db.analytics_measure_legacy, db.analytics_measure_compact
+    await legacy.drop()
+    await compact.drop()
+    try:
+        for batch in generator.analytics(events, visitors, 10_000):
+            rows = [{k: v for k, v in event.items() if k != "synthetic"} for event in batch]
+            await legacy.insert_many([dict(row) for row in rows])
+            await compact.insert_many([await codec.encode(row) for row in rows])
+        # The same secondary index each layout needs for time-range queries
+        await legacy.create_index("timestamp")
+        await compact.create_index("t")
+        sizes = {
+            "legacy": await collection_sizes(db, legacy.name),
+            "compact": await collection_sizes(db, compact.name),
+        }
+    finally:
+        await legacy.drop()
+        await compact.drop()
+
+    for key in ("avg_document_bytes", "data_bytes", "storage_bytes", "index_bytes"):
+        before, after = sizes["legacy"][key], sizes["compact"][key]
+        ratio = f"{before / after:.2f}x" if after else "-"
+        print(f"  {key:<20} {before:>14,} -> {after:>14,}  ({ratio} smaller)")
+    return sizes
+
+
+async def run(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.command == "migrate":
+            return await migrate(db, args.batch_size)
+        return await measure(db, args.events, args.seed)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["migrate", "measure"])
+    parser.add_argument("--batch-size", type=int, default=5_000, help="Events converted per round trip")
+    parser.add_argument("--events", type=int, default=200_000, help="Synthetic events to measure with")
+    parser.add_argument("--seed", type=int, default=609)
+    parser.add_argument("--json", dest="json_path", help="Write the result to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Email rendering and batched admin booking digests.
+
+Email bodies are Jinja2 templates in email_templates/, compiled on first use
+and cached for the life of the process. Autoescaping is on, so names, notes
+and addresses typed by clients can't inject markup into the admin's inbox.
+
+With BOOKING_DIGEST_ENABLED, new-booking notifications are collected for
+BOOKING_DIGEST_WINDOW_SECONDS (or until BOOKING_DIGEST_MAX_BOOKINGS pile up)
+and the admin gets one summary email instead of one email per booking. The
+queue is per worker and in memory. It is flushed on shutdown, and the
+bookings themselves are always in Mongo, so a crash only loses the email.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+TEMPLATE_DIR = Path(__file__).parent / "email_templates"
+
+BOOKING_DIGEST_ENABLED = os.environ.get("BOOKING_DIGEST_ENABLED", "false").lower() == "true"
+BOOKING_DIGEST_WINDOW_SECONDS = float(os.environ.get("BOOKING_DIGEST_WINDOW_SECONDS", 300))
+BOOKING_DIGEST_MAX_BOOKINGS = int(os.environ.get("BOOKING_DIGEST_MAX_BOOKINGS", 50))
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(name: str):
+    """Compiled template; jinja2 is imported on the first call"""
+    from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+    environment = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        auto_reload=False,
+        undefined=StrictUndefined,
+    )
+    return environment.get_template(name)
+
+
+def render_email(name: str, **context) -> str:
+    return get_template(name).render(**context)
+
+
+class BookingDigest:
+    """Collects booking notifications and hands them to `send` in batches"""
+
+    def __init__(self, send, window: float = BOOKING_DIGEST_WINDOW_SECONDS,
+                 max_bookings: int = BOOKING_DIGEST_MAX_BOOKINGS):
+        self.send = send  # blocking: send(bookings) -> bool, run in a thread
+        self.window = window
+        self.max_bookings = max_bookings
+        self.pending = []
+        self._timer = None
+
+    def add(self, booking: dict):
+        self.pending.append({**booking, "received_at": datetime.now(timezone.utc)})
+        if len(self.pending) >= self.max_bookings:
+            asyncio.get_running_loop().create_task(self.flush())
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Send everything collected so far as one email"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        bookings, self.pending = self.pending, []
+        if not bookings:
+            return
+        try:
+            sent = await asyncio.to_thread(self.send, bookings)
+        except Exception as e:
+            logger.error(f"Failed to send booking digest: {e}")
+            sent = False
+        if not sent:
+            logger.error(f"Booking digest with {len(bookings)} booking(s) was not sent")
@@ -0,0 +1,87 @@
+"""
+Streaming CSV / NDJSON exports for the BeautyBar609 admin.
+
+Rows are read from a Motor cursor and encoded in small chunks, optionally
+gzip-compressed on the fly, so exporting millions of documents uses constant
+memory regardless of the result size.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time, timezone
+from typing import Optional
+
+BOOKING_EXPORT_FIELDS = [
+    "id", "created_at", "status", "booking_type", "name", "phone", "email", "address",
+    "service", "preferred_date", "preferred_time", "notes", "sms_sent",
+]
+ANALYTICS_EXPORT_FIELDS = ["id", "timestamp", "page", "section", "visitor_id"]
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_BATCH_SIZE = 1000
+# Flush to the client roughly every 64 KiB of encoded rows
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_export_date(value: Optional[str], end_of_day: bool = False) -> Optional[str]:
+    """Accept YYYY-MM-DD or an ISO datetime; return the ISO string stored in Mongo (UTC)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if len(value) == 10 and end_of_day:
+        parsed = datetime.combine(parsed.date(), time.max)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def date_range_query(field: str, date_from: Optional[str], date_to: Optional[str],
+                     native_dates: bool = False) -> dict:
+    """Filter on an ISO timestamp field (UTC ISO strings sort chronologically), or a date field"""
+    bounds = {}
+    if date_from:
+        bounds["$gte"] = parse_export_date(date_from)
+    if date_to:
+        bounds["$lte"] = parse_export_date(date_to, end_of_day=True)
+    if native_dates:
+        bounds = {op: datetime.fromisoformat(value) for op, value in bounds.items()}
+    return {field: bounds} if bounds else {}
+
+
+def export_filename(name: str, fmt: str, compress: bool) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    return f"{name}-{stamp}.{fmt}" + (".gz" if compress else "")
+
+
+async def stream_export(cursor, fields, fmt: str, compress: bool = False):
+    """Yield encoded chunks for every document of an async cursor"""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore") if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    def drain():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    async for doc in cursor:
+        if writer:
+            writer.writerow(doc)
+        else:
+            buffer.write(json.dumps({f: doc.get(f) for f in fields}, ensure_ascii=False, default=str))
+            buffer.write("\n")
+        if buffer.tell() >= CHUNK_SIZE:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+"""
+BeautyBar609 Synthetic Data Generator
+Fills a (local!) MongoDB with production-scale data for benchmarks and load
+tests: analytics visits with realistic visitor/section/time distributions,
+home bookings across statuses, and a large gallery. Documents use the same
+schema the API writes and are tagged with `synthetic: true`:
+- bookings carry the reminder fields a new booking gets (booking_reminders),
+  and `capacity_status: "untracked"`, so they never fill real availability;
+- gallery images are stamped with one catalog revision for the whole run
+  (catalog_sync), so admin clients pick them up with their next delta.
+Phone numbers start with 0000, which is not an assignable Nigerian prefix,
+so a reminder or status SMS for a synthetic booking can't reach anyone.
+
+Usage:
+    python generate_synthetic_data.py --analytics 2000000 --bookings 300000 --gallery 5000
+    python generate_synthetic_data.py --purge     # remove all synthetic documents
+
+Reads MONGO_URL and DB_NAME from the environment / backend/.env.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from analytics_codec import AnalyticsCodec, encode_event  # noqa: E402
+from booking_reminders import reminder_fields  # noqa: E402
+from catalog_sync import catalog_write  # noqa: E402
+
+# Sections tracked by the landing page (frontend/src/App.js) in page order,
+# with the share of all visits that scroll far enough to fire each one
+SECTION_FUNNEL = [
+    ("page_load", 1.0), ("hero", 0.95), ("services", 0.7), ("gallery", 0.5),
+    ("reviews", 0.4), ("prices", 0.35), ("contact", 0.25),
+]
+PAGES = [("/", 0.92), ("/admin", 0.03), ("/?utm_source=instagram", 0.05)]
+
+# Local (Africa/Lagos, UTC+1) hour-of-day and day-of-week traffic shapes
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 10, 11, 11, 10, 10, 11, 12, 14, 15, 14, 10, 6, 3]
+WEEKDAY_WEIGHTS = [0.9, 0.9, 0.95, 1.0, 1.15, 1.35, 1.1]  # Monday first
+LAGOS_OFFSET = timedelta(hours=1)
+
+FIRST_NAMES = ["Amaka", "Blessing", "Chidinma", "Damilola", "Favour", "Funke", "Ngozi", "Temi", "Zainab",
+               "Kemi", "Ada", "Ifeoma", "Yetunde", "Bisola", "Tolu", "Halima", "Uche", "Joy", "Esther", "Aisha"]
+LAST_NAMES = ["O.", "A.", "E.", "F.", "N.", "Adeyemi", "Okafor", "Balogun", "Eze", "Bello", "Okon", "Lawal"]
+AREAS = ["Ikeja", "Lekki Phase 1", "Ajah", "Yaba", "Surulere", "Victoria Island", "Ikoyi", "Gbagada",
+         "Magodo", "Abule Egba", "Ogba", "Ikorodu", "Festac", "Maryland", "Agege", "Egbeda"]
+STREETS = ["Allen Avenue", "Admiralty Way", "Herbert Macaulay Way", "Adeniran Ogunsanya Street",
+           "Agbe Road", "Awolowo Road", "Opebi Road", "Isaac John Street", "Ogunlana Drive", "Bode Thomas Street"]
+SERVICES = ["Gel Extensions (Short)", "Gel Extensions (Medium)", "Gel Extensions (Long)", "Acrylic Full Set",
+            "Gel Polish Only", "Classic Lashes", "Volume Lashes", "Mega Volume", "Lash Lift & Tint",
+            "Brow Lamination", "Brow Tint", "Microblading", "Microshading"]
+SERVICE_WEIGHTS = [8, 10, 6, 7, 9, 12, 14, 6, 5, 8, 4, 3, 2]
+TIMES = ["09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00", "18:00"]
+GALLERY_PHOTOS = ["1594461287652-10b41090cf91", "1516691475576-56cf13710ae9", "1755274556345-949613163335",
+                  "1750598243589-1cc3770356b8", "1740484674184-77a7629506a5", "1672334115165-f82b6b5e8bee"]
+GALLERY_CAPTIONS = ["Nail Art", "Lash Extensions", "Brow Work", "Gel Nails", "Beauty Work", "Lashes"]
+
+
+class Generator:
+    def __init__(self, rng: random.Random, months: int, now: datetime):
+        self.rng = rng
+        self.now = now.replace(minute=0, second=0, microsecond=0)
+        self.start = self.now - timedelta(days=30 * months)
+        self.hours = []
+        weights = []
+        total_hours = int((self.now - self.start).total_seconds() // 3600)
+        for i in range(total_hours):
+            hour = self.start + timedelta(hours=i)
+            local = hour + LAGOS_OFFSET
+            growth = 1 + i / total_hours  # traffic roughly doubles over the period
+            weights.append(HOUR_WEIGHTS[local.hour] * WEEKDAY_WEIGHTS[local.weekday()] * growth)
+            self.hours.append(hour)
+        self.hour_cum_weights = []
+        running = 0
+        for w in weights:
+            running += w
+            self.hour_cum_weights.append(running)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def random_times(self, k):
+        hours = self.rng.choices(self.hours, cum_weights=self.hour_cum_weights, k=k)
+        return [h + timedelta(seconds=self.rng.random() * 3600) for h in hours]
+
+    def visitor_ids(self, count):
+        return [self.uuid() for _ in range(count)]
+
+    def analytics(self, total, visitors, batch_size):
+        """Yield batches of API-shaped events, grouped into visits fired a few seconds apart"""
+        # Power-law visitor activity: a few regulars, a long tail of one-off visits
+        visitor_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(visitors))]
+        pages, page_weights = zip(*PAGES)
+        batch = []
+        produced = 0
+        while produced < total:
+            n_visits = min(10000, max(1, (total - produced) // 4))
+            starts = self.random_times(n_visits)
+            who = self.rng.choices(visitors, weights=visitor_weights, k=n_visits)
+            for visit_start, visitor_id in zip(starts, who):
+                page = self.rng.choices(pages, weights=page_weights)[0]
+                at = visit_start
+                previous_share = 1.0
+                for section, share in SECTION_FUNNEL:
+                    if produced >= total or self.rng.random() > share / previous_share:
+                        break
+                    previous_share = share
+                    batch.append({
+                        "id": self.uuid(),
+                        "page": page,
+                        "section": section,
+                        "visitor_id": visitor_id,
+                        "timestamp": at.isoformat(),
+                        "synthetic": True,
+                    })
+                    produced += 1
+                    at += timedelta(seconds=self.rng.expovariate(1 / 8))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+        if batch:
+            yield batch
+
+    def booking_status(self, preferred: datetime) -> str:
+        if preferred < self.now:
+            return self.rng.choices(["completed", "cancelled", "confirmed", "pending"], weights=[70, 15, 10, 5])[0]
+        return self.rng.choices(["pending", "confirmed", "cancelled"], weights=[50, 45, 5])[0]
+
+    def bookings(self, total, batch_size):
+        produced = 0
+        while produced < total:
+            n = min(batch_size, total - produced)
+            batch = []
+            for created in self.random_times(n):
+                preferred = created + timedelta(days=self.rng.randint(1, 14))
+                name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+                time_of_day = self.rng.choice(TIMES)
+                batch.append({
+                    "id": self.uuid(),
+                    "name": name,
+                    "phone": f"0000{self.rng.randint(0, 9999999):07d}",
+                    "email": f"{name.split()[0].lower()}{self.rng.randint(1, 9999)}@example.com"
+                    if self.rng.random() < 0.6 else None,
+                    "address": f"{self.rng.randint(1, 200)} {self.rng.choice(STREETS)}, "
+                               f"{self.rng.choice(AREAS)}, Lagos",
+                    "service": self.rng.choices(SERVICES, weights=SERVICE_WEIGHTS)[0],
+                    "preferred_date": preferred.strftime("%Y-%m-%d"),
+                    "preferred_time": time_of_day,
+                    "notes": "",
+                    "status": self.booking_status(preferred),
+                    "booking_type": "home",
+                    "sms_sent": self.rng.random() < 0.8,
+                    "created_at": created.isoformat(),
+                    **reminder_fields(preferred.strftime("%Y-%m-%d"), time_of_day, self.now),
+                    "capacity_status": "untracked",
+                    "synthetic": True,
+                })
+            produced += n
+            yield batch
+
+    def gallery(self, total, batch_size, first_order):
+        produced = 0
+        while produced < total:
+            n = min(batch_size, total - produced)
+            batch = []
+            for i, created in enumerate(self.random_times(n)):
+                photo = self.rng.randrange(len(GALLERY_PHOTOS))
+                batch.append({
+                    "id": self.uuid(),
+                    "url": f"https://images.unsplash.com/photo-{GALLERY_PHOTOS[photo]}"
+                           f"?q=85&w=600&auto=format&fit=crop&sig={produced + i}",
+                    "caption": f"{GALLERY_CAPTIONS[photo]} #{produced + i + 1}",
+                    "order": first_order + produced + i,
+                    "created_at": created.isoformat(),
+                    "synthetic": True,
+                })
+            produced += n
+            yield batch
+
+
+def analytics_codes() -> dict:
+    """Dictionary codes for every page and section the generator uses, assigned if missing"""
+    async def assign():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        codec = AnalyticsCodec(client[os.environ['DB_NAME']])
+        await codec.ensure_indexes()
+        for page, _ in PAGES:
+            await codec.code_for("page", page)
+        for section, _ in SECTION_FUNNEL:
+            await codec.code_for("section", section)
+        client.close()
+        return codec.codes
+    return asyncio.run(assign())
+
+
+def encode_batches(batches, codes):
+    """Store events in the compact layout the API writes (see analytics_codec)"""
+    for batch in batches:
+        yield [encode_event(e, codes["page"][e["page"]], codes["section"][e["section"]]) for e in batch]
+
+
+def insert_batches(collection, batches, total):
+    inserted = 0
+    start = time.perf_counter()
+    for batch in batches:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+        rate = inserted / (time.perf_counter() - start)
+        print(f"\r  {collection.name}: {inserted:,}/{total:,} ({rate:,.0f} docs/s)", end="", flush=True)
+    print()
+    return {"inserted": inserted, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def insert_catalog_batches(collection, batches, total):
+    """insert_batches for a catalog collection, with every document under one revision"""
+    async def insert():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            async with catalog_write(client[os.environ['DB_NAME']]) as stamp:
+                stamped = ([{**doc, **stamp} for doc in batch] for batch in batches)
+                return await asyncio.to_thread(insert_batches, collection, stamped, total)
+        finally:
+            client.close()
+    return asyncio.run(insert())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analytics", type=int, default=1_000_000, help="Analytics events to insert")
+    parser.add_argument("--visitors", type=int, help="Distinct visitors (default: events / 6)")
+    parser.add_argument("--bookings", type=int, default=200_000, help="Home bookings to insert")
+    parser.add_argument("--gallery", type=int, default=2_000, help="Gallery images to insert")
+    parser.add_argument("--months", type=int, default=6, help="How far back timestamps go")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=609, help="Random seed; same seed, same dataset")
+    parser.add_argument("--purge", action="store_true", help="Delete synthetic documents and exit")
+    parser.add_argument("--json", dest="json_path", help="Write a summary of the dataset to this file")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    if args.purge:
+        for name in ("analytics", "bookings", "gallery"):
+            result = db[name].delete_many({"synthetic": True})
+            print(f"{name}: deleted {result.deleted_count:,} synthetic documents")
+        return
+
+    generator = Generator(random.Random(args.seed), args.months, datetime.now(timezone.utc))
+    visitors = generator.visitor_ids(args.visitors or max(1, args.analytics // 6))
+
+    print(f"Generating into {os.environ['DB_NAME']} (seed {args.seed}, {args.months} months)")
+    summary = {"seed": args.seed, "months": args.months, "visitors": len(visitors), "collections": {}}
+    if args.analytics:
+        batches = encode_batches(generator.analytics(args.analytics, visitors, args.batch_size), analytics_codes())
+        summary["collections"]["analytics"] = insert_batches(db.analytics, batches, args.analytics)
+    if args.bookings:
+        summary["collections"]["bookings"] = insert_batches(
+            db.bookings, generator.bookings(args.bookings, args.batch_size), args.bookings)
+    if args.gallery:
+        last = db.gallery.find_one(sort=[("order", -1)])
+        first_order = (last.get("order", 0) + 1) if last else 0
+        summary["collections"]["gallery"] = insert_catalog_batches(
+            db.gallery, generator.gallery(args.gallery, args.batch_size, first_order), args.gallery)
+
+    for name in ("analytics", "bookings", "gallery"):
+        summary["collections"].setdefault(name, {})["total_documents"] = db[name].estimated_document_count()
+
+    print(json.dumps(summary, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
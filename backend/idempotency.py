@@ -0,0 +1,122 @@
+"""
+Idempotency-Key support for endpoints with side effects.
+
+A client sends the same `Idempotency-Key` header when it retries a request.
+The first request with a key claims it in the `idempotency_keys` collection
+and runs. Its response is then stored under the key, and later requests
+with the same key get that stored response without running the handler
+again. Records expire after IDEMPOTENCY_TTL_SECONDS through a TTL index on
+`created_at`.
+
+- Same key, different body: 422 (the key was reused for another request)
+- Same key while the first request is still running: 409; retry shortly
+- The first request failed: the claim is released and the key can be retried
+- A claim older than IDEMPOTENCY_LOCK_SECONDS whose worker died mid-request
+  is taken over by the next retry
+- The request succeeded but its response could not be stored (after
+  IDEMPOTENCY_COMPLETE_ATTEMPTS tries): the record is marked failed with the
+  id of what was created, and retries get 409 naming it instead of running
+  the request a second time
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", 60))
+IDEMPOTENCY_COMPLETE_ATTEMPTS = int(os.environ.get("IDEMPOTENCY_COMPLETE_ATTEMPTS", 3))
+MAX_KEY_LENGTH = 255
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, db, collection: str = "idempotency_keys"):
+        self.collection = db[collection]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+    async def begin(self, scope: str, key: str, payload) -> Optional[dict]:
+        """Claim the key, or return the stored response of an earlier request with it"""
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        record_id = f"{scope}:{key}"
+        digest = fingerprint(payload)
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.insert_one({
+                "_id": record_id, "fingerprint": digest, "status": "processing",
+                "created_at": now, "started_at": now,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        existing = await self.collection.find_one({"_id": record_id})
+        if existing is None:
+            # Released or expired in between; claim it now
+            return await self.begin(scope, key, payload)
+        if existing["fingerprint"] != digest:
+            raise IdempotencyError(422, "Idempotency-Key was already used for a different request")
+        if existing["status"] == "completed":
+            return existing["response"]
+        if existing["status"] == "failed":
+            raise IdempotencyError(409, "The request with this Idempotency-Key already succeeded "
+                                        f"({existing.get('result_id')}) but its response was not stored")
+        # Still processing: take it over only if its worker seems to have died
+        stale_before = now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        taken = await self.collection.find_one_and_update(
+            {"_id": record_id, "status": "processing", "started_at": {"$lt": stale_before}},
+            {"$set": {"started_at": now}},
+        )
+        if taken is None:
+            raise IdempotencyError(409, "A request with this Idempotency-Key is still being processed")
+        return None
+
+    async def _finish(self, record_id: str, fields: dict) -> bool:
+        for attempt in range(IDEMPOTENCY_COMPLETE_ATTEMPTS):
+            try:
+                await self.collection.update_one(
+                    {"_id": record_id}, {"$set": {**fields, "completed_at": datetime.now(timezone.utc)}})
+                return True
+            except PyMongoError as e:
+                logger.error(f"Failed to store the result of idempotent request {record_id}: {e}")
+                if attempt + 1 < IDEMPOTENCY_COMPLETE_ATTEMPTS:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+        return False
+
+    async def complete(self, scope: str, key: str, response, result_id: Optional[str] = None):
+        """Store the response of a request that succeeded; result_id names what it created
+
+        Never leaves the record processing, where a retry would take it over and
+        run the request again: if the response can't be stored, the record is
+        marked failed instead.
+        """
+        record_id = f"{scope}:{key}"
+        if await self._finish(record_id, {"status": "completed", "response": response}):
+            return
+        if not await self._finish(record_id, {"status": "failed", "result_id": result_id}):
+            logger.error(f"Idempotent request {record_id} ({result_id}) is still marked processing; "
+                         f"a retry after {IDEMPOTENCY_LOCK_SECONDS}s would run it again")
+
+    async def release(self, scope: str, key: str):
+        await self.collection.delete_one({"_id": f"{scope}:{key}", "status": "processing"})
@@ -0,0 +1,275 @@
+"""
+Caching proxy for remote catalog images.
+
+GET /api/images?src=<url>&w=<width> fetches `src` once, stores it in an
+on-disk cache and serves it from there with long-lived cache headers. With
+`w`, the image is downscaled (never upscaled) to the nearest of
+IMAGE_PROXY_WIDTHS at or above the requested width, and the resized copy
+is cached as well.
+
+Only hosts in IMAGE_PROXY_ALLOWED_HOSTS are fetched, so this isn't an open
+proxy. The cache is a size-bounded LRU (IMAGE_CACHE_MAX_BYTES): file mtimes
+record the last use, so recency survives restarts, and the least recently
+used files are deleted when a new file pushes it over the limit. Workers
+sharing the directory each track usage separately. A file that another
+worker evicted is fetched again.
+
+Disk reads and writes (up to IMAGE_PROXY_MAX_SOURCE_BYTES per file) run in
+worker threads; the LRU bookkeeping stays on the event loop.
+
+httpx and Pillow are imported on first use.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+from metrics import observe_outbound
+
+IMAGE_CACHE_DIR = Path(os.environ.get("IMAGE_CACHE_DIR", Path(__file__).parent / "image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+IMAGE_PROXY_ALLOWED_HOSTS = {
+    host.strip().lower()
+    for host in os.environ.get("IMAGE_PROXY_ALLOWED_HOSTS", "images.unsplash.com").split(",")
+    if host.strip()
+}
+IMAGE_PROXY_WIDTHS = (160, 320, 480, 640, 800, 1024, 1280, 1920, 2560)
+IMAGE_PROXY_MAX_SOURCE_BYTES = int(os.environ.get("IMAGE_PROXY_MAX_SOURCE_BYTES", 15 * 1024 * 1024))
+IMAGE_PROXY_TIMEOUT = float(os.environ.get("IMAGE_PROXY_TIMEOUT", 10))
+IMAGE_PROXY_QUALITY = int(os.environ.get("IMAGE_PROXY_QUALITY", 80))
+# Responses are keyed by src and width, so their content never changes
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes -> (content type, Pillow save format or None to never re-encode)
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "PNG"),
+    (b"GIF8", "image/gif", None),
+]
+
+
+class ImageProxyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_image(head: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """(content type, re-encode format) of image bytes; (None, None) if not an image"""
+    for signature, content_type, save_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, save_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "WEBP"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif", None
+    return None, None
+
+
+def file_content_type(path: Path) -> Optional[str]:
+    with open(path, "rb") as f:
+        return sniff_image(f.read(16))[0]
+
+
+def snap_width(width: int) -> int:
+    """Smallest supported width >= width, so the cache holds a few sizes per image"""
+    for candidate in IMAGE_PROXY_WIDTHS:
+        if candidate >= width:
+            return candidate
+    return IMAGE_PROXY_WIDTHS[-1]
+
+
+def resize_image(data: bytes, width: int, save_format: str) -> Optional[bytes]:
+    """Downscaled copy of an image, or None if it is already narrow enough"""
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as image:
+        if image.width <= width:
+            return None
+        image = ImageOps.exif_transpose(image)
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+        if save_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = BytesIO()
+        options = {"optimize": True}
+        if save_format in ("JPEG", "WEBP"):
+            options["quality"] = IMAGE_PROXY_QUALITY
+        if save_format == "JPEG":
+            options["progressive"] = True
+        image.save(out, save_format, **options)
+        return out.getvalue()
+
+
+class ImageCache:
+    """Size-bounded LRU of files in one directory"""
+
+    def __init__(self, directory: Path = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # name -> size, least recently used first
+        self.total_bytes = 0
+        self._scanned = False
+        self._scanning = None
+
+    def _list_files(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return [(p.stat().st_mtime, p.name, p.stat().st_size) for p in self.directory.iterdir()
+                if p.is_file() and not p.name.startswith(".")]
+
+    async def _scan(self):
+        if self._scanned:
+            return
+        if self._scanning is None:
+            self._scanning = asyncio.ensure_future(asyncio.to_thread(self._list_files))
+        files = await asyncio.shield(self._scanning)
+        if not self._scanned:
+            for _, name, size in sorted(files):
+                self.entries[name] = size
+                self.total_bytes += size
+            self._scanned = True
+
+    def _drop(self, name: str):
+        size = self.entries.pop(name, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    async def get(self, name: str) -> Optional[Path]:
+        await self._scan()
+        path = self.directory / name
+        if name not in self.entries:
+            return None
+        try:
+            await asyncio.to_thread(os.utime, path)
+        except FileNotFoundError:
+            self._drop(name)
+            return None
+        if name not in self.entries:
+            return None  # evicted meanwhile
+        self.entries.move_to_end(name)
+        return path
+
+    def _write(self, path: Path, data: bytes):
+        tmp = self.directory / f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    async def put(self, name: str, data: bytes) -> Path:
+        await self._scan()
+        path = self.directory / name
+        await asyncio.to_thread(self._write, path, data)
+        self._drop(name)
+        self.entries[name] = len(data)
+        self.total_bytes += len(data)
+        evicted = self._evict(keep=name)
+        if evicted:
+            await asyncio.to_thread(self._unlink, evicted)
+        return path
+
+    def _evict(self, keep: str) -> list:
+        """Drop least recently used entries until under the limit; the names to delete"""
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            name, size = next(iter(self.entries.items()))
+            if name == keep:
+                break
+            del self.entries[name]
+            self.total_bytes -= size
+            evicted.append(name)
+        return evicted
+
+    def _unlink(self, names: list):
+        for name in names:
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class ImageProxy:
+    def __init__(self, cache: ImageCache = None, allowed_hosts=IMAGE_PROXY_ALLOWED_HOSTS):
+        self.cache = cache or ImageCache()
+        self.allowed_hosts = allowed_hosts
+        self._client = None
+        self._inflight = {}  # cache name -> task producing it
+
+    def validate(self, src: str) -> str:
+        parts = urlsplit(src)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ImageProxyError(400, "src must be an http(s) URL")
+        if parts.hostname.lower() not in self.allowed_hosts and parts.netloc.lower() not in self.allowed_hosts:
+            raise ImageProxyError(400, f"Images from {parts.hostname} are not proxied")
+        return src
+
+    async def get(self, src: str, width: Optional[int] = None) -> Tuple[Path, str, str]:
+        """(cached file, content type, "HIT" or "MISS") for src at the given width"""
+        src = self.validate(src)
+        digest = hashlib.sha256(src.encode("utf-8")).hexdigest()[:32]
+        name = f"{digest}-w{snap_width(width)}" if width else f"{digest}-orig"
+
+        path = await self.cache.get(name)
+        if path is not None:
+            return path, await asyncio.to_thread(file_content_type, path), "HIT"
+
+        # Concurrent misses for the same file share one fetch / resize
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._produce(src, name, width))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        path, content_type = await asyncio.shield(task)
+        return path, content_type, "MISS"
+
+    async def _produce(self, src: str, name: str, width: Optional[int]) -> Tuple[Path, str]:
+        if not width:
+            data = await self._fetch(src)
+            return await self.cache.put(name, data), sniff_image(data[:16])[0]
+        original, content_type, _ = await self.get(src)
+        data = await asyncio.to_thread(original.read_bytes)
+        save_format = sniff_image(data[:16])[1]
+        resized = None
+        if save_format:
+            resized = await asyncio.to_thread(resize_image, data, snap_width(width), save_format)
+        return await self.cache.put(name, resized or data), content_type
+
+    async def _fetch(self, src: str) -> bytes:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=IMAGE_PROXY_TIMEOUT, follow_redirects=False)
+        try:
+            with observe_outbound("image_origin"):
+                async with self._client.stream("GET", src) as response:
+                    if response.status_code != 200:
+                        # Counted as an outbound error by observe_outbound as it propagates
+                        status = 404 if 400 <= response.status_code < 500 else 502
+                        raise ImageProxyError(status, f"Image origin returned {response.status_code}")
+                    chunks = []
+                    size = 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > IMAGE_PROXY_MAX_SOURCE_BYTES:
+                            raise ImageProxyError(502, "Image is too large")
+                        chunks.append(chunk)
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to fetch image {src}: {e}")
+            raise ImageProxyError(502, "Could not fetch image")
+        data = b"".join(chunks)
+        if sniff_image(data[:16])[0] is None:
+            raise ImageProxyError(502, "Origin did not return an image")
+        return data
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,42 @@
+"""
+Mongo-backed leases for jobs that must run on one worker at a time.
+
+A lease is a document in `job_leases` keyed by job name, holding the owner
+and an expiry. acquire() takes it when it is free, expired or already ours,
+and renews it in that case. A worker that dies simply stops renewing, and
+another one takes over once `expires_at` has passed.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    def __init__(self, db, name: str, ttl_seconds: float, owner: str = WORKER_ID):
+        self.collection = db.job_leases
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = owner
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease; False while another worker holds it"""
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + self.ttl, "acquired_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The upsert lost against a lease that is held by someone else
+            return False
+        return True
+
+    async def release(self):
+        await self.collection.delete_one({"_id": self.name, "owner": self.owner})
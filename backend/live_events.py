@@ -0,0 +1,198 @@
+"""
+Server-Sent Events broker for live admin updates.
+
+Events (booking.created, booking.status) are published to the broker and
+every connected SSE client gets them immediately. Each event has an
+increasing id; the last SSE_HISTORY_SIZE events are kept so a reconnecting
+client can resume from its Last-Event-ID. If that id is no longer in the
+history the client is sent a `resync` event and should refetch.
+
+With several uvicorn workers a booking is usually written on a different
+worker than the one holding the admin's stream. BookingChangeFeed therefore
+tails a change stream on `bookings` in every worker and publishes from it,
+using the change's cluster time as the event id. Every worker then sees
+every event under the same id, and a client can resume on any worker. Change
+streams need a replica set; without one the feed exits and the request
+handlers publish locally instead (only clients on the same worker see those
+events, so the admin page also refetches periodically).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+
+from pymongo.errors import OperationFailure
+
+from catalog_cache import CHANGE_STREAMS_UNSUPPORTED
+
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+SSE_HISTORY_SIZE = int(os.environ.get("SSE_HISTORY_SIZE", 500))
+SSE_QUEUE_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def booking_status_event(booking_id: str, status: str, previous_status) -> dict:
+    """Payload of booking.status, the same whichever path publishes it"""
+    return {"id": booking_id, "status": status, "previous_status": previous_status}
+
+
+def format_sse(event_id, event_type: str, data) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBroker:
+    def __init__(self, history_size: int = SSE_HISTORY_SIZE):
+        # Ids start at the process start time (ms) so they keep increasing
+        # across restarts and a stale Last-Event-ID is never mistaken for a new one
+        self.last_id = int(time.time() * 1000)
+        # Clients that have seen everything up to `floor` can be replayed to
+        self.floor = self.last_id
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+
+    def publish(self, event_type: str, data: dict, event_id: int = None):
+        """Called on the event loop; never blocks. Ids must keep increasing."""
+        self.last_id = max(self.last_id + 1, event_id or 0)
+        message = format_sse(self.last_id, event_type, data)
+        if len(self.history) == self.history.maxlen:
+            self.floor = self.history[0][0]
+        self.history.append((self.last_id, message))
+        self._send(message)
+
+    def reset(self, floor: int, reason: str):
+        """Events up to `floor` may have been missed: clients must refetch"""
+        self.history.clear()
+        self.floor = self.last_id = max(self.last_id, floor)
+        self._send(format_sse(None, "resync", {"reason": reason}))
+
+    def _send(self, message: str):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow to keep up: disconnect it, it will resume via Last-Event-ID
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def _replay(self, last_event_id):
+        if last_event_id is None:
+            return []
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return [format_sse(None, "resync", {"reason": "invalid Last-Event-ID"})]
+        if not self.floor <= last_event_id <= self.last_id:
+            return [format_sse(None, "resync", {"reason": "events missed"})]
+        return [message for event_id, message in self.history if event_id > last_event_id]
+
+    async def subscribe(self, last_event_id=None, heartbeat: float = SSE_HEARTBEAT_SECONDS):
+        """Async generator of SSE-formatted strings for one client"""
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        # Register and snapshot the replay together (no await in between) so
+        # every event is delivered exactly once, from history or from the queue
+        self.subscribers.add(queue)
+        replay = self._replay(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            for message in replay:
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.subscribers.discard(queue)
+
+
+def cluster_time_id(timestamp) -> int:
+    """An event id from a BSON Timestamp; the same on every worker"""
+    return (timestamp.time << 32) | timestamp.inc
+
+
+class BookingChangeFeed:
+    """Publishes booking changes made on any worker to this worker's broker"""
+
+    def __init__(self, db, broker: EventBroker):
+        self.db = db
+        self.broker = broker
+        self.running = False
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _cluster_time(self):
+        async with await self.db.client.start_session() as session:
+            await self.db.command("ping", session=session)
+            return session.operation_time
+
+    def _publish(self, change: dict):
+        event_id = cluster_time_id(change["clusterTime"])
+        if change["operationType"] == "insert":
+            booking = {k: v for k, v in change["fullDocument"].items() if k != "_id"}
+            self.broker.publish("booking.created", booking, event_id)
+        elif change.get("fullDocument"):
+            # The status update stores the status it replaced next to the new one. A $set
+            # that leaves a field unchanged doesn't list it, so fall back to the document
+            fields = change["updateDescription"]["updatedFields"]
+            previous = fields.get("previous_status", change["fullDocument"].get("previous_status"))
+            self.broker.publish("booking.status", booking_status_event(
+                change["fullDocument"]["id"], fields["status"], previous), event_id)
+
+    async def run(self):
+        pipeline = [{"$match": {"$or": [
+            {"operationType": "insert"},
+            {"operationType": "update", "updateDescription.updatedFields.status": {"$exists": True}},
+        ]}}]
+        backoff = 1
+        while True:
+            try:
+                start = await self._cluster_time()
+                async with self.db.bookings.watch(
+                        pipeline, full_document="updateLookup", start_at_operation_time=start) as stream:
+                    # Anything before `start` that clients missed can't be replayed
+                    self.broker.reset(cluster_time_id(start) - 1, "live feed (re)started")
+                    self.running = True
+                    backoff = 1
+                    async for change in stream:
+                        self._publish(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning("Change streams unavailable (not a replica set?); "
+                                   "booking events reach only clients on the same worker")
+                    self.running = False
+                    return
+                logger.error(f"Booking change stream failed: {e}")
+            except Exception as e:
+                logger.error(f"Booking change stream failed: {e}")
+            self.running = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
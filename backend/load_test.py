@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+"""
+BeautyBar609 API Load Testing Harness
+Drives the API with concurrent async virtual users and reports requests/sec and
+p50/p95/p99 latency per route as JSON, so runs can be compared across commits.
+409s (a booking slot that is already full) are counted as conflicts, not errors.
+
+By default the ASGI app is driven in-process (no network, no uvicorn) against
+the MongoDB in MONGO_URL - point it at a local mongod, never production.
+Use --url to load a running server instead (e.g. a local uvicorn).
+
+Usage:
+    python load_test.py --scenario landing --users 50 --duration 30
+    python load_test.py --scenario all --url http://127.0.0.1:8001 --json run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+SECTIONS = ["hero", "services", "prices", "gallery", "testimonials", "promotions", "booking", "contact"]
+SERVICES = ["Gel Extensions (Short)", "Classic Lashes", "Volume Lashes", "Brow Lamination", "Microblading"]
+# The booking form's times (the default AVAILABILITY_SLOTS); each takes a stylist
+BOOKING_SLOTS = ["9:00 AM", "10:00 AM", "11:00 AM", "12:00 PM", "1:00 PM", "2:00 PM", "3:00 PM", "4:00 PM", "5:00 PM"]
+BOOKING_FIRST_DAY = date(2030, 1, 1)
+BOOKING_DAYS = 365
+# httpx's default User-Agent is dropped by the analytics bot filter
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36 BeautyBar609-LoadTest")
+
+
+class LoadStats:
+    """Collects per-route latencies; routes are keyed by method and path template"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.conflicts = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, route, elapsed_ms, status):
+        self.latencies[route].append(elapsed_ms)
+        if status == 409:
+            # A full slot is the API working as intended, not a failure
+            self.conflicts[route] += 1
+        elif status is None or status >= 400:
+            self.errors[route] += 1
+
+    @staticmethod
+    def percentile(sorted_values, pct):
+        if not sorted_values:
+            return None
+        index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+        return round(sorted_values[index], 3)
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total = sum(len(v) for v in self.latencies.values())
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            routes[route] = {
+                "requests": len(values),
+                "errors": self.errors[route],
+                "conflicts": self.conflicts[route],
+                "rps": round(len(values) / elapsed, 2) if elapsed else None,
+                "p50_ms": self.percentile(values, 50),
+                "p95_ms": self.percentile(values, 95),
+                "p99_ms": self.percentile(values, 99),
+                "max_ms": round(values[-1], 3)
+            }
+        return {
+            "duration_s": round(elapsed, 3),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "conflicts": sum(self.conflicts.values()),
+            "rps": round(total / elapsed, 2) if elapsed else None,
+            "routes": routes
+        }
+
+
+class VirtualUser:
+    """One simulated client; wraps the shared httpx client and records timings"""
+
+    def __init__(self, client, stats):
+        self.client = client
+        self.stats = stats
+        self.visitor_id = str(uuid.uuid4())
+        self.headers = {}
+
+    async def request(self, method, path, route=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, None
+        self.stats.record(f"{method} {route or path}", (time.perf_counter() - start) * 1000, status)
+        return response
+
+    async def track(self, section=None):
+        await self.request("POST", "/api/analytics/track", json={
+            "page": "/", "section": section, "visitor_id": self.visitor_id
+        })
+
+
+# ================== SCENARIOS ==================
+
+async def landing_page(user, admin):
+    """Landing page fan-out: everything the public site loads at once"""
+    await asyncio.gather(
+        user.request("GET", "/api/services"),
+        user.request("GET", "/api/prices", params={"service_type": "salon"}),
+        user.request("GET", "/api/prices", params={"service_type": "home"}),
+        user.request("GET", "/api/testimonials"),
+        user.request("GET", "/api/promotions/active"),
+        user.request("GET", "/api/gallery"),
+        user.track(),
+    )
+
+
+async def analytics_burst(user, admin):
+    """A visitor scrolling through the page fires section events back to back"""
+    # Each burst is a new visit; one visitor looping all run long would trip the per-visitor bot limit
+    user.visitor_id = str(uuid.uuid4())
+    for section in random.sample(SECTIONS, k=random.randint(3, len(SECTIONS))):
+        await user.track(section)
+
+
+async def booking_submission(user, admin):
+    """Open the booking form, load home prices and submit a home booking"""
+    await user.track("booking")
+    await user.request("GET", "/api/prices", params={"service_type": "home"})
+    await user.request("POST", "/api/bookings/home", json={
+        "name": "Load Test",
+        "phone": f"080{random.randint(10000000, 99999999)}",
+        "email": "loadtest@example.com",
+        "address": "12 Load Test Street, Ikeja, Lagos",
+        "service": random.choice(SERVICES),
+        # Spread over a year of slots so the stylists don't run out after a few bookings
+        "preferred_date": (BOOKING_FIRST_DAY + timedelta(days=random.randrange(BOOKING_DAYS))).isoformat(),
+        "preferred_time": random.choice(BOOKING_SLOTS),
+        "notes": "load test"
+    })
+
+
+async def admin_dashboard(user, admin):
+    """Admin logs in, opens the dashboard and works through the tabs"""
+    response = await user.request("POST", "/api/auth/login", json=admin)
+    if response is None or response.status_code != 200:
+        return
+    user.headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    await user.request("GET", "/api/auth/me")
+    await asyncio.gather(
+        user.request("GET", "/api/analytics/summary"),
+        user.request("GET", "/api/bookings"),
+        user.request("GET", "/api/services"),
+        user.request("GET", "/api/prices"),
+        user.request("GET", "/api/testimonials"),
+        user.request("GET", "/api/promotions"),
+        user.request("GET", "/api/gallery"),
+    )
+    bookings = await user.request("GET", "/api/bookings")
+    if bookings is not None and bookings.status_code == 200 and bookings.json():
+        booking = random.choice(bookings.json())
+        await user.request("PUT", f"/api/bookings/{booking['id']}/status",
+                           route="/api/bookings/{booking_id}/status", json={"status": "pending"})
+    user.headers = {}
+
+
+SCENARIOS = {
+    "landing": landing_page,
+    "analytics": analytics_burst,
+    "booking": booking_submission,
+    "admin": admin_dashboard,
+}
+
+# Relative weights used by --scenario all
+MIX = {"landing": 60, "analytics": 25, "booking": 10, "admin": 5}
+
+
+# ================== RUNNER ==================
+
+def make_client(url):
+    """Return (client, app); app is None unless the API is driven in-process"""
+    if url:
+        return httpx.AsyncClient(base_url=url.rstrip("/"), timeout=30, headers={"User-Agent": USER_AGENT}), None
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import server
+    # Never send real SMS/emails from a load test
+    server.TERMII_API_KEY = None
+    server.SENDGRID_API_KEY = None
+    transport = httpx.ASGITransport(app=server.app, client=("127.0.0.1", 0))
+    client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30,
+                               headers={"User-Agent": USER_AGENT})
+    return client, server.app
+
+
+async def ensure_admin(client, admin):
+    """Log in as the load-test admin, registering it on first use"""
+    response = await client.post("/api/auth/login", json=admin)
+    if response.status_code != 200:
+        response = await client.post("/api/auth/register", json={**admin, "name": "Load Test Admin"})
+        response.raise_for_status()
+    token = response.json()["token"]
+    await client.post("/api/seed", headers={"Authorization": f"Bearer {token}"})
+
+
+async def run_user(client, stats, scenario, admin, deadline, iterations):
+    user = VirtualUser(client, stats)
+    count = 0
+    while time.perf_counter() < deadline and (iterations is None or count < iterations):
+        if scenario == "all":
+            name = random.choices(list(MIX), weights=list(MIX.values()))[0]
+        else:
+            name = scenario
+        await SCENARIOS[name](user, admin)
+        count += 1
+
+
+async def run(args):
+    admin = {"email": args.admin_email, "password": args.admin_password}
+    client, app = make_client(args.url)
+    if app is not None:
+        # ASGITransport doesn't send lifespan events, so run the app's hooks here
+        await app.router.startup()
+    try:
+        async with client:
+            await ensure_admin(client, admin)
+            stats = LoadStats()
+            deadline = time.perf_counter() + args.duration
+            await asyncio.gather(*[
+                run_user(client, stats, args.scenario, admin, deadline, args.iterations)
+                for _ in range(args.users)
+            ])
+            stats.finished = time.perf_counter()
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+    return stats.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--iterations", type=int, help="Stop each user after this many scenario runs")
+    parser.add_argument("--url", help="Base URL of a running server; default drives the app in-process")
+    parser.add_argument("--admin-email", default=os.environ.get("LOADTEST_ADMIN_EMAIL", "loadtest@beautybar609.com"))
+    parser.add_argument("--admin-password", default=os.environ.get("LOADTEST_ADMIN_PASSWORD", "loadtest-password"))
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible request mixes")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    report = asyncio.run(run(args))
+    report["config"] = {
+        "scenario": args.scenario, "users": args.users, "duration_s": args.duration,
+        "iterations": args.iterations, "target": args.url or "in-process"
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Event-loop lag watchdog for the BeautyBar609 API.
+
+A background task sleeps for LOOP_LAG_INTERVAL_MS at a time and records how
+late it wakes up (the event-loop lag). A helper thread watches the task's
+heartbeat; when the loop has been stuck for longer than
+LOOP_LAG_THRESHOLD_MS it captures the loop thread's stack, so blocking calls
+(synchronous HTTP clients, bcrypt, large JSON encodes...) are attributed to
+the line of our code that made them.
+
+Lag is exported as the event_loop_lag_seconds histogram and stalls as
+event_loop_blocked_total{call_site}; GET /api/admin/event-loop shows lag
+percentiles and the top blocking call sites with a sample stack.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+LOOP_WATCHDOG_ENABLED = os.environ.get("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL_MS = float(os.environ.get("LOOP_LAG_INTERVAL_MS", 50))
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get("LOOP_LAG_THRESHOLD_MS", 100))
+
+APP_DIR = str(Path(__file__).parent)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def blocking_call_site(stack) -> str:
+    """'file:line function' of the innermost app frame, falling back to the innermost frame"""
+    app_frames = [
+        f for f in stack
+        if f.filename.startswith(APP_DIR) and f.filename != __file__ and "site-packages" not in f.filename
+    ]
+    frame = (app_frames or stack)[-1]
+    return f"{Path(frame.filename).name}:{frame.lineno} {frame.name}"
+
+
+class LoopWatchdog:
+    def __init__(self, interval_ms=LOOP_LAG_INTERVAL_MS, threshold_ms=LOOP_LAG_THRESHOLD_MS, window=2000):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.lags = deque(maxlen=window)
+        self.call_sites = {}
+        self.blocked_count = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure_lag())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    async def _measure_lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.lags.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        # Runs in its own thread so it can look at the loop while the loop is stuck
+        reported_heartbeat = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled > self.threshold and heartbeat != reported_heartbeat:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    reported_heartbeat = heartbeat
+                    self._record_block(traceback.extract_stack(frame), stalled)
+
+    def _record_block(self, stack, stalled):
+        call_site = blocking_call_site(stack)
+        EVENT_LOOP_BLOCKED.labels(call_site).inc()
+        with self._lock:
+            self.blocked_count += 1
+            site = self.call_sites.setdefault(call_site, {"count": 0, "max_blocked_ms": 0.0})
+            site["count"] += 1
+            # stalled is a lower bound: the stall is caught while still in progress
+            site["max_blocked_ms"] = max(site["max_blocked_ms"], round(stalled * 1000, 1))
+            site["stack"] = traceback.format_list(stack[-15:])
+
+    def summary(self, top: int = 10) -> dict:
+        lags = sorted(self.lags)
+        with self._lock:
+            sites = sorted(self.call_sites.items(), key=lambda item: item[1]["count"], reverse=True)[:top]
+            blocked_count = self.blocked_count
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {
+                "samples": len(lags),
+                "p50": round(percentile(lags, 50) * 1000, 3) if lags else None,
+                "p95": round(percentile(lags, 95) * 1000, 3) if lags else None,
+                "p99": round(percentile(lags, 99) * 1000, 3) if lags else None,
+                "max": round(lags[-1] * 1000, 3) if lags else None,
+            },
+            "blocked_count": blocked_count,
+            "top_blocking_call_sites": [{"call_site": name, **site} for name, site in sites],
+        }
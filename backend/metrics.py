@@ -0,0 +1,163 @@
+"""
+Prometheus metrics for the BeautyBar609 API.
+
+Exposes per-route request latency, in-flight requests, MongoDB command timings
+by collection/command, outbound Termii/SendGrid latency and errors, and the
+event-loop lag measured by loop_watchdog.
+
+When PROMETHEUS_MULTIPROC_DIR is set (required when running uvicorn with
+--workers > 1) every worker writes to mmap'd files in that directory and
+/metrics aggregates all of them. The directory must exist and should be
+emptied before the server starts. This module must be imported after .env is
+loaded, since prometheus_client reads the variable at import time.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+from pymongo import monitoring
+
+from tracing import span
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+    ["method"], multiprocess_mode="livesum"
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+    ["collection", "command", "outcome"], buckets=LATENCY_BUCKETS
+)
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "outbound_request_duration_seconds", "Latency of calls to third-party APIs",
+    ["provider"], buckets=LATENCY_BUCKETS
+)
+OUTBOUND_REQUEST_ERRORS = Counter(
+    "outbound_request_errors_total", "Failed calls to third-party APIs",
+    ["provider"]
+)
+ANALYTICS_EVENTS = Counter(
+    "analytics_events_total", "Analytics events at ingest: stored, sampled_out, bot_user_agent or bot_rate",
+    ["outcome"]
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer scheduled by the lag watchdog",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "event_loop_blocked_total", "Event loop stalls longer than LOOP_LAG_THRESHOLD_MS by call site",
+    ["call_site"]
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (cheaper than BaseHTTPMiddleware) timing every request.
+
+    Routes are labelled by their path template (e.g. /api/services/{service_id})
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method, route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def command_collection(event) -> str:
+    """Collection a command targets; '-' for database/admin commands"""
+    if event.command_name == "getMore":
+        return event.command.get("collection", "-")
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else "-"
+
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Records command durations; pymongo calls this from Motor's worker threads"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = command_collection(event)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+    def _observe(self, event, outcome):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name, outcome).observe(
+            event.duration_micros / 1e6
+        )
+
+
+@contextmanager
+def observe_outbound(provider: str):
+    """Time (and trace) a third-party API call; an exception counts as an error"""
+    start = time.perf_counter()
+    try:
+        with span(f"{provider}.request", "client", **{"peer.service": provider}):
+            yield
+    except Exception:
+        OUTBOUND_REQUEST_ERRORS.labels(provider).inc()
+        raise
+    finally:
+        OUTBOUND_REQUEST_DURATION.labels(provider).observe(time.perf_counter() - start)
+
+
+def record_outbound_error(provider: str):
+    """Count a call that completed but was rejected by the provider"""
+    OUTBOUND_REQUEST_ERRORS.labels(provider).inc()
+
+
+def render_metrics() -> bytes:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess directory on shutdown"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
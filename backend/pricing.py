@@ -0,0 +1,253 @@
+"""
+Numeric prices, basket quotes and the promotion schedule.
+
+Price list items are stored with their display string ("₦15,000",
+"From ₦30,000") and, since price categories are normalized on write, with
+`amount_kobo` (integer kobo) and `price_from` (the price is a minimum).
+PriceTable compiles every category into plain dicts, so quoting a basket is a
+few dict lookups and no database reads.
+
+Promotions run between optional `starts_at` / `ends_at` times. PromotionTimeline
+compiles the enabled ones into sorted boundaries with the winning promotion
+for each interval, so the promotion live at any moment is a binary search.
+When windows overlap, the one that started last wins (then the most recently
+written one).
+
+Both are reloaded whenever the catalog cache invalidates their collection.
+That covers writes made on other workers only while the catalog change
+stream runs, so callers also pass a maximum age to ensure_fresh(); an older
+table is reloaded before it is used.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KOBO_PER_NAIRA = 100
+SERVICE_TYPES = ("salon", "home")
+
+_AMOUNT = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(k\b)?", re.IGNORECASE)
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+
+class QuoteError(ValueError):
+    """The basket can't be priced (unknown or ambiguous items)"""
+
+
+def parse_price(text) -> Tuple[Optional[int], bool]:
+    """("From ₦30,000") -> (3000000, True); (None, False) if there's no amount"""
+    if text is None:
+        return None, False
+    text = str(text)
+    match = _AMOUNT.search(text)
+    if not match:
+        return None, False
+    naira = float(match.group(1).replace(",", ""))
+    if match.group(2):
+        naira *= 1000
+    is_from = text.strip().lower().startswith("from") or text.rstrip().endswith("+")
+    return round(naira * KOBO_PER_NAIRA), is_from
+
+
+def normalize_price_items(items: List[dict]) -> List[dict]:
+    """Copy of a category's items with amount_kobo / price_from filled in"""
+    normalized = []
+    for item in items:
+        amount_kobo, price_from = parse_price(item.get("price"))
+        normalized.append({**item, "amount_kobo": amount_kobo, "price_from": price_from})
+    return normalized
+
+
+def parse_discount(text) -> Tuple[float, int]:
+    """("15% OFF") -> (15.0, 0); ("₦5,000 OFF") -> (0, 500000)"""
+    if not text:
+        return 0.0, 0
+    percent = _PERCENT.search(str(text))
+    if percent:
+        return min(float(percent.group(1)), 100.0), 0
+    amount_kobo, _ = parse_price(text)
+    return 0.0, amount_kobo or 0
+
+
+def format_naira(kobo: int) -> str:
+    naira, rest = divmod(kobo, KOBO_PER_NAIRA)
+    return f"₦{naira:,}" + (f".{rest:02d}" if rest else "")
+
+
+def parse_schedule_time(value: Optional[str]) -> Optional[datetime]:
+    """ISO datetime (naive means UTC) -> aware datetime; None/"" -> None"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _key(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+class _BackgroundReload(ABC):
+    """Base for compiled tables that reload themselves from Mongo"""
+
+    loaded = False
+    loaded_at = 0.0
+    _refresh_task = None
+    _stale = False
+
+    @abstractmethod
+    async def fetch(self, db) -> List[dict]:
+        """The documents to compile"""
+
+    @abstractmethod
+    def compile(self, docs: List[dict]):
+        ...
+
+    async def load(self, db):
+        started = time.monotonic()
+        self.compile(await self.fetch(db))
+        # Writes made after the read started may be missing, so age from there
+        self.loaded_at = started
+        self.loaded = True
+
+    async def ensure_fresh(self, db, max_age: float):
+        """Load on first use; reload (once, for all waiting callers) when older than max_age seconds"""
+        if not self.loaded:
+            await self.load(db)
+        elif time.monotonic() - self.loaded_at > max_age:
+            self.request_refresh(db)
+            await asyncio.shield(self._refresh_task)
+
+    def request_refresh(self, db):
+        """Reload in the background; refresh requests made meanwhile are coalesced"""
+        self._stale = True
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh(db))
+
+    async def _refresh(self, db):
+        while self._stale:
+            self._stale = False
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.error(f"Failed to reload {type(self).__name__}: {e}")
+                return
+
+
+class PromotionTimeline(_BackgroundReload):
+    """Enabled promotions compiled into [boundary time] -> live promotion"""
+
+    def __init__(self):
+        self.bounds = [-math.inf]
+        self.winners = [None]
+
+    def compile(self, promotions: List[dict]):
+        windows = []
+        for promotion in promotions:
+            if not promotion.get("active"):
+                continue
+            starts = parse_schedule_time(promotion.get("starts_at"))
+            ends = parse_schedule_time(promotion.get("ends_at"))
+            start = starts.timestamp() if starts else -math.inf
+            end = ends.timestamp() if ends else math.inf
+            if start < end:
+                rank = (start, promotion.get("revision", 0), promotion.get("created_at", ""))
+                windows.append((start, end, rank, promotion))
+
+        points = {-math.inf}
+        for start, end, _, _ in windows:
+            points.update(t for t in (start, end) if math.isfinite(t))
+        bounds = sorted(points)
+        winners = []
+        for at in bounds:
+            live = [(rank, promotion) for start, end, rank, promotion in windows if start <= at < end]
+            winners.append(max(live, key=lambda w: w[0])[1] if live else None)
+        self.bounds, self.winners = bounds, winners
+
+    async def fetch(self, db) -> List[dict]:
+        return await db.promotions.find({"active": True}, {"_id": 0}).to_list(None)
+
+    def active_at(self, when: Optional[datetime] = None) -> Optional[dict]:
+        at = (when or datetime.now(timezone.utc)).timestamp()
+        return self.winners[bisect_right(self.bounds, at) - 1]
+
+
+class PriceTable(_BackgroundReload):
+    """Compiled prices: (service_type, item name) -> priced entries"""
+
+    def __init__(self):
+        self.items = {}
+
+    def compile(self, categories: List[dict]):
+        items = {}
+        for category in categories:
+            service_type = category.get("service_type") or "salon"
+            for item in category.get("items", []):
+                amount_kobo = item.get("amount_kobo")
+                price_from = item.get("price_from", False)
+                if amount_kobo is None:
+                    # Written before prices were normalized
+                    amount_kobo, price_from = parse_price(item.get("price"))
+                if amount_kobo is None or not item.get("name"):
+                    continue
+                items.setdefault((service_type, _key(item["name"])), []).append({
+                    "name": item["name"],
+                    "category": category.get("category", ""),
+                    "amount_kobo": amount_kobo,
+                    "price_from": bool(price_from),
+                })
+        self.items = items
+
+    async def fetch(self, db) -> List[dict]:
+        return await db.prices.find({}, {"_id": 0, "category": 1, "service_type": 1, "items": 1}).to_list(None)
+
+    def _lookup(self, service_type: str, name: str, category: Optional[str]) -> dict:
+        entries = self.items.get((service_type, _key(name)), [])
+        if category:
+            entries = [e for e in entries if _key(e["category"]) == _key(category)]
+        if not entries:
+            raise QuoteError(f"Unknown {service_type} service: {name}")
+        if len(entries) > 1:
+            categories = ", ".join(e["category"] for e in entries)
+            raise QuoteError(f"'{name}' is in several categories ({categories}); specify one")
+        return entries[0]
+
+    def quote(self, items: List[dict], service_type: str = "salon", promotion: Optional[dict] = None) -> dict:
+        """Price a basket of {name, quantity, category?} for salon or home service"""
+        if service_type not in SERVICE_TYPES:
+            raise QuoteError(f"service_type must be one of: {', '.join(SERVICE_TYPES)}")
+        lines = []
+        subtotal = 0
+        for item in items:
+            entry = self._lookup(service_type, item["name"], item.get("category"))
+            quantity = item.get("quantity", 1)
+            amount = entry["amount_kobo"] * quantity
+            subtotal += amount
+            lines.append({**entry, "quantity": quantity, "unit_kobo": entry["amount_kobo"], "amount_kobo": amount})
+
+        discount = 0
+        if promotion and subtotal:
+            percent, amount_kobo = parse_discount(promotion.get("discount"))
+            discount = min(round(subtotal * percent / 100) + amount_kobo, subtotal)
+        total = subtotal - discount
+        estimate = any(line["price_from"] for line in lines)
+        return {
+            "service_type": service_type,
+            "lines": lines,
+            "subtotal_kobo": subtotal,
+            "discount_kobo": discount,
+            "total_kobo": total,
+            "promotion": {k: promotion.get(k) for k in ("id", "title", "discount")} if discount else None,
+            # "From" prices are minimums, so the total is too
+            "estimate": estimate,
+            "total_display": ("From " if estimate else "") + format_naira(total),
+        }
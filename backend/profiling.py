@@ -0,0 +1,124 @@
+"""
+On-demand request profiling for the BeautyBar609 API.
+
+When PROFILING_ENABLED is true, ProfilingMiddleware profiles a request with
+pyinstrument if either
+  - it carries an `X-Profile: 1` header and a valid admin bearer token, or
+  - it is picked by random sampling at PROFILE_SAMPLE_RATE (0.0 - 1.0).
+Profiles are written as HTML or speedscope JSON (PROFILE_FORMAT) into
+PROFILE_DIR, which is capped at PROFILE_MAX_FILES by deleting the oldest.
+
+When PROFILING_ENABLED is false the middleware is not installed at all, so
+there is no per-request cost. pyinstrument is only imported when enabled.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_FORMAT = os.environ.get("PROFILE_FORMAT", "html")  # "html" or "speedscope"
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", Path(__file__).parent / "profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+PROFILE_HEADER = b"x-profile"
+
+logger = logging.getLogger(__name__)
+
+PROFILE_EXTENSIONS = {"html": ".html", "speedscope": ".speedscope.json"}
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.(html|speedscope\.json)$")
+
+
+def profile_filename(method: str, path: str, duration_ms: float) -> str:
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    slug = re.sub(r"[^\w]+", "_", path).strip("_")[:60] or "root"
+    return f"{timestamp}-{method}-{slug}-{int(duration_ms)}ms{PROFILE_EXTENSIONS[PROFILE_FORMAT]}"
+
+
+def list_profiles():
+    """Stored profiles, newest first"""
+    if not PROFILE_DIR.is_dir():
+        return []
+    profiles = []
+    for path in PROFILE_DIR.iterdir():
+        if PROFILE_NAME_PATTERN.match(path.name):
+            stat = path.stat()
+            profiles.append({
+                "name": path.name,
+                "size": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()
+            })
+    return sorted(profiles, key=lambda p: p["name"], reverse=True)
+
+
+def profile_path(name: str):
+    """Path of a stored profile, or None if the name is invalid or missing"""
+    if not PROFILE_NAME_PATTERN.match(name):
+        return None
+    path = PROFILE_DIR / name
+    return path if path.is_file() else None
+
+
+def write_profile(profiler, name: str):
+    """Render and store a profile, then prune the directory to PROFILE_MAX_FILES"""
+    if PROFILE_FORMAT == "speedscope":
+        from pyinstrument.renderers import SpeedscopeRenderer
+        output = profiler.output(renderer=SpeedscopeRenderer())
+    else:
+        output = profiler.output_html()
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / name).write_text(output, encoding="utf-8")
+    for stale in list_profiles()[PROFILE_MAX_FILES:]:
+        (PROFILE_DIR / stale["name"]).unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Profiles selected requests; one at a time per worker, others run unprofiled.
+
+    `authorize` is awaited with the bearer token of requests asking to be
+    profiled and must return True for admins.
+    """
+
+    def __init__(self, app, authorize):
+        self.app = app
+        self.authorize = authorize
+        self.active = False
+
+    async def _should_profile(self, scope) -> bool:
+        if self.active:
+            return False
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            return True
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) != b"1":
+            return False
+        auth = headers.get(b"authorization", b"").decode("latin-1")
+        return auth.startswith("Bearer ") and await self.authorize(auth[len("Bearer "):])
+
+    async def __call__(self, scope, receive, send):
+        # `active` again: another request may have started profiling while authorize ran
+        if scope["type"] != "http" or not await self._should_profile(scope) or self.active:
+            await self.app(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+        self.active = True
+        profiler = Profiler(async_mode="enabled")
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self.active = False
+            name = profile_filename(scope["method"], scope["path"], (time.perf_counter() - start) * 1000)
+            try:
+                # Rendering is CPU-bound; keep it off the event loop
+                await asyncio.to_thread(write_profile, profiler, name)
+            except Exception as e:
+                logger.error(f"Failed to write profile {name}: {e}")
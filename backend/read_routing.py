@@ -0,0 +1,55 @@
+"""
+Read routing between the replica set primary and its secondaries.
+
+Reads that tolerate a little lag (the public catalog and the analytics
+summary) go through ReadRouter.db_for(collection). That handle uses
+`secondaryPreferred` with maxStalenessSeconds = READ_MAX_STALENESS_SECONDS,
+so a secondary that is further behind is never picked, and the primary
+answers when no secondary is available. Everything else stays on the plain
+`db` handle, which reads from the primary: auth lookups, bookings, the
+admin sync feed and all writes.
+
+Read-your-writes: whenever a catalog collection is written or invalidated
+(through catalog_cache listeners, so this includes writes made on other
+workers and seen by the change stream), its reads are pinned to the primary
+for READ_YOUR_WRITES_SECONDS. That covers the longest a secondary can be
+behind. An admin who saves an edit therefore sees it at once, and the cache
+is never refilled with the old version. On a standalone server all handles
+read from the same node.
+
+To try it against a local three-member replica set, see
+read_routing_check.py.
+"""
+
+import os
+import time
+
+from pymongo.read_preferences import SecondaryPreferred
+
+READ_ROUTING_ENABLED = os.environ.get("READ_ROUTING_ENABLED", "true").lower() == "true"
+# MongoDB rejects anything below 90s (heartbeat interval + idle write period)
+READ_MAX_STALENESS_SECONDS = max(90, int(os.environ.get("READ_MAX_STALENESS_SECONDS", 90)))
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", READ_MAX_STALENESS_SECONDS))
+
+
+class ReadRouter:
+    def __init__(self, client, db_name: str, enabled: bool = READ_ROUTING_ENABLED,
+                 max_staleness: int = READ_MAX_STALENESS_SECONDS,
+                 pin_seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.primary = client[db_name]
+        self.secondary = client.get_database(
+            db_name, read_preference=SecondaryPreferred(max_staleness=max_staleness)
+        ) if enabled else self.primary
+        self.pin_seconds = pin_seconds
+        self._written = {}  # collection -> time.monotonic() of the last write seen
+
+    def mark_write(self, collection: str):
+        self._written[collection] = time.monotonic()
+
+    def pinned(self, collection: str) -> bool:
+        written = self._written.get(collection)
+        return written is not None and time.monotonic() - written < self.pin_seconds
+
+    def db_for(self, collection: str):
+        """Database handle for a lag-tolerant read of `collection`"""
+        return self.primary if self.pinned(collection) else self.secondary
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""
+BeautyBar609 Read Routing Check
+Verifies read_routing.ReadRouter against a real replica set: lag-tolerant
+reads land on a secondary, a collection that was just written is read from
+the primary, and an admin sees their own edit immediately.
+
+Start a local three-member replica set, for example:
+
+    mkdir -p /tmp/rs/0 /tmp/rs/1 /tmp/rs/2
+    for i in 0 1 2; do
+        mongod --replSet rs0 --port $((27017 + i)) --dbpath /tmp/rs/$i \\
+               --bind_ip localhost --fork --logpath /tmp/rs/$i.log
+    done
+    mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+
+Usage:
+    MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \\
+        python read_routing_check.py [--reads 20]
+
+Works in a scratch database, which is dropped afterwards. Exits non-zero
+if a check fails.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import WriteConcern, monitoring
+
+from read_routing import READ_MAX_STALENESS_SECONDS, ReadRouter
+
+CHECK_DB = "beautybar609_routing_check"
+
+
+class FindRecorder(monitoring.CommandListener):
+    """Remembers which server each find command was sent to"""
+
+    def __init__(self):
+        self.addresses = []
+
+    def started(self, event):
+        if event.command_name == "find" and event.database_name == CHECK_DB:
+            self.addresses.append(event.connection_id)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def wait_for_topology(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.primary and client.secondaries:
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def run_checks(reads: int) -> list:
+    recorder = FindRecorder()
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[recorder])
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"  [{'PASS' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    try:
+        hello = await client.admin.command("hello")
+        if not hello.get("setName"):
+            print("MONGO_URL does not point at a replica set")
+            return [False]
+        ready = await wait_for_topology(client)
+        print(f"Replica set {hello['setName']}: {len(hello.get('hosts', []))} members, "
+              f"maxStalenessSeconds={READ_MAX_STALENESS_SECONDS}")
+        check("primary and secondaries discovered", ready,
+              f"primary={client.primary}, secondaries={sorted(client.secondaries)}")
+        if not ready:
+            return results
+
+        router = ReadRouter(client, CHECK_DB)
+        services = router.primary.get_collection("services", write_concern=WriteConcern("majority"))
+        await services.insert_one({"id": "check", "title": "Original"})
+
+        recorder.addresses.clear()
+        for _ in range(reads):
+            await router.db_for("services").services.find_one({"id": "check"})
+        on_secondary = [a for a in recorder.addresses if a in client.secondaries]
+        check("lag-tolerant reads go to secondaries", len(on_secondary) == reads,
+              f"{len(on_secondary)}/{reads} on a secondary")
+
+        # An admin edit: acknowledged by the primary only, then read straight back
+        await router.primary.services.update_one({"id": "check"}, {"$set": {"title": "Edited"}})
+        router.mark_write("services")
+        recorder.addresses.clear()
+        doc = await router.db_for("services").services.find_one({"id": "check"})
+        check("reads of a just-written collection go to the primary",
+              recorder.addresses == [client.primary], f"read from {recorder.addresses}")
+        check("read-your-writes after an edit", doc and doc["title"] == "Edited",
+              f"title={doc and doc['title']!r}")
+
+        recorder.addresses.clear()
+        await router.db_for("analytics").analytics.find_one({})
+        check("other collections stay on secondaries while one is pinned",
+              all(a in client.secondaries for a in recorder.addresses), f"read from {recorder.addresses}")
+    finally:
+        await client.drop_database(CHECK_DB)
+        client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=20, help="Routed reads to sample")
+    args = parser.parse_args()
+    results = asyncio.run(run_checks(args.reads))
+    sys.exit(0 if results and all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Daily visit order for home-service stylists.
+
+Addresses are free text, so each booking is placed at the centroid of the
+Lagos area its address mentions (LAGOS_AREAS; the last area named wins, so
+"12 Allen Avenue, Opebi, Ikeja" is Ikeja). Centroids are approximate. They
+are good for ordering visits, not for turn-by-turn directions. Bookings
+whose address names no known area are returned as unresolved.
+
+Travel time is the great-circle distance times ROUTE_DETOUR_FACTOR at
+ROUTE_SPEED_KMH, with ROUTE_SAME_AREA_MINUTES between two addresses in the
+same area. Only distinct areas go into the distance matrix, so it stays
+small however many bookings a day has.
+
+Each booking must start within ROUTE_WINDOW_MINUTES after its preferred
+time. A stylist who arrives early waits, and a late start is penalised by
+ROUTE_LATE_PENALTY per minute.
+
+A booking holding a stylist in the availability bitmaps (`capacity_stylist`,
+see availability.py) stays with that stylist: route n is stylist n - 1 there.
+Planning only chooses its place in that stylist's day. Other bookings go to
+whoever suits them best, and the stylist count grows to cover every stylist
+a booking holds.
+
+1. Nearest neighbour with time windows builds all routes at once. The
+   stylist who is free first takes the booking they can start soonest,
+   among the unheld ones and their own, with lateness heavily penalised.
+   This is O(bookings^2).
+2. 2-opt then reverses segments of each route while that lowers travel
+   plus lateness. ROUTE_OPTIMISE_BUDGET_MS is shared out between routes.
+
+Each route starts and ends at the salon (ROUTE_DEPOT_AREA).
+"""
+
+import heapq
+import math
+import os
+import re
+import time
+from typing import List, Optional
+
+from booking_reminders import BOOKING_TIMEZONE, parse_booking_start
+
+ROUTE_DEPOT_AREA = os.environ.get("ROUTE_DEPOT_AREA", "Abule Egba")
+ROUTE_DAY_START = os.environ.get("ROUTE_DAY_START", "08:00")
+ROUTE_DAY_END = os.environ.get("ROUTE_DAY_END", "19:00")
+ROUTE_SERVICE_MINUTES = float(os.environ.get("ROUTE_SERVICE_MINUTES", 90))
+ROUTE_WINDOW_MINUTES = float(os.environ.get("ROUTE_WINDOW_MINUTES", 60))
+ROUTE_SPEED_KMH = float(os.environ.get("ROUTE_SPEED_KMH", 20))
+ROUTE_DETOUR_FACTOR = float(os.environ.get("ROUTE_DETOUR_FACTOR", 1.4))
+ROUTE_SAME_AREA_MINUTES = float(os.environ.get("ROUTE_SAME_AREA_MINUTES", 10))
+ROUTE_LATE_PENALTY = float(os.environ.get("ROUTE_LATE_PENALTY", 10))
+ROUTE_OPTIMISE_BUDGET_MS = float(os.environ.get("ROUTE_OPTIMISE_BUDGET_MS", 500))
+
+# Approximate area centroids (latitude, longitude)
+LAGOS_AREAS = {
+    "Abule Egba": (6.6470, 3.3010), "Agege": (6.6180, 3.3210), "Ajah": (6.4667, 3.5667),
+    "Ajegunle": (6.4560, 3.3340), "Akoka": (6.5200, 3.3890), "Alausa": (6.6150, 3.3590),
+    "Amuwo Odofin": (6.4650, 3.2950), "Anthony": (6.5620, 3.3700), "Apapa": (6.4490, 3.3590),
+    "Badore": (6.4890, 3.5900), "Berger": (6.6410, 3.3690), "Chevron": (6.4400, 3.5300),
+    "Ebute Metta": (6.4850, 3.3800), "Egbeda": (6.5920, 3.2900), "Ejigbo": (6.5500, 3.3000),
+    "Festac": (6.4660, 3.2830), "Gbagada": (6.5550, 3.3890), "Idimu": (6.5830, 3.2600),
+    "Igando": (6.5560, 3.2470), "Ikate": (6.4400, 3.4900), "Ikeja": (6.6018, 3.3515),
+    "Ikorodu": (6.6194, 3.5105), "Ikotun": (6.5500, 3.2650), "Ikoyi": (6.4520, 3.4350),
+    "Ilupeju": (6.5530, 3.3560), "Isolo": (6.5300, 3.3200), "Iyana Ipaja": (6.6120, 3.2960),
+    "Jakande": (6.4430, 3.5350), "Ketu": (6.5950, 3.3880), "Lagos Island": (6.4550, 3.3940),
+    "Lekki": (6.4400, 3.5000), "Lekki Phase 1": (6.4474, 3.4720), "Magodo": (6.6200, 3.3830),
+    "Maryland": (6.5700, 3.3670), "Mushin": (6.5270, 3.3510), "Obalende": (6.4480, 3.4100),
+    "Ogba": (6.6400, 3.3400), "Ogudu": (6.5750, 3.3920), "Ojo": (6.4600, 3.1800),
+    "Ojodu": (6.6350, 3.3650), "Ojota": (6.5850, 3.3780), "Omole": (6.6300, 3.3700),
+    "Oniru": (6.4350, 3.4500), "Opebi": (6.5960, 3.3640), "Oregun": (6.6100, 3.3700),
+    "Oshodi": (6.5550, 3.3430), "Oworonshoki": (6.5450, 3.4050), "Palmgrove": (6.5420, 3.3670),
+    "Sangotedo": (6.4700, 3.6200), "Satellite Town": (6.4480, 3.2550), "Surulere": (6.5000, 3.3540),
+    "Victoria Island": (6.4281, 3.4219), "Yaba": (6.5095, 3.3711),
+}
+AREA_ALIASES = {
+    "VI": "Victoria Island", "V.I": "Victoria Island", "Lekki Phase One": "Lekki Phase 1",
+    "Festac Town": "Festac", "Ikeja GRA": "Ikeja", "Omole Phase 1": "Omole", "Omole Phase 2": "Omole",
+    "Palm Grove": "Palmgrove", "Ebute-Metta": "Ebute Metta", "Abule-Egba": "Abule Egba",
+    "Iyana-Ipaja": "Iyana Ipaja", "Amuwo-Odofin": "Amuwo Odofin", "Banana Island": "Ikoyi",
+}
+
+_AREA_NAMES = {name.lower(): name for name in LAGOS_AREAS}
+_AREA_NAMES.update({alias.lower(): name for alias, name in AREA_ALIASES.items()})
+# Longest names first, so "Lekki Phase 1" is not read as "Lekki"
+AREA_PATTERN = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(n) for n in sorted(_AREA_NAMES, key=len, reverse=True)) + r")(?![a-z0-9])",
+    re.IGNORECASE,
+)
+
+
+def resolve_area(address: Optional[str]) -> Optional[str]:
+    matches = AREA_PATTERN.findall(address or "")
+    return _AREA_NAMES[matches[-1].lower()] if matches else None
+
+
+def minutes_of_day(clock: str) -> float:
+    hours, minutes = clock.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_clock(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def travel_minutes(a, b) -> float:
+    (lat1, lon1), (lat2, lon2) = a, b
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    km = 2 * 6371 * math.asin(math.sqrt(h)) * ROUTE_DETOUR_FACTOR
+    return km / ROUTE_SPEED_KMH * 60
+
+
+class RoutePlanner:
+    def __init__(self, stops: List[dict], stylists: int, depot: str = ROUTE_DEPOT_AREA,
+                 day_start: Optional[float] = None, budget_ms: float = ROUTE_OPTIMISE_BUDGET_MS):
+        """stops: dicts with area, window_start, window_end, service minutes and stylist
+        (index = stop id; stylist is None unless the booking already holds one)"""
+        self.stops = stops
+        held = [stop["stylist"] for stop in stops if stop.get("stylist") is not None]
+        self.stylists = max(1, stylists, max(held, default=-1) + 1)
+        self.day_start = minutes_of_day(ROUTE_DAY_START) if day_start is None else day_start
+        self.budget = budget_ms / 1000
+        areas = [depot] + sorted({stop["area"] for stop in stops} - {depot})
+        index = {area: i for i, area in enumerate(areas)}
+        self.node = [index[stop["area"]] for stop in stops]
+        self.depot = 0
+        self.matrix = [[ROUTE_SAME_AREA_MINUTES if i == j else travel_minutes(LAGOS_AREAS[a], LAGOS_AREAS[b])
+                        for j, b in enumerate(areas)] for i, a in enumerate(areas)]
+
+    def travel(self, frm: Optional[int], to: Optional[int]) -> float:
+        """Minutes between two stops; None is the salon"""
+        a = self.depot if frm is None else self.node[frm]
+        b = self.depot if to is None else self.node[to]
+        if frm is None and to is None:
+            return 0.0
+        return self.matrix[a][b]
+
+    def schedule(self, route: List[int], first: int = 0, state=None):
+        """(travel, lateness, timeline) for visiting route in order, starting from the salon
+
+        With `first` and `state` (clock, travel, lateness after route[first - 1]) only
+        the rest of the route is walked; 2-opt keeps the unchanged prefix this way.
+        """
+        clock, travel, lateness = state or (self.day_start, 0.0, 0.0)
+        previous = route[first - 1] if first else None
+        timeline = []
+        for stop_id in route[first:]:
+            stop = self.stops[stop_id]
+            leg = self.travel(previous, stop_id)
+            arrive = clock + leg
+            start = max(arrive, stop["window_start"])
+            late = max(0.0, start - stop["window_end"])
+            clock = start + stop["service_minutes"]
+            travel += leg
+            lateness += late
+            timeline.append({"stop": stop_id, "travel": leg, "arrive": arrive, "start": start,
+                             "depart": clock, "late": late})
+            previous = stop_id
+        travel += self.travel(previous, None) if route else 0.0
+        return travel, lateness, timeline
+
+    def cost(self, route: List[int], first: int = 0, state=None) -> float:
+        travel, lateness, _ = self.schedule(route, first, state)
+        return travel + ROUTE_LATE_PENALTY * lateness
+
+    def prefix_states(self, route: List[int]) -> list:
+        """states[i] = (clock, travel, lateness) after the first i stops"""
+        _, _, timeline = self.schedule(route)
+        states = [(self.day_start, 0.0, 0.0)]
+        travel = lateness = 0.0
+        for step in timeline:
+            travel += step["travel"]
+            lateness += step["late"]
+            states.append((step["depart"], travel, lateness))
+        return states
+
+    def nearest_neighbour(self) -> List[List[int]]:
+        routes = [[] for _ in range(self.stylists)]
+        free = [(self.day_start, s) for s in range(self.stylists)]  # (free from, stylist)
+        unassigned = set(range(len(self.stops)))
+        while unassigned:
+            if not free:
+                break
+            clock, s = heapq.heappop(free)
+            previous = routes[s][-1] if routes[s] else None
+            best = None
+            for stop_id in unassigned:
+                stop = self.stops[stop_id]
+                if stop.get("stylist") not in (None, s):
+                    continue  # held by another stylist
+                start = max(clock + self.travel(previous, stop_id), stop["window_start"])
+                late = max(0.0, start - stop["window_end"])
+                # Soonest start, tie-broken by the tightest window
+                score = (start - clock + ROUTE_LATE_PENALTY * late, stop["window_end"])
+                if best is None or score < best[0]:
+                    best = (score, stop_id, start)
+            if best is None:
+                continue  # what is left belongs to others; this stylist is done
+            _, stop_id, start = best
+            routes[s].append(stop_id)
+            unassigned.discard(stop_id)
+            heapq.heappush(free, (start + self.stops[stop_id]["service_minutes"], s))
+        return routes
+
+    def two_opt(self, route: List[int], deadline: float) -> List[int]:
+        best_cost = self.cost(route)
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            states = self.prefix_states(route)
+            for i in range(len(route) - 1):
+                for j in range(i + 1, len(route)):
+                    candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                    candidate_cost = self.cost(candidate, i, states[i])
+                    if candidate_cost < best_cost - 1e-9:
+                        route, best_cost, improved = candidate, candidate_cost, True
+                        states = self.prefix_states(route)
+                if time.perf_counter() >= deadline:
+                    break
+        return route
+
+    def plan(self) -> List[List[int]]:
+        routes = self.nearest_neighbour()
+        deadline = time.perf_counter() + self.budget
+        improved = []
+        for number, route in enumerate(routes):
+            # Time left, split evenly between the routes still to improve
+            now = time.perf_counter()
+            improved.append(self.two_opt(route, now + max(0.0, deadline - now) / (len(routes) - number)))
+        return improved
+
+
+def booking_window(booking: dict):
+    """(window start, window end) in local minutes of the day"""
+    start = parse_booking_start(booking.get("preferred_date"), booking.get("preferred_time"))
+    if start is None:
+        return minutes_of_day(ROUTE_DAY_START), minutes_of_day(ROUTE_DAY_END)
+    local = start.astimezone(BOOKING_TIMEZONE)
+    minutes = local.hour * 60 + local.minute
+    return minutes, minutes + ROUTE_WINDOW_MINUTES
+
+
+def plan_routes(bookings: List[dict], stylists: int) -> dict:
+    """Visit order per stylist for one day's bookings; CPU-bound, run it in a thread"""
+    started = time.perf_counter()
+    stops, unresolved = [], []
+    for booking in bookings:
+        area = resolve_area(booking.get("address"))
+        if area is None:
+            unresolved.append(booking)
+            continue
+        window_start, window_end = booking_window(booking)
+        held = booking.get("capacity_stylist") if booking.get("capacity_status") == "held" else None
+        stops.append({"booking": booking, "area": area, "window_start": window_start,
+                      "window_end": window_end, "service_minutes": ROUTE_SERVICE_MINUTES, "stylist": held})
+
+    planner = RoutePlanner(stops, stylists)
+    routes = []
+    for number, route in enumerate(planner.plan(), start=1):
+        travel, lateness, timeline = planner.schedule(route)
+        visits = []
+        for step in timeline:
+            stop = stops[step["stop"]]
+            booking = stop["booking"]
+            visits.append({
+                "booking_id": booking.get("id"), "name": booking.get("name"), "phone": booking.get("phone"),
+                "address": booking.get("address"), "area": stop["area"], "service": booking.get("service"),
+                "preferred_time": booking.get("preferred_time"),
+                "window": [format_clock(stop["window_start"]), format_clock(stop["window_end"])],
+                "travel_minutes": round(step["travel"]), "arrive": format_clock(step["arrive"]),
+                "start": format_clock(step["start"]), "finish": format_clock(step["depart"]),
+                "late_minutes": round(step["late"]),
+            })
+        routes.append({
+            "stylist": number,
+            "visits": visits,
+            "travel_minutes": round(travel),
+            "late_minutes": round(lateness),
+            "return_to_salon": format_clock(timeline[-1]["depart"] + planner.travel(route[-1], None)) if route else None,
+        })
+    return {
+        "depot": ROUTE_DEPOT_AREA,
+        "routes": routes,
+        "unresolved": [{"booking_id": b.get("id"), "name": b.get("name"), "address": b.get("address")}
+                       for b in unresolved],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -1,11 +1,9 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Request, Response, Query, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 import os
 import logging
 from pathlib import Path
@@ -14,26 +12,99 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
-import bcrypt
 import base64
-import requests
+import functools
+import asyncio
+import json
 
-# SendGrid
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+# bcrypt, jinja2, requests, sendgrid and slowapi are imported lazily on first use so
+# that cold starts (e.g. workers that never send email) don't pay for them.
+# Run `python startup_benchmark.py` to check import time after changes here.
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics (imported after .env is loaded so PROMETHEUS_MULTIPROC_DIR applies)
+from metrics import (
+    CONTENT_TYPE_LATEST, MetricsMiddleware, MongoMetricsListener, mark_process_dead,
+    observe_outbound, record_outbound_error, render_metrics,
+)
+from slow_queries import SlowQueryListener, build_explain_command, summarize_plan
+from profiling import PROFILING_ENABLED, ProfilingMiddleware, list_profiles, profile_path
+from loop_watchdog import LOOP_WATCHDOG_ENABLED, LoopWatchdog
+from tracing import TRACING_ENABLED, TracingCommandListener, TracingMiddleware, exporter as trace_exporter
+from exports import (
+    ANALYTICS_EXPORT_FIELDS, BOOKING_EXPORT_FIELDS, EXPORT_BATCH_SIZE, EXPORT_FORMATS,
+    date_range_query, export_filename, stream_export,
+)
+from live_events import BookingChangeFeed, EventBroker, booking_status_event
+from analytics_archive import AnalyticsArchiver, read_archive, summarize_events
+from analytics_codec import AnalyticsCodec, LegacyAnalyticsMigration
+from analytics_ingest import AnalyticsIngest
+from availability import AVAILABILITY_MAX_DAYS, AVAILABILITY_ON_CONFLICT, SlotCapacity, parse_day
+from booking_reminders import (
+    ACTIVE_BOOKING_STATUSES, BOOKING_REMINDERS_ENABLED, BookingReminderScheduler, reinstated_reminder_fields,
+    reminder_fields,
+)
+from catalog_cache import (
+    CATALOG_CACHE_ENABLED, CATALOG_CACHE_FALLBACK_TTL, CATALOG_CACHE_TTL, CATALOG_COLLECTIONS, CatalogCache,
+    CatalogChangeWatcher
+)
+from catalog_sync import (
+    catalog_write, changes_since, ensure_indexes as ensure_catalog_sync_indexes, record_deletion, update_with_revision
+)
+from emails import BOOKING_DIGEST_ENABLED, BookingDigest, render_email
+from idempotency import IdempotencyError, IdempotencyStore
+from image_proxy import IMAGE_CACHE_CONTROL, ImageProxy, ImageProxyError
+from pricing import PriceTable, PromotionTimeline, QuoteError, normalize_price_items, parse_schedule_time
+from read_routing import ReadRouter
+from route_planning import plan_routes
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+slow_query_log = SlowQueryListener()
+mongo_listeners = [MongoMetricsListener(), slow_query_log]
+if TRACING_ENABLED:
+    mongo_listeners.append(TracingCommandListener())
+client = AsyncIOMotorClient(mongo_url, event_listeners=mongo_listeners)
 db = client[os.environ['DB_NAME']]
+# Lag-tolerant reads (public catalog, analytics summary) may go to secondaries
+read_router = ReadRouter(client, os.environ['DB_NAME'])
+
+# Public catalog cache, invalidated across workers by a change stream
+catalog_cache = CatalogCache()
+catalog_watcher = CatalogChangeWatcher(db, catalog_cache)
+
+# Stored responses for retried POSTs carrying an Idempotency-Key
+idempotency_store = IdempotencyStore(db)
+analytics_codec = AnalyticsCodec(db)
+analytics_archiver = AnalyticsArchiver(db, analytics_codec)
+# Converts events stored before the compact layout, which reads don't see
+analytics_migration = LegacyAnalyticsMigration(db, analytics_codec)
+
+# Compiled prices and promotion schedule, rebuilt whenever they change
+price_table = PriceTable()
+promotion_timeline = PromotionTimeline()
+
+def refresh_compiled_catalog(collection: str):
+    if collection == "prices":
+        price_table.request_refresh(db)
+    elif collection == "promotions":
+        promotion_timeline.request_refresh(db)
+
+catalog_cache.add_listener(refresh_compiled_catalog)
+
+def compiled_catalog_max_age() -> float:
+    # Without the change stream, other workers' writes only show up by expiry
+    return CATALOG_CACHE_TTL if catalog_watcher.running else CATALOG_CACHE_FALLBACK_TTL
+# Read a changed collection from the primary until every secondary has caught up
+catalog_cache.add_listener(read_router.mark_write)
 
 # JWT Settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'beautybar609-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
 
 # SendGrid Settings
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
@@ -45,16 +116,75 @@ TERMII_API_KEY = os.environ.get('TERMII_API_KEY')
 TERMII_SENDER_ID = os.environ.get('TERMII_SENDER_ID', 'BeautyBar')
 
 # Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
+class LazyLimiter:
+    """Drop-in for slowapi's Limiter that defers importing slowapi until a
+    rate-limited endpoint is first called."""
+
+    def __init__(self):
+        self._limiter = None
+
+    def _get_limiter(self):
+        if self._limiter is None:
+            from slowapi import Limiter
+            from slowapi.util import get_remote_address
+            self._limiter = Limiter(key_func=get_remote_address)
+        return self._limiter
+
+    def __getattr__(self, name):
+        # Used by slowapi's handlers via request.app.state.limiter
+        return getattr(self._get_limiter(), name)
+
+    def limit(self, limit_value: str):
+        def decorator(func):
+            limited = None
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                nonlocal limited
+                from slowapi import _rate_limit_exceeded_handler
+                from slowapi.errors import RateLimitExceeded
+                if limited is None:
+                    limited = self._get_limiter().limit(limit_value)(func)
+                try:
+                    return await limited(*args, **kwargs)
+                except RateLimitExceeded as e:
+                    return _rate_limit_exceeded_handler(kwargs["request"], e)
+            return wrapper
+        return decorator
+
+limiter = LazyLimiter()
 
 # Create the main app
 app = FastAPI()
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
+# Batched admin notifications for new bookings (BOOKING_DIGEST_ENABLED)
+booking_digest = BookingDigest(lambda bookings: send_booking_digest(bookings))
+
+# Day-before SMS reminders for home bookings (one worker dispatches at a time)
+booking_reminders = BookingReminderScheduler(db, lambda booking: send_booking_reminder(booking))
+
+# Per-day stylist capacity bitmaps behind /api/availability
+slot_capacity = SlotCapacity(db)
+
+# Bot filtering and sampling of analytics events
+analytics_ingest = AnalyticsIngest()
+
+# Local copies of remote catalog images
+image_proxy = ImageProxy()
+
+# Live admin updates (Server-Sent Events), fed from every worker's writes
+booking_events = EventBroker()
+booking_feed = BookingChangeFeed(db, booking_events)
+
+def publish_booking_event(event_type: str, data: dict):
+    # While the change feed runs it publishes this write (and other workers') itself
+    if not booking_feed.running:
+        booking_events.publish(event_type, data)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -123,12 +253,24 @@ class PromotionCreate(BaseModel):
     description: str
     discount: str
     active: bool = True
+    starts_at: Optional[str] = None  # ISO datetime; None = no start limit
+    ends_at: Optional[str] = None  # ISO datetime; None = runs until disabled
 
 class GalleryImageCreate(BaseModel):
     url: str
     caption: Optional[str] = ""
     order: int = 0
 
+class QuoteItem(BaseModel):
+    name: str
+    category: Optional[str] = None
+    quantity: int = Field(1, ge=1, le=20)
+
+class QuoteRequest(BaseModel):
+    items: List[QuoteItem] = Field(..., min_length=1, max_length=50)
+    service_type: str = "salon"  # "salon" or "home"
+    apply_promotion: bool = True
+
 class AnalyticsEvent(BaseModel):
     page: str
     section: Optional[str] = None
@@ -136,10 +278,12 @@ class AnalyticsEvent(BaseModel):
 
 # ================== AUTH HELPERS ==================
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
+    import bcrypt
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_token(user_id: str, email: str) -> str:
@@ -150,45 +294,25 @@ def create_token(user_id: str, email: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def decode_token(token: str) -> dict:
+    return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+
 # ================== EMAIL HELPERS ==================
 
+def build_password_reset_email(reset_token: str, user_name: str = "User") -> str:
+    """Render the HTML body of the password reset email"""
+    reset_link = f"{FRONTEND_URL}/admin?reset_token={reset_token}"
+    return render_email("password_reset.html", reset_link=reset_link, user_name=user_name)
+
 def send_password_reset_email(to_email: str, reset_token: str, user_name: str = "User") -> bool:
     """Send password reset email via SendGrid"""
     if not SENDGRID_API_KEY:
         logger.warning("SendGrid API key not configured, skipping email")
         return False
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
     
-    reset_link = f"{FRONTEND_URL}/admin?reset_token={reset_token}"
-    
-    html_content = f"""
-    <html>
-    <body style="font-family: 'Helvetica Neue', Arial, sans-serif; background-color: #050505; color: #F9F1D8; padding: 40px;">
-        <div style="max-width: 600px; margin: 0 auto; background-color: #0F0F0F; padding: 40px; border: 1px solid #333;">
-            <h1 style="color: #D4AF37; font-family: Georgia, serif; margin-bottom: 20px;">BeautyBar609</h1>
-            <h2 style="color: #F9F1D8; margin-bottom: 30px;">Password Reset Request</h2>
-            
-            <p style="color: #ccc; line-height: 1.6;">Hi {user_name},</p>
-            
-            <p style="color: #ccc; line-height: 1.6;">We received a request to reset your password. Click the button below to create a new password:</p>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{reset_link}" style="background-color: #D4AF37; color: #050505; padding: 15px 30px; text-decoration: none; font-weight: bold; text-transform: uppercase; letter-spacing: 1px;">Reset Password</a>
-            </div>
-            
-            <p style="color: #888; font-size: 14px;">Or copy this link: <span style="color: #D4AF37;">{reset_link}</span></p>
-            
-            <p style="color: #888; font-size: 14px; margin-top: 30px;">This link expires in 1 hour. If you didn't request this reset, you can safely ignore this email.</p>
-            
-            <hr style="border: none; border-top: 1px solid #333; margin: 30px 0;">
-            
-            <p style="color: #666; font-size: 12px; text-align: center;">
-                BeautyBar609 - Glow From Lashes To Tips<br>
-                57, Arowolo Street, Off Agbe Road, Abule Egba
-            </p>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = build_password_reset_email(reset_token, user_name)
     
     message = Mail(
         from_email=SENDER_EMAIL,
@@ -199,26 +323,77 @@ def send_password_reset_email(to_email: str, reset_token: str, user_name: str =
     
     try:
         sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
+        with observe_outbound("sendgrid"):
+            response = sg.send(message)
         logger.info(f"Password reset email sent to {to_email}, status: {response.status_code}")
+        if response.status_code != 202:
+            record_outbound_error("sendgrid")
         return response.status_code == 202
     except Exception as e:
         logger.error(f"Failed to send password reset email: {str(e)}")
         return False
 
-def send_sms_notification(phone: str, message: str) -> bool:
-    """Send SMS via Termii API"""
-    if not TERMII_API_KEY:
-        logger.warning("Termii API key not configured, skipping SMS")
+def build_booking_notification_email(booking: HomeBookingRequest, sms_sent: bool) -> str:
+    """Render the HTML body of the admin's new home booking notification"""
+    return render_email("booking_notification.html", booking=booking, sms_sent=sms_sent)
+
+def build_booking_digest_email(bookings: List[dict]) -> str:
+    """Render the admin's summary of several new home bookings"""
+    return render_email(
+        "booking_digest.html",
+        bookings=bookings,
+        first_at=bookings[0]["received_at"].strftime("%Y-%m-%d %H:%M"),
+        last_at=bookings[-1]["received_at"].strftime("%Y-%m-%d %H:%M"),
+        dashboard_link=f"{FRONTEND_URL}/admin",
+    )
+
+def send_admin_email(subject: str, html_content: str) -> bool:
+    """Send a notification to the admin (SENDER_EMAIL) via SendGrid"""
+    if not SENDGRID_API_KEY:
         return False
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
     
-    # Format phone number for Nigeria
+    message = Mail(
+        from_email=SENDER_EMAIL,
+        to_emails=SENDER_EMAIL,
+        subject=subject,
+        html_content=html_content
+    )
+    try:
+        sg = SendGridAPIClient(SENDGRID_API_KEY)
+        with observe_outbound("sendgrid"):
+            response = sg.send(message)
+        if response.status_code != 202:
+            record_outbound_error("sendgrid")
+        return response.status_code == 202
+    except Exception as e:
+        logger.error(f"Failed to send admin email: {e}")
+        return False
+
+def send_booking_digest(bookings: List[dict]) -> bool:
+    count = len(bookings)
+    subject = f"{count} New Home Service Booking{'s' if count != 1 else ''}"
+    return send_admin_email(subject, build_booking_digest_email(bookings))
+
+def normalize_phone_number(phone: str) -> str:
+    """Format a Nigerian phone number as 234XXXXXXXXXX for Termii"""
     phone_formatted = phone.replace(" ", "").replace("-", "")
     if phone_formatted.startswith("0"):
         phone_formatted = "234" + phone_formatted[1:]
     elif not phone_formatted.startswith("234") and not phone_formatted.startswith("+234"):
         phone_formatted = "234" + phone_formatted
-    phone_formatted = phone_formatted.replace("+", "")
+    return phone_formatted.replace("+", "")
+
+def send_sms_notification(phone: str, message: str) -> bool:
+    """Send SMS via Termii API"""
+    if not TERMII_API_KEY:
+        logger.warning("Termii API key not configured, skipping SMS")
+        return False
+    import requests
+    
+    # Format phone number for Nigeria
+    phone_formatted = normalize_phone_number(phone)
     
     url = "https://api.ng.termii.com/api/sms/send"
     payload = {
@@ -231,22 +406,29 @@ def send_sms_notification(phone: str, message: str) -> bool:
     }
     
     try:
-        response = requests.post(url, json=payload)
-        result = response.json()
+        with observe_outbound("termii"):
+            response = requests.post(url, json=payload)
+            result = response.json()
         logger.info(f"Termii SMS response: {result}")
         if result.get("code") == "ok" or result.get("message_id"):
             logger.info(f"SMS sent successfully to {phone_formatted}")
             return True
         else:
             logger.error(f"SMS failed: {result}")
+            record_outbound_error("termii")
             return False
     except Exception as e:
         logger.error(f"Failed to send SMS: {str(e)}")
         return False
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def send_booking_reminder(booking: dict) -> bool:
+    """Day-before reminder SMS, sent by the booking reminder scheduler"""
+    sms_message = f"Hi {booking['name']}! Reminder: your BeautyBar609 home service ({booking['service']}) is on {booking['preferred_date']} at {booking['preferred_time']}. Call 08058578131 for queries."
+    return send_sms_notification(booking["phone"], sms_message)
+
+async def get_user_from_token(token: str):
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_token(token)
         user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
@@ -256,6 +438,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_user_from_token(credentials.credentials)
+
+async def is_admin_token(token: str) -> bool:
+    """Same check as get_current_user, so a deleted admin's token is refused"""
+    try:
+        await get_user_from_token(token)
+        return True
+    except HTTPException:
+        return False
+
 # ================== AUTH ROUTES ==================
 
 @api_router.post("/auth/register")
@@ -357,17 +550,22 @@ async def reset_password(request: PasswordReset):
 
 @api_router.get("/services")
 async def get_services():
-    services = await db.services.find({}, {"_id": 0}).sort("order", 1).to_list(100)
+    services = await catalog_cache.get(
+        "services", None, lambda: read_router.db_for("services").services.find({}, {"_id": 0}).sort("order", 1).to_list(100)
+    )
     return services
 
 @api_router.post("/services")
 async def create_service(service: ServiceCreate, user: dict = Depends(get_current_user)):
-    service_doc = {
-        "id": str(uuid.uuid4()),
-        **service.model_dump(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.services.insert_one(service_doc)
+    async with catalog_write(db) as stamp:
+        service_doc = {
+            "id": str(uuid.uuid4()),
+            **service.model_dump(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **stamp,
+        }
+        await db.services.insert_one(service_doc)
+    catalog_cache.invalidate("services")
     return {k: v for k, v in service_doc.items() if k != "_id"}
 
 @api_router.put("/services/{service_id}")
@@ -376,8 +574,9 @@ async def update_service(service_id: str, service: ServiceUpdate, user: dict = D
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.services.update_one({"id": service_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    matched = await update_with_revision(db.services, {"id": service_id}, update_data)
+    catalog_cache.invalidate("services")
+    if not matched:
         raise HTTPException(status_code=404, detail="Service not found")
     
     updated = await db.services.find_one({"id": service_id}, {"_id": 0})
@@ -386,8 +585,10 @@ async def update_service(service_id: str, service: ServiceUpdate, user: dict = D
 @api_router.delete("/services/{service_id}")
 async def delete_service(service_id: str, user: dict = Depends(get_current_user)):
     result = await db.services.delete_one({"id": service_id})
+    catalog_cache.invalidate("services")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    await record_deletion(db, "services", service_id)
     return {"message": "Service deleted"}
 
 # ================== PRICE LIST ROUTES ==================
@@ -401,24 +602,32 @@ async def get_prices(service_type: Optional[str] = None):
             query["$or"] = [{"service_type": "salon"}, {"service_type": {"$exists": False}}]
         else:
             query["service_type"] = service_type
-    prices = await db.prices.find(query, {"_id": 0}).sort("order", 1).to_list(100)
+    prices = await catalog_cache.get(
+        "prices", service_type, lambda: read_router.db_for("prices").prices.find(query, {"_id": 0}).sort("order", 1).to_list(100)
+    )
     return prices
 
 @api_router.post("/prices")
 async def create_price_category(price: PriceCategoryCreate, user: dict = Depends(get_current_user)):
-    price_doc = {
-        "id": str(uuid.uuid4()),
-        **price.model_dump(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.prices.insert_one(price_doc)
+    async with catalog_write(db) as stamp:
+        price_doc = {
+            "id": str(uuid.uuid4()),
+            **price.model_dump(),
+            "items": normalize_price_items(price.items),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **stamp,
+        }
+        await db.prices.insert_one(price_doc)
+    catalog_cache.invalidate("prices")
     return {k: v for k, v in price_doc.items() if k != "_id"}
 
 @api_router.put("/prices/{price_id}")
 async def update_price_category(price_id: str, price: PriceCategoryCreate, user: dict = Depends(get_current_user)):
     update_data = price.model_dump()
-    result = await db.prices.update_one({"id": price_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    update_data["items"] = normalize_price_items(price.items)
+    matched = await update_with_revision(db.prices, {"id": price_id}, update_data)
+    catalog_cache.invalidate("prices")
+    if not matched:
         raise HTTPException(status_code=404, detail="Price category not found")
     
     updated = await db.prices.find_one({"id": price_id}, {"_id": 0})
@@ -427,23 +636,80 @@ async def update_price_category(price_id: str, price: PriceCategoryCreate, user:
 @api_router.delete("/prices/{price_id}")
 async def delete_price_category(price_id: str, user: dict = Depends(get_current_user)):
     result = await db.prices.delete_one({"id": price_id})
+    catalog_cache.invalidate("prices")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Price category not found")
+    await record_deletion(db, "prices", price_id)
     return {"message": "Price category deleted"}
 
+# ================== QUOTE ROUTES ==================
+
+@api_router.post("/quote")
+async def create_quote(request: QuoteRequest):
+    """Price a basket of services from the compiled price table (no DB reads)"""
+    await price_table.ensure_fresh(db, compiled_catalog_max_age())
+    promotion = None
+    if request.apply_promotion:
+        await promotion_timeline.ensure_fresh(db, compiled_catalog_max_age())
+        promotion = promotion_timeline.active_at()
+    try:
+        return price_table.quote([item.model_dump() for item in request.items], request.service_type, promotion)
+    except QuoteError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ================== HOME BOOKING ROUTES ==================
 
 @api_router.post("/bookings/home")
-async def create_home_booking(booking: HomeBookingRequest):
+async def create_home_booking(
+    booking: HomeBookingRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    if not idempotency_key:
+        return await process_home_booking(booking)
+    
+    # A retry with the same key gets the first response; nothing runs twice
+    try:
+        replay = await idempotency_store.begin("bookings.home", idempotency_key, booking.model_dump())
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if replay is not None:
+        return JSONResponse(replay, headers={"Idempotent-Replayed": "true"})
+    try:
+        result = await process_home_booking(booking)
+    except BaseException:
+        await idempotency_store.release("bookings.home", idempotency_key)
+        raise
+    await idempotency_store.complete("bookings.home", idempotency_key, result, result_id=result["booking_id"])
+    return result
+
+async def take_capacity(preferred_date: str, preferred_time: str) -> dict:
+    capacity = await slot_capacity.reserve_booking(preferred_date, preferred_time)
+    if capacity["capacity_status"] == "conflict" and AVAILABILITY_ON_CONFLICT == "reject":
+        raise HTTPException(status_code=409, detail="That time is fully booked. Please choose another time.")
+    return capacity
+
+async def process_home_booking(booking: HomeBookingRequest) -> dict:
+    capacity = await take_capacity(booking.preferred_date, booking.preferred_time)
     booking_doc = {
         "id": str(uuid.uuid4()),
         **booking.model_dump(),
         "status": "pending",
         "booking_type": "home",
         "sms_sent": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **reminder_fields(booking.preferred_date, booking.preferred_time),
+        **capacity
     }
-    await db.bookings.insert_one(booking_doc)
+    try:
+        await db.bookings.insert_one(booking_doc)
+    except BaseException:
+        if capacity["capacity_status"] == "held":
+            await slot_capacity.release(parse_day(booking.preferred_date).isoformat(),
+                                        capacity["capacity_slot"], capacity["capacity_stylist"],
+                                        capacity["capacity_slots"])
+        raise
+    booking_reminders.notify(booking_doc.get("reminder_due_at"))
+    publish_booking_event("booking.created", {k: v for k, v in booking_doc.items() if k != "_id"})
     
     # Send SMS confirmation to customer
     sms_message = f"Hi {booking.name}! Your BeautyBar609 home service booking is received. Service: {booking.service}, Date: {booking.preferred_date} at {booking.preferred_time}. We'll confirm shortly. Call 08058578131 for queries."
@@ -455,35 +721,13 @@ async def create_home_booking(booking: HomeBookingRequest):
     
     # Send notification email to admin if SendGrid configured
     if SENDGRID_API_KEY:
-        try:
-            html_content = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; background-color: #050505; color: #F9F1D8; padding: 20px;">
-                <div style="max-width: 600px; margin: 0 auto; background-color: #0F0F0F; padding: 30px; border: 1px solid #333;">
-                    <h1 style="color: #D4AF37;">New Home Service Booking!</h1>
-                    <p><strong>Client:</strong> {booking.name}</p>
-                    <p><strong>Phone:</strong> {booking.phone}</p>
-                    <p><strong>Email:</strong> {booking.email or 'Not provided'}</p>
-                    <p><strong>Service:</strong> {booking.service}</p>
-                    <p><strong>Date:</strong> {booking.preferred_date}</p>
-                    <p><strong>Time:</strong> {booking.preferred_time}</p>
-                    <p><strong>Address:</strong> {booking.address}</p>
-                    <p><strong>Notes:</strong> {booking.notes or 'None'}</p>
-                    <p><strong>SMS Sent:</strong> {'Yes' if sms_sent else 'No'}</p>
-                </div>
-            </body>
-            </html>
-            """
-            message = Mail(
-                from_email=SENDER_EMAIL,
-                to_emails=SENDER_EMAIL,
-                subject=f"New Home Service Booking - {booking.name}",
-                html_content=html_content
+        if BOOKING_DIGEST_ENABLED:
+            booking_digest.add({**booking_doc, "sms_sent": sms_sent})
+        else:
+            send_admin_email(
+                f"New Home Service Booking - {booking.name}",
+                build_booking_notification_email(booking, sms_sent)
             )
-            sg = SendGridAPIClient(SENDGRID_API_KEY)
-            sg.send(message)
-        except Exception as e:
-            logger.error(f"Failed to send booking notification: {e}")
     
     return {"message": "Booking request submitted successfully", "booking_id": booking_doc["id"], "sms_sent": sms_sent}
 
@@ -492,6 +736,16 @@ async def get_bookings(user: dict = Depends(get_current_user)):
     bookings = await db.bookings.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
     return bookings
 
+@api_router.get("/bookings/stream")
+async def stream_bookings(request: Request, user: dict = Depends(get_current_user)):
+    """SSE feed of booking.created / booking.status events; resumes from Last-Event-ID"""
+    return StreamingResponse(
+        booking_events.subscribe(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 class StatusUpdate(BaseModel):
     status: str
 
@@ -505,7 +759,23 @@ async def update_booking_status(booking_id: str, data: StatusUpdate, user: dict
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    result = await db.bookings.update_one({"id": booking_id}, {"$set": {"status": data.status}})
+    # Cancelling frees the stylist; reinstating a cancelled booking takes one again
+    capacity = {}
+    if data.status == "cancelled":
+        await slot_capacity.release_booking(booking)
+    elif booking.get("status") == "cancelled" and booking.get("capacity_status") != "held":
+        capacity = await take_capacity(booking["preferred_date"], booking["preferred_time"])
+    # A reminder skipped while the booking was inactive is due again
+    reminder = {}
+    if data.status in ACTIVE_BOOKING_STATUSES and booking.get("status") not in ACTIVE_BOOKING_STATUSES:
+        reminder = reinstated_reminder_fields(booking)
+    
+    result = await db.bookings.update_one(
+        {"id": booking_id},
+        # previous_status lets the change feed publish the same event as the local path
+        {"$set": {"status": data.status, "previous_status": booking.get("status"), **capacity, **reminder}})
+    booking_reminders.notify(reminder.get("reminder_due_at"))
+    publish_booking_event("booking.status", booking_status_event(booking_id, data.status, booking.get("status")))
     
     # Send SMS notification for status changes
     if data.status == "confirmed":
@@ -521,24 +791,30 @@ async def update_booking_status(booking_id: str, data: StatusUpdate, user: dict
 
 @api_router.get("/testimonials")
 async def get_testimonials():
-    testimonials = await db.testimonials.find({}, {"_id": 0}).to_list(100)
+    testimonials = await catalog_cache.get(
+        "testimonials", None, lambda: read_router.db_for("testimonials").testimonials.find({}, {"_id": 0}).to_list(100)
+    )
     return testimonials
 
 @api_router.post("/testimonials")
 async def create_testimonial(testimonial: TestimonialCreate, user: dict = Depends(get_current_user)):
-    testimonial_doc = {
-        "id": str(uuid.uuid4()),
-        **testimonial.model_dump(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.testimonials.insert_one(testimonial_doc)
+    async with catalog_write(db) as stamp:
+        testimonial_doc = {
+            "id": str(uuid.uuid4()),
+            **testimonial.model_dump(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **stamp,
+        }
+        await db.testimonials.insert_one(testimonial_doc)
+    catalog_cache.invalidate("testimonials")
     return {k: v for k, v in testimonial_doc.items() if k != "_id"}
 
 @api_router.put("/testimonials/{testimonial_id}")
 async def update_testimonial(testimonial_id: str, testimonial: TestimonialCreate, user: dict = Depends(get_current_user)):
     update_data = testimonial.model_dump()
-    result = await db.testimonials.update_one({"id": testimonial_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    matched = await update_with_revision(db.testimonials, {"id": testimonial_id}, update_data)
+    catalog_cache.invalidate("testimonials")
+    if not matched:
         raise HTTPException(status_code=404, detail="Testimonial not found")
     
     updated = await db.testimonials.find_one({"id": testimonial_id}, {"_id": 0})
@@ -547,45 +823,61 @@ async def update_testimonial(testimonial_id: str, testimonial: TestimonialCreate
 @api_router.delete("/testimonials/{testimonial_id}")
 async def delete_testimonial(testimonial_id: str, user: dict = Depends(get_current_user)):
     result = await db.testimonials.delete_one({"id": testimonial_id})
+    catalog_cache.invalidate("testimonials")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Testimonial not found")
+    await record_deletion(db, "testimonials", testimonial_id)
     return {"message": "Testimonial deleted"}
 
 # ================== PROMOTIONS ROUTES ==================
 
 @api_router.get("/promotions")
 async def get_promotions():
-    promotions = await db.promotions.find({}, {"_id": 0}).to_list(100)
+    promotions = await catalog_cache.get(
+        "promotions", None, lambda: read_router.db_for("promotions").promotions.find({}, {"_id": 0}).to_list(100)
+    )
     return promotions
 
 @api_router.get("/promotions/active")
 async def get_active_promotion():
-    promotion = await db.promotions.find_one({"active": True}, {"_id": 0})
-    return promotion
+    await promotion_timeline.ensure_fresh(db, compiled_catalog_max_age())
+    return promotion_timeline.active_at()
+
+def promotion_schedule(promotion: PromotionCreate) -> dict:
+    """Validated starts_at / ends_at, normalized to UTC ISO strings"""
+    try:
+        starts_at = parse_schedule_time(promotion.starts_at)
+        ends_at = parse_schedule_time(promotion.ends_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="starts_at and ends_at must be ISO datetimes")
+    if starts_at and ends_at and ends_at <= starts_at:
+        raise HTTPException(status_code=400, detail="ends_at must be after starts_at")
+    return {
+        "starts_at": starts_at.astimezone(timezone.utc).isoformat() if starts_at else None,
+        "ends_at": ends_at.astimezone(timezone.utc).isoformat() if ends_at else None,
+    }
 
 @api_router.post("/promotions")
 async def create_promotion(promotion: PromotionCreate, user: dict = Depends(get_current_user)):
-    # Deactivate other promotions if this one is active
-    if promotion.active:
-        await db.promotions.update_many({}, {"$set": {"active": False}})
-    
-    promotion_doc = {
-        "id": str(uuid.uuid4()),
-        **promotion.model_dump(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.promotions.insert_one(promotion_doc)
+    # Several promotions may be enabled; the timeline decides which one is live
+    async with catalog_write(db) as stamp:
+        promotion_doc = {
+            "id": str(uuid.uuid4()),
+            **promotion.model_dump(),
+            **promotion_schedule(promotion),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **stamp,
+        }
+        await db.promotions.insert_one(promotion_doc)
+    catalog_cache.invalidate("promotions")
     return {k: v for k, v in promotion_doc.items() if k != "_id"}
 
 @api_router.put("/promotions/{promotion_id}")
 async def update_promotion(promotion_id: str, promotion: PromotionCreate, user: dict = Depends(get_current_user)):
-    # Deactivate other promotions if this one is active
-    if promotion.active:
-        await db.promotions.update_many({"id": {"$ne": promotion_id}}, {"$set": {"active": False}})
-    
-    update_data = promotion.model_dump()
-    result = await db.promotions.update_one({"id": promotion_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    update_data = {**promotion.model_dump(), **promotion_schedule(promotion)}
+    matched = await update_with_revision(db.promotions, {"id": promotion_id}, update_data)
+    catalog_cache.invalidate("promotions")
+    if not matched:
         raise HTTPException(status_code=404, detail="Promotion not found")
     
     updated = await db.promotions.find_one({"id": promotion_id}, {"_id": 0})
@@ -594,25 +886,32 @@ async def update_promotion(promotion_id: str, promotion: PromotionCreate, user:
 @api_router.delete("/promotions/{promotion_id}")
 async def delete_promotion(promotion_id: str, user: dict = Depends(get_current_user)):
     result = await db.promotions.delete_one({"id": promotion_id})
+    catalog_cache.invalidate("promotions")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Promotion not found")
+    await record_deletion(db, "promotions", promotion_id)
     return {"message": "Promotion deleted"}
 
 # ================== GALLERY ROUTES ==================
 
 @api_router.get("/gallery")
 async def get_gallery():
-    images = await db.gallery.find({}, {"_id": 0}).sort("order", 1).to_list(100)
+    images = await catalog_cache.get(
+        "gallery", None, lambda: read_router.db_for("gallery").gallery.find({}, {"_id": 0}).sort("order", 1).to_list(100)
+    )
     return images
 
 @api_router.post("/gallery")
 async def create_gallery_image(image: GalleryImageCreate, user: dict = Depends(get_current_user)):
-    image_doc = {
-        "id": str(uuid.uuid4()),
-        **image.model_dump(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.gallery.insert_one(image_doc)
+    async with catalog_write(db) as stamp:
+        image_doc = {
+            "id": str(uuid.uuid4()),
+            **image.model_dump(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **stamp,
+        }
+        await db.gallery.insert_one(image_doc)
+    catalog_cache.invalidate("gallery")
     return {k: v for k, v in image_doc.items() if k != "_id"}
 
 @api_router.post("/gallery/upload")
@@ -629,21 +928,25 @@ async def upload_gallery_image(file: UploadFile = File(...), user: dict = Depend
     max_order_doc = await db.gallery.find_one(sort=[("order", -1)])
     new_order = (max_order_doc.get("order", 0) + 1) if max_order_doc else 0
     
-    image_doc = {
-        "id": str(uuid.uuid4()),
-        "url": data_url,
-        "caption": file.filename,
-        "order": new_order,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.gallery.insert_one(image_doc)
+    async with catalog_write(db) as stamp:
+        image_doc = {
+            "id": str(uuid.uuid4()),
+            "url": data_url,
+            "caption": file.filename,
+            "order": new_order,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **stamp,
+        }
+        await db.gallery.insert_one(image_doc)
+    catalog_cache.invalidate("gallery")
     return {k: v for k, v in image_doc.items() if k != "_id"}
 
 @api_router.put("/gallery/{image_id}")
 async def update_gallery_image(image_id: str, image: GalleryImageCreate, user: dict = Depends(get_current_user)):
     update_data = image.model_dump()
-    result = await db.gallery.update_one({"id": image_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    matched = await update_with_revision(db.gallery, {"id": image_id}, update_data)
+    catalog_cache.invalidate("gallery")
+    if not matched:
         raise HTTPException(status_code=404, detail="Image not found")
     
     updated = await db.gallery.find_one({"id": image_id}, {"_id": 0})
@@ -652,89 +955,319 @@ async def update_gallery_image(image_id: str, image: GalleryImageCreate, user: d
 @api_router.delete("/gallery/{image_id}")
 async def delete_gallery_image(image_id: str, user: dict = Depends(get_current_user)):
     result = await db.gallery.delete_one({"id": image_id})
+    catalog_cache.invalidate("gallery")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Image not found")
+    await record_deletion(db, "gallery", image_id)
     return {"message": "Image deleted"}
 
+# ================== AVAILABILITY ROUTES ==================
+
+@api_router.get("/availability")
+async def get_availability(date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to")):
+    """Free stylists per home service time slot for each day from..to (YYYY-MM-DD, inclusive)"""
+    first, last = parse_day(date_from), parse_day(date_to)
+    if first is None or last is None:
+        raise HTTPException(status_code=400, detail="Invalid date, use YYYY-MM-DD")
+    if last < first:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (last - first).days >= AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {AVAILABILITY_MAX_DAYS} days at a time")
+    days = await slot_capacity.availability(first, last)
+    return JSONResponse({"days": days}, headers={"Cache-Control": "no-store"})
+
+# ================== ROUTE PLANNING ROUTES ==================
+
+@api_router.get("/admin/routes")
+async def get_daily_routes(
+    date: str,
+    stylists: int = Query(1, ge=1, le=50),
+    user: dict = Depends(get_current_user)
+):
+    """Visit order per stylist for the confirmed home bookings of one day (YYYY-MM-DD)"""
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, use YYYY-MM-DD")
+    bookings = await db.bookings.find(
+        {"booking_type": "home", "status": "confirmed", "preferred_date": date}, {"_id": 0}
+    ).to_list(1000)
+    # CPU-bound; keep the event loop free while it runs
+    plan = await asyncio.to_thread(plan_routes, bookings, stylists)
+    # More than asked for when bookings already hold other stylists
+    return {"date": date, "bookings": len(bookings), "stylists": len(plan["routes"]), **plan}
+
+# ================== IMAGE PROXY ROUTES ==================
+
+@api_router.get("/images")
+async def get_image(request: Request, src: str, w: Optional[int] = Query(None, ge=1, le=4096)):
+    """Serve a remote catalog image from the local cache, optionally resized to width w"""
+    try:
+        path, content_type, cache_status = await image_proxy.get(src, w)
+    except ImageProxyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    etag = f'"{path.name}"'
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": etag, "X-Cache": cache_status}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=content_type, headers=headers)
+
+# ================== ADMIN SYNC ROUTES ==================
+
+@api_router.get("/admin/changes")
+async def get_catalog_changes(
+    since: int = Query(0, ge=0),
+    collections: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Catalog documents written and deleted since a revision (0 = everything)"""
+    names = collections.split(",") if collections else list(CATALOG_COLLECTIONS)
+    unknown = [name for name in names if name not in CATALOG_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collection: {', '.join(unknown)}")
+    return await changes_since(db, since, names)
+
 # ================== ANALYTICS ROUTES ==================
 
 @api_router.post("/analytics/track")
-async def track_event(event: AnalyticsEvent):
+async def track_event(event: AnalyticsEvent, request: Request):
+    outcome, weight = analytics_ingest.classify(event.section, event.visitor_id, request.headers.get("user-agent"))
+    if outcome != "stored":
+        # Same response either way, so bots can't tell they're being filtered
+        return {"status": "tracked"}
     event_doc = {
         "id": str(uuid.uuid4()),
         **event.model_dump(),
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": datetime.now(timezone.utc),
+        "weight": weight
     }
-    await db.analytics.insert_one(event_doc)
+    await db.analytics.insert_one(await analytics_codec.encode(event_doc))
     return {"status": "tracked"}
 
+# Sampled events stand for 1 / sample rate events (fields: see analytics_codec)
+EVENT_WEIGHT = {"$ifNull": ["$w", 1]}
+
+async def weighted_views(reads, match: dict) -> int:
+    result = await reads.analytics.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "views": {"$sum": EVENT_WEIGHT}}}
+    ]).to_list(1)
+    return round(result[0]["views"]) if result else 0
+
 @api_router.get("/analytics/summary")
 async def get_analytics_summary(user: dict = Depends(get_current_user)):
+    # Aggregations over the whole collection; a secondary's view is recent enough
+    reads = read_router.db_for("analytics")
+
     # Get date ranges
     now = datetime.now(timezone.utc)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_start = today_start - timedelta(days=7)
     month_start = today_start - timedelta(days=30)
     
-    # Total page views
-    total_views = await db.analytics.count_documents({})
+    # Page views, estimated from sampled events by their weights; all-time includes the archive
+    total_views = await weighted_views(reads, {}) + round(await analytics_archiver.archived_views())
+    today_views = await weighted_views(reads, {"t": {"$gte": today_start}})
+    week_views = await weighted_views(reads, {"t": {"$gte": week_start}})
+    month_views = await weighted_views(reads, {"t": {"$gte": month_start}})
     
-    # Today's views
-    today_views = await db.analytics.count_documents({
-        "timestamp": {"$gte": today_start.isoformat()}
-    })
-    
-    # This week's views
-    week_views = await db.analytics.count_documents({
-        "timestamp": {"$gte": week_start.isoformat()}
-    })
-    
-    # This month's views
-    month_views = await db.analytics.count_documents({
-        "timestamp": {"$gte": month_start.isoformat()}
-    })
-    
-    # Unique visitors (by visitor_id)
+    # Unique visitors (by visitor_id) within retention; exact because page_load is never sampled
     unique_visitors_pipeline = [
-        {"$group": {"_id": "$visitor_id"}},
+        {"$group": {"_id": "$v"}},
         {"$count": "total"}
     ]
-    unique_result = await db.analytics.aggregate(unique_visitors_pipeline).to_list(1)
+    unique_result = await reads.analytics.aggregate(unique_visitors_pipeline).to_list(1)
     unique_visitors = unique_result[0]["total"] if unique_result else 0
     
     # Popular sections
     sections_pipeline = [
-        {"$match": {"section": {"$ne": None}}},
-        {"$group": {"_id": "$section", "count": {"$sum": 1}}},
+        {"$match": {"s": {"$ne": None}}},
+        {"$group": {"_id": "$s", "count": {"$sum": EVENT_WEIGHT}}},
         {"$sort": {"count": -1}},
         {"$limit": 5}
     ]
-    popular_sections = await db.analytics.aggregate(sections_pipeline).to_list(5)
+    popular_sections = await reads.analytics.aggregate(sections_pipeline).to_list(5)
+    section_names = await analytics_codec.decode_sections([s["_id"] for s in popular_sections])
     
-    # Daily views for the last 7 days
+    # Daily views for the last 7 days, in one pass
+    daily_pipeline = [
+        {"$match": {"t": {"$gte": today_start - timedelta(days=6)}}},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$t"}}, "views": {"$sum": EVENT_WEIGHT}}}
+    ]
+    views_by_day = {d["_id"]: d["views"] for d in await reads.analytics.aggregate(daily_pipeline).to_list(None)}
     daily_views = []
     for i in range(7):
-        day = today_start - timedelta(days=i)
-        next_day = day + timedelta(days=1)
-        count = await db.analytics.count_documents({
-            "timestamp": {"$gte": day.isoformat(), "$lt": next_day.isoformat()}
-        })
-        daily_views.append({
-            "date": day.strftime("%Y-%m-%d"),
-            "views": count
-        })
+        day = (today_start - timedelta(days=i)).strftime("%Y-%m-%d")
+        daily_views.append({"date": day, "views": round(views_by_day.get(day, 0))})
     daily_views.reverse()
     
+    # Events dropped as bots over the last 30 days
+    bot_events = 0
+    async for counts in reads.analytics_bot_counts.find({"_id": {"$gte": month_start.strftime("%Y-%m-%d")}}):
+        bot_events += sum(v for k, v in counts.items() if k != "_id")
+    
     return {
         "total_views": total_views,
         "today_views": today_views,
         "week_views": week_views,
         "month_views": month_views,
         "unique_visitors": unique_visitors,
-        "popular_sections": [{"section": s["_id"], "views": s["count"]} for s in popular_sections],
-        "daily_views": daily_views
+        "popular_sections": [{"section": section_names[s["_id"]], "views": round(s["count"])} for s in popular_sections],
+        "daily_views": daily_views,
+        "bot_events_month": bot_events
+    }
+
+# ================== EXPORT ROUTES ==================
+
+def export_query(format, date_field, date_from, date_to, native_dates=False):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format, use csv or ndjson")
+    try:
+        return date_range_query(date_field, date_from, date_to, native_dates)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, use YYYY-MM-DD or an ISO datetime")
+
+def export_response(rows, fields, name, format, gzip):
+    filename = export_filename(name, format, gzip)
+    return StreamingResponse(
+        stream_export(rows, fields, format, compress=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/export/bookings")
+async def export_bookings(
+    format: str = "csv",
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    gzip: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    """Stream all bookings created in [from, to] as CSV or NDJSON"""
+    query = export_query(format, "created_at", date_from, date_to)
+    # _id order is insertion order, so no in-memory sort is needed on large collections
+    cursor = db.bookings.find(query, {"_id": 0}).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    return export_response(cursor, BOOKING_EXPORT_FIELDS, "bookings", format, gzip)
+
+@api_router.get("/admin/export/analytics")
+async def export_analytics(
+    format: str = "csv",
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    gzip: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    """Stream all analytics events recorded in [from, to] as CSV or NDJSON"""
+    query = export_query(format, "t", date_from, date_to, native_dates=True)
+    # Event ids are random UUIDs, so follow the (indexed) timestamp instead of _id
+    cursor = db.analytics.find(query).sort("t", 1).batch_size(EXPORT_BATCH_SIZE)
+    return export_response(analytics_codec.decode_cursor(cursor), ANALYTICS_EXPORT_FIELDS, "analytics", format, gzip)
+
+# ================== ANALYTICS ARCHIVE ROUTES ==================
+
+def archive_range(date_from: Optional[str], date_to: Optional[str]):
+    try:
+        return [datetime.strptime(d, "%Y-%m-%d").date().isoformat() if d else None for d in (date_from, date_to)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, use YYYY-MM-DD")
+
+@api_router.get("/admin/analytics/archive")
+async def list_analytics_archive(user: dict = Depends(get_current_user)):
+    """Archived days with their part, event and view counts"""
+    return {
+        "retention_days": analytics_archiver.retention_days,
+        "cutoff": analytics_archiver.cutoff_day() if analytics_archiver.retention_days > 0 else None,
+        "partitions": await analytics_archiver.partitions(),
+    }
+
+@api_router.post("/admin/analytics/archive/run")
+async def run_analytics_archive(user: dict = Depends(get_current_user)):
+    """Archive everything older than the retention period now"""
+    if analytics_archiver.retention_days <= 0:
+        raise HTTPException(status_code=400, detail="Analytics retention is disabled (ANALYTICS_RETENTION_DAYS)")
+    if analytics_archiver.running:
+        raise HTTPException(status_code=409, detail="The archive job is already running")
+    if not await analytics_archiver.ready():
+        raise HTTPException(status_code=409, detail="Older analytics events are still being converted, try again later")
+    if not await analytics_archiver.lease.acquire():
+        raise HTTPException(status_code=409, detail="The archive job is already running on another worker")
+    return await analytics_archiver.run()
+
+@api_router.get("/admin/analytics/archive/report")
+async def analytics_archive_report(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    section: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Views, unique visitors, popular sections and daily views over archived days [from, to]"""
+    date_from, date_to = archive_range(date_from, date_to)
+    return await asyncio.to_thread(
+        lambda: summarize_events(read_archive(analytics_archiver.root, date_from, date_to, section)))
+
+@api_router.get("/admin/analytics/archive/events")
+async def analytics_archive_events(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    section: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Stream archived events of [from, to] as NDJSON"""
+    date_from, date_to = archive_range(date_from, date_to)
+    events = read_archive(analytics_archiver.root, date_from, date_to, section)
+    # A plain iterator: Starlette reads it in its thread pool
+    return StreamingResponse(
+        (json.dumps(event, ensure_ascii=False) + "\n" for event in events),
+        media_type=EXPORT_FORMATS["ndjson"],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("analytics-archive", "ndjson", False)}"'}
+    )
+
+# ================== ADMIN DIAGNOSTICS ==================
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = 50, explain: bool = False, user: dict = Depends(get_current_user)):
+    """Most recent MongoDB commands slower than SLOW_QUERY_THRESHOLD_MS, newest first"""
+    entries = slow_query_log.recent(limit)
+    if explain:
+        for entry in entries:
+            explain_command = build_explain_command(entry)
+            if entry["plan"] is not None or explain_command is None:
+                continue
+            database = entry["namespace"].split(".", 1)[0]
+            try:
+                result = await client[database].command(explain_command)
+                entry["plan"] = summarize_plan(result)
+            except Exception as e:
+                logger.warning(f"Failed to explain slow query on {entry['namespace']}: {e}")
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "count": len(entries),
+        "queries": entries
     }
 
+@api_router.delete("/admin/slow-queries")
+async def clear_slow_queries(user: dict = Depends(get_current_user)):
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+@api_router.get("/admin/profiles")
+async def get_profiles(user: dict = Depends(get_current_user)):
+    """Stored request profiles, newest first"""
+    return {"enabled": PROFILING_ENABLED, "profiles": list_profiles()}
+
+@api_router.get("/admin/profiles/{name}")
+async def download_profile(name: str, user: dict = Depends(get_current_user)):
+    path = profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/html" if name.endswith(".html") else "application/json"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+@api_router.get("/admin/event-loop")
+async def get_event_loop_health(user: dict = Depends(get_current_user)):
+    """Event-loop lag percentiles and the call sites that blocked the loop most often"""
+    return {"enabled": LOOP_WATCHDOG_ENABLED, **loop_watchdog.summary()}
+
 # ================== SEED DATA ==================
 
 @api_router.post("/seed")
@@ -749,7 +1282,8 @@ async def seed_data(user: dict = Depends(get_current_user)):
             {"id": str(uuid.uuid4()), "title": "Brow Tinting & Lamination", "description": "Perfectly sculpted brows that frame your face", "image": "https://images.unsplash.com/photo-1755274556662-d37485f0677d?q=85&w=800&auto=format&fit=crop", "price": "From ₦12,000", "order": 2, "created_at": datetime.now(timezone.utc).isoformat()},
             {"id": str(uuid.uuid4()), "title": "Microblading", "description": "Semi-permanent brows with natural hair-stroke technique", "image": "https://images.unsplash.com/photo-1755223738688-be7501b937d2?q=85&w=800&auto=format&fit=crop", "price": "From ₦80,000", "order": 3, "created_at": datetime.now(timezone.utc).isoformat()},
         ]
-        await db.services.insert_many(services)
+        async with catalog_write(db) as stamp:
+            await db.services.insert_many([{**doc, **stamp} for doc in services])
     
     # Seed prices if empty
     if await db.prices.count_documents({}) == 0:
@@ -801,7 +1335,10 @@ async def seed_data(user: dict = Depends(get_current_user)):
                 {"name": "Semi-Permanent Tattoo", "price": "From ₦40,000"},
             ], "order": 2, "created_at": datetime.now(timezone.utc).isoformat()},
         ]
-        await db.prices.insert_many(prices)
+        async with catalog_write(db) as stamp:
+            await db.prices.insert_many([
+                {**doc, "items": normalize_price_items(doc["items"]), **stamp} for doc in prices
+            ])
     
     # Seed testimonials if empty
     if await db.testimonials.count_documents({}) == 0:
@@ -812,19 +1349,22 @@ async def seed_data(user: dict = Depends(get_current_user)):
             {"id": str(uuid.uuid4()), "name": "Damilola F.", "text": "Professional service, beautiful results. BeautyBar609 is my new go-to!", "rating": 5, "created_at": datetime.now(timezone.utc).isoformat()},
             {"id": str(uuid.uuid4()), "name": "Favour N.", "text": "The salon is so clean and the staff are so friendly. Highly recommend!", "rating": 5, "created_at": datetime.now(timezone.utc).isoformat()},
         ]
-        await db.testimonials.insert_many(testimonials)
+        async with catalog_write(db) as stamp:
+            await db.testimonials.insert_many([{**doc, **stamp} for doc in testimonials])
     
     # Seed promotions if empty
     if await db.promotions.count_documents({}) == 0:
-        promotion = {
-            "id": str(uuid.uuid4()),
-            "title": "Special Offer",
-            "description": "Book a full set of nails and lashes together and get your total service discount. Valid for first-time clients!",
-            "discount": "15% OFF",
-            "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.promotions.insert_one(promotion)
+        async with catalog_write(db) as stamp:
+            promotion = {
+                "id": str(uuid.uuid4()),
+                "title": "Special Offer",
+                "description": "Book a full set of nails and lashes together and get your total service discount. Valid for first-time clients!",
+                "discount": "15% OFF",
+                "active": True,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                **stamp,
+            }
+            await db.promotions.insert_one(promotion)
     
     # Seed gallery if empty
     if await db.gallery.count_documents({}) == 0:
@@ -836,8 +1376,10 @@ async def seed_data(user: dict = Depends(get_current_user)):
             {"id": str(uuid.uuid4()), "url": "https://images.unsplash.com/photo-1740484674184-77a7629506a5?q=85&w=600&auto=format&fit=crop", "caption": "Beauty Work", "order": 4, "created_at": datetime.now(timezone.utc).isoformat()},
             {"id": str(uuid.uuid4()), "url": "https://images.unsplash.com/photo-1672334115165-f82b6b5e8bee?q=85&w=600&auto=format&fit=crop", "caption": "Lashes", "order": 5, "created_at": datetime.now(timezone.utc).isoformat()},
         ]
-        await db.gallery.insert_many(gallery)
+        async with catalog_write(db) as stamp:
+            await db.gallery.insert_many([{**doc, **stamp} for doc in gallery])
     
+    catalog_cache.invalidate()
     return {"message": "Data seeded successfully"}
 
 # ================== ROOT ROUTE ==================
@@ -846,6 +1388,12 @@ async def seed_data(user: dict = Depends(get_current_user)):
 async def root():
     return {"message": "BeautyBar609 API"}
 
+# ================== METRICS ==================
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 # Include router
 app.include_router(api_router)
 
@@ -858,6 +1406,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request profiling (X-Profile: 1 header or sampling); not installed at all when disabled
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, authorize=is_admin_token)
+
+# Request tracing with X-Request-ID propagation; not installed at all when disabled
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+# Added last so it is outermost and times the whole middleware stack
+app.add_middleware(MetricsMiddleware)
+
+loop_watchdog = LoopWatchdog()
+
+@app.on_event("startup")
+async def start_background_monitors():
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    if TRACING_ENABLED:
+        trace_exporter.start()
+    if CATALOG_CACHE_ENABLED:
+        catalog_watcher.start()
+    booking_feed.start()
+    analytics_ingest.start(db)
+    if BOOKING_REMINDERS_ENABLED and TERMII_API_KEY:
+        booking_reminders.start()
+
+@app.on_event("startup")
+async def ensure_indexes():
+    try:
+        await idempotency_store.ensure_indexes()
+        await analytics_archiver.ensure_indexes()
+        await analytics_codec.ensure_indexes()
+        await booking_reminders.ensure_indexes()
+        await ensure_catalog_sync_indexes(db)
+    except Exception as e:
+        logger.error(f"Failed to create indexes: {e}")
+
+@app.on_event("startup")
+async def migrate_legacy_analytics():
+    try:
+        await analytics_migration.start()
+    except Exception as e:
+        logger.error(f"Failed to check for analytics events in the original layout: {e}")
+    # After the check, so a database with no legacy events is marked converted before the first
+    # run; while a conversion is under way the archiver skips its runs
+    analytics_archiver.start()
+
+@app.on_event("startup")
+async def backfill_slot_capacity():
+    try:
+        await slot_capacity.backfill()
+    except Exception as e:
+        # Bookings made before availability tracking are then not counted
+        logger.error(f"Failed to backfill slot capacity: {e}")
+
+@app.on_event("startup")
+async def load_compiled_catalog():
+    try:
+        await price_table.load(db)
+        await promotion_timeline.load(db)
+    except Exception as e:
+        # Loaded on first use instead
+        logger.error(f"Failed to load price table / promotion timeline: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await loop_watchdog.stop()
+    await catalog_watcher.stop()
+    await booking_feed.stop()
+    await booking_digest.flush()
+    await analytics_ingest.stop(db)
+    await analytics_archiver.stop()
+    await analytics_migration.stop()
+    await booking_reminders.stop()
+    await image_proxy.aclose()
+    if TRACING_ENABLED:
+        trace_exporter.stop()
     client.close()
+    mark_process_dead()
@@ -0,0 +1,167 @@
+"""
+Slow-query log for the BeautyBar609 API.
+
+A pymongo CommandListener registered on the Motor client times every command;
+commands slower than SLOW_QUERY_THRESHOLD_MS are kept, with their values
+redacted, in a fixed-size ring buffer served by GET /api/admin/slow-queries.
+
+Query plans are not captured on the hot path. The admin endpoint can explain
+buffered entries on demand (?explain=true), summarising the winning plan as
+e.g. "COLLSCAN" or "FETCH > IXSCAN(email_1)".
+"""
+
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from pymongo import monitoring
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 100))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get("SLOW_QUERY_BUFFER_SIZE", 200))
+
+# Commands that MongoDB can explain, and the keys needed to rebuild them
+EXPLAINABLE_COMMANDS = {
+    "find": ("filter", "sort", "projection", "limit", "skip", "hint"),
+    "aggregate": ("pipeline", "cursor", "hint"),
+    "count": ("query", "limit", "skip", "hint"),
+    "distinct": ("key", "query"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+    "findAndModify": ("query", "sort", "update", "remove", "upsert", "new"),
+}
+IGNORED_COMMANDS = {"explain", "hello", "isMaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+
+# Values that give a command its structure rather than carrying user data.
+# Redacting them would leave a command MongoDB refuses to explain
+# ($limit: "?", upsert: "?", $inc: {"n": "?"}).
+STRUCTURAL_KEYS = {
+    "$limit", "$skip", "$sort", "$sample", "$count", "$project", "$unset",
+    "$size", "$mod", "$type", "$slice", "$meta", "$inc", "$mul",
+    "$bitsAllClear", "$bitsAllSet", "$bitsAnyClear", "$bitsAnySet",
+    "format", "timezone", "unit", "from", "localField", "foreignField", "as",
+    "limit", "upsert", "multi", "hint", "collation", "arrayFilters",
+}
+
+
+def redact(value):
+    """Replace the literals in a query document with '?', keeping its shape
+
+    Structural values (see STRUCTURAL_KEYS), booleans, nulls and "$field"
+    references are kept, so the redacted command can still be explained.
+    """
+    if isinstance(value, dict):
+        return {k: v if k in STRUCTURAL_KEYS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if value is None or isinstance(value, bool) or (isinstance(value, str) and value.startswith("$")):
+        return value
+    return "?"
+
+
+def command_shape(command_name: str, command) -> dict:
+    """The redacted parts of a command that describe what it did"""
+    shape = {command_name: command.get(command_name)}
+    for key in EXPLAINABLE_COMMANDS.get(command_name, ()):
+        if key in command:
+            # sort/projection/limit etc. are structural, not user data
+            sensitive = key in ("filter", "query", "pipeline", "updates", "deletes", "update")
+            shape[key] = redact(command[key]) if sensitive else command[key]
+    return shape
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Keeps the most recent slow commands; called from Motor's worker threads"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, size: int = SLOW_QUERY_BUFFER_SIZE):
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=size)
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self._started[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._record(event, None)
+
+    def failed(self, event):
+        self._record(event, str(event.failure.get("errmsg", event.failure)))
+
+    def _record(self, event, error):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+        database, command = started
+        shape = command_shape(event.command_name, command)
+        collection = shape[event.command_name]
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "namespace": f"{database}.{collection}" if isinstance(collection, str) else database,
+            "command": event.command_name,
+            "shape": shape if event.command_name in EXPLAINABLE_COMMANDS else None,
+            "error": error,
+            "plan": None,
+        }
+        with self._lock:
+            self.entries.append(entry)
+
+    def recent(self, limit: int):
+        """Newest first"""
+        with self._lock:
+            entries = list(self.entries)
+        return entries[::-1][:limit]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+def build_explain_command(entry: dict):
+    """An explain command for a buffered entry, or None if it can't be explained"""
+    if not entry.get("shape"):
+        return None
+    return {"explain": entry["shape"], "verbosity": "queryPlanner"}
+
+
+def _find_winning_plan(explain_result):
+    if isinstance(explain_result, dict):
+        if "winningPlan" in explain_result:
+            return explain_result["winningPlan"]
+        values = explain_result.values()
+    elif isinstance(explain_result, list):
+        values = explain_result
+    else:
+        return None
+    for value in values:
+        plan = _find_winning_plan(value)
+        if plan is not None:
+            return plan
+    return None
+
+
+def summarize_plan(explain_result) -> str:
+    """Compact description of the winning plan, e.g. 'FETCH > IXSCAN(email_1)'"""
+    plan = _find_winning_plan(explain_result)
+    # Slot-based execution nests the classic plan under queryPlan
+    if isinstance(plan, dict) and "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    stages = []
+    while isinstance(plan, dict) and "stage" in plan:
+        stage = plan["stage"]
+        if "indexName" in plan:
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        if "inputStage" in plan:
+            plan = plan["inputStage"]
+        elif plan.get("inputStages"):
+            plan = plan["inputStages"][0]
+        else:
+            break
+    return " > ".join(stages) if stages else "unknown"
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""
+BeautyBar609 API Startup Benchmark
+Reports per-module import time for server.py (via `python -X importtime`) and
+the time from spawning uvicorn to the first successful response.
+
+Usage:
+    python startup_benchmark.py [--top 25] [--runs 3] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def benchmark_env():
+    """Environment for child processes; server.py needs MONGO_URL/DB_NAME to import"""
+    env = os.environ.copy()
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "beautybar609_bench")
+    return env
+
+
+def measure_import_times(top=25):
+    """Import server.py under -X importtime and return the slowest modules"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=benchmark_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing server failed:\n{result.stderr}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.rstrip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+
+    server = next((m for m in modules if m["module"].strip() == "server"), None)
+    # Top-level imports of server.py are what a change to server.py controls
+    direct = [m for m in modules if m["depth"] == 1]
+    return {
+        "total_ms": server["cumulative_ms"] if server else None,
+        "server_self_ms": server["self_ms"] if server else None,
+        "top_level": sorted(direct, key=lambda m: m["cumulative_ms"], reverse=True)[:top],
+        "top_self": sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:top]
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_response(timeout=30.0):
+    """Spawn uvicorn and time until GET /api/ answers 200"""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=benchmark_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving a response")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"No response within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to report")
+    parser.add_argument("--runs", type=int, default=3, help="Number of cold starts to time")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    imports = measure_import_times(args.top)
+    first_response = [measure_first_response() for _ in range(args.runs)]
+    results = {
+        "python": sys.version.split()[0],
+        "import": imports,
+        "time_to_first_response_ms": {
+            "runs": first_response,
+            "median": statistics.median(first_response),
+            "min": min(first_response)
+        }
+    }
+
+    print(f"server import: {imports['total_ms']:.1f} ms (server.py itself {imports['server_self_ms']:.1f} ms)")
+    print("\nSlowest top-level imports (cumulative):")
+    for m in imports["top_level"]:
+        print(f"  {m['cumulative_ms']:8.1f} ms  {m['module'].strip()}")
+    print(f"\nTime to first response: median {results['time_to_first_response_ms']['median']:.0f} ms "
+          f"over {args.runs} runs")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Lightweight request tracing for the BeautyBar609 API.
+
+When TRACING_ENABLED is true:
+  - TracingMiddleware opens a server span per request, honours an incoming
+    W3C `traceparent` header and propagates `X-Request-ID` (generated if
+    missing) back on the response.
+  - TracingCommandListener adds a child span for every MongoDB command
+    (Motor copies the context into its executor threads, so the listener
+    sees the request's span).
+  - metrics.observe_outbound adds a client span around Termii/SendGrid calls.
+
+Finished spans are batched and exported by a background thread as OTLP/JSON
+(one ExportTraceServiceRequest per line) to TRACE_FILE, or POSTed to an
+OTLP/HTTP collector at TRACE_OTLP_ENDPOINT (e.g. http://localhost:4318/v1/traces).
+When disabled, span() is a no-op and nothing is installed.
+"""
+
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from pymongo import monitoring
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "false").lower() == "true"
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "beautybar609-api")
+TRACE_FILE = Path(os.environ.get("TRACE_FILE", Path(__file__).parent / "traces" / "traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.environ.get("TRACE_FILE_MAX_BYTES", 50 * 1024 * 1024))
+TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT")
+TRACE_FLUSH_INTERVAL = float(os.environ.get("TRACE_FLUSH_INTERVAL", 2))
+
+REQUEST_ID_HEADER = b"x-request-id"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# OTLP enums
+SPAN_KIND = {"internal": 1, "server": 2, "client": 3}
+STATUS_OK, STATUS_ERROR = 1, 2
+
+logger = logging.getLogger(__name__)
+
+current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name, kind="internal", parent=None, trace_id=None, parent_id=None, start_ns=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else (trace_id or secrets.token_hex(16))
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = STATUS_OK
+
+    def end(self, end_ns=None):
+        self.end_ns = end_ns or time.time_ns()
+        exporter.add(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def otlp_attribute(key, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Child span of the current one; does nothing outside a traced request"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, kind, parent=parent)
+    child.attributes.update(attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.status = STATUS_ERROR
+        child.attributes["exception.message"] = str(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+class SpanExporter:
+    """Buffers finished spans and writes them from a background thread"""
+
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(TRACE_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+        payload = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "beautybar609.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]})
+        try:
+            if TRACE_OTLP_ENDPOINT:
+                request = urllib.request.Request(
+                    TRACE_OTLP_ENDPOINT, data=payload.encode(), headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                self._write_file(payload)
+        except Exception as e:
+            logger.error(f"Failed to export {len(spans)} spans: {e}")
+
+    def _write_file(self, payload):
+        TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        if TRACE_FILE.exists() and TRACE_FILE.stat().st_size > TRACE_FILE_MAX_BYTES:
+            TRACE_FILE.replace(TRACE_FILE.with_suffix(TRACE_FILE.suffix + ".1"))
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(payload + "\n")
+
+
+exporter = SpanExporter()
+
+
+class TracingMiddleware:
+    """Opens the server span for each HTTP request and propagates X-Request-ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")[:128] or secrets.token_hex(16)
+        parent = TRACEPARENT_PATTERN.match(headers.get(b"traceparent", b"").decode("latin-1"))
+        root = Span(
+            f"{scope['method']} {scope['path']}", "server",
+            trace_id=parent.group(1) if parent else None,
+            parent_id=parent.group(2) if parent else None,
+        )
+        root.attributes.update({
+            "http.method": scope["method"], "http.target": scope["path"], "http.request_id": request_id,
+        })
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = current_span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            root.status = STATUS_ERROR
+            raise
+        finally:
+            current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["http.route"] = route.path
+            root.end()
+
+
+class TracingCommandListener(monitoring.CommandListener):
+    """Turns MongoDB commands issued inside a traced request into child spans"""
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        parent = current_span.get()
+        if parent is None:
+            return
+        target = event.command.get(event.command_name)
+        child = Span(f"mongodb.{event.command_name}", "client", parent=parent)
+        child.attributes.update({
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.collection": target if isinstance(target, str) else event.command.get("collection"),
+        })
+        self._spans[(event.connection_id, event.request_id)] = child
+
+    def succeeded(self, event):
+        self._finish(event, STATUS_OK)
+
+    def failed(self, event):
+        self._finish(event, STATUS_ERROR)
+
+    def _finish(self, event, status):
+        child = self._spans.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.status = status
+            child.end(child.start_ns + event.duration_micros * 1000)
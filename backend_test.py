@@ -15,7 +15,12 @@ class BeautyBar609AdminTester:
     def __init__(self, base_url="https://beauty-portal-pro.preview.emergentagent.com/api"):
         self.base_url = base_url
         self.token = None
-        self.headers = {'Content-Type': 'application/json'}
+        # A browser User-Agent, so the analytics bot filter stores our events
+        self.headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                          'Chrome/124.0 Safari/537.36 BeautyBar609-AdminTester'
+        }
         self.tests_run = 0
         self.tests_passed = 0
         self.failed_tests = []
@@ -38,6 +38,18 @@ import {
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
+// Remote catalog images are served through the backend's caching image proxy
+// (GET /api/images), resized to the width they are displayed at
+const IMAGE_PROXY_HOSTS = (process.env.REACT_APP_IMAGE_PROXY_HOSTS || 'images.unsplash.com').split(',');
+const proxiedImage = (src, width) => {
+  try {
+    if (!IMAGE_PROXY_HOSTS.includes(new URL(src).host)) return src;
+  } catch (error) {
+    return src;
+  }
+  return `${API}/images?src=${encodeURIComponent(src)}&w=${width}`;
+};
+
 // Generate visitor ID for analytics
 const getVisitorId = () => {
   let visitorId = localStorage.getItem('visitorId');
@@ -226,7 +238,7 @@ const Hero = () => {
     <section id="hero" ref={ref} className="relative min-h-screen flex items-center justify-center overflow-hidden" data-testid="hero-section">
       <motion.div style={{ y }} className="absolute inset-0">
         <img
-          src="https://images.unsplash.com/photo-1692318578404-24e9c05b6984?q=85&w=2560&auto=format&fit=crop"
+          src={proxiedImage("https://images.unsplash.com/photo-1692318578404-24e9c05b6984?q=85&w=2560&auto=format&fit=crop", 2560)}
           alt="Beauty background"
           className="w-full h-full object-cover"
         />
@@ -530,7 +542,7 @@ const Services = ({ services }) => {
               data-testid={`service-card-${index}`}
             >
               <img
-                src={service.image}
+                src={proxiedImage(service.image, 800)}
                 alt={service.title}
                 className="absolute inset-0 w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
               />
@@ -586,7 +598,7 @@ const ExpertAuthority = () => {
         >
           <motion.div variants={fadeInUp} className="relative">
             <img
-              src="https://images.unsplash.com/photo-1580618672591-eb180b1a973f?q=85&w=600&auto=format&fit=crop"
+              src={proxiedImage("https://images.unsplash.com/photo-1580618672591-eb180b1a973f?q=85&w=600&auto=format&fit=crop", 640)}
               alt="BeautyBar609 Expert"
               className="w-full h-[500px] object-cover"
             />
@@ -698,7 +710,7 @@ const Gallery = ({ images }) => {
                 data-testid={`gallery-item-${index}`}
               >
                 <img
-                  src={imgUrl}
+                  src={proxiedImage(imgUrl, index === 0 ? 1280 : 640)}
                   alt={`Gallery ${index + 1}`}
                   className={`w-full object-cover hover:scale-105 transition-transform duration-500 ${index === 0 ? 'h-full' : 'h-48 md:h-64'}`}
                 />
@@ -1031,6 +1043,10 @@ const HomeBookingForm = () => {
   const [loading, setLoading] = useState(false);
   const [submitted, setSubmitted] = useState(false);
   const [error, setError] = useState('');
+  // Retries of the same submission reuse its key so the server books it only once
+  const idempotency = useRef({ key: null, body: null });
+  // Free stylists per time slot on the chosen date
+  const [availability, setAvailability] = useState({});
 
   const services = [
     "Gel Extensions (Short)",
@@ -1053,13 +1069,37 @@ const HomeBookingForm = () => {
     "1:00 PM", "2:00 PM", "3:00 PM", "4:00 PM", "5:00 PM"
   ];
 
+  useEffect(() => {
+    const date = formData.preferred_date;
+    setAvailability({});
+    if (!date) return;
+    let cancelled = false;
+    axios.get(`${API}/availability`, { params: { from: date, to: date } })
+      .then(({ data }) => {
+        if (cancelled) return;
+        const slots = data.days[0]?.slots || [];
+        setAvailability(Object.fromEntries(slots.map((slot) => [slot.time, slot.available])));
+      })
+      .catch(() => {});
+    return () => { cancelled = true; };
+  }, [formData.preferred_date, submitted]);
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
     setError('');
 
+    const body = JSON.stringify(formData);
+    if (idempotency.current.body !== body) {
+      const key = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).substr(2, 12)}`;
+      idempotency.current = { key, body };
+    }
+
     try {
-      await axios.post(`${API}/bookings/home`, formData);
+      await axios.post(`${API}/bookings/home`, formData, {
+        headers: { 'Idempotency-Key': idempotency.current.key }
+      });
+      idempotency.current = { key: null, body: null };
       setSubmitted(true);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to submit booking. Please try again.');
@@ -1227,7 +1267,9 @@ const HomeBookingForm = () => {
               >
                 <option value="">Select time</option>
                 {timeSlots.map((time) => (
-                  <option key={time} value={time}>{time}</option>
+                  <option key={time} value={time} disabled={availability[time] === 0}>
+                    {availability[time] === 0 ? `${time} (fully booked)` : time}
+                  </option>
                 ))}
               </select>
             </div>
@@ -1292,7 +1334,7 @@ const FinalCTA = () => {
     <section className="py-20 md:py-28 px-6 md:px-12 bg-obsidian relative overflow-hidden" data-testid="final-cta">
       <div className="absolute inset-0">
         <img
-          src="https://images.unsplash.com/photo-1560066984-138dadb4c035?q=85&w=1920&auto=format&fit=crop"
+          src={proxiedImage("https://images.unsplash.com/photo-1560066984-138dadb4c035?q=85&w=1920&auto=format&fit=crop", 1920)}
           alt="Beauty background"
           className="w-full h-full object-cover opacity-20"
         />
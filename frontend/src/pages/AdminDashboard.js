@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import { motion } from 'framer-motion';
@@ -33,6 +33,130 @@ import {
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
+const byOrder = (a, b) => (a.order || 0) - (b.order || 0);
+
+// <input type="datetime-local"> works in local time; the API stores UTC ISO strings
+const toLocalInput = (iso) => {
+  if (!iso) return '';
+  const date = new Date(iso);
+  return new Date(date.getTime() - date.getTimezoneOffset() * 60000).toISOString().slice(0, 16);
+};
+const fromLocalInput = (value) => (value ? new Date(value).toISOString() : null);
+
+const promotionStatus = (promotion) => {
+  const now = Date.now();
+  if (!promotion.active) return null;
+  if (promotion.starts_at && new Date(promotion.starts_at) > now) return 'Scheduled';
+  if (promotion.ends_at && new Date(promotion.ends_at) <= now) return 'Ended';
+  return 'Active';
+};
+
+// Safety net for live updates: refetch bookings this often in case an event
+// was written on a worker whose events can't reach this stream
+const BOOKINGS_REFRESH_MS = 60000;
+
+// Reads a Server-Sent Events stream with fetch, so the token travels in the
+// Authorization header rather than in the URL (where it ends up in access
+// logs). Reconnects with Last-Event-ID like EventSource. Returns a closer.
+const subscribeEvents = (url, handlers) => {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retry = 3000;
+
+  const dispatch = (block) => {
+    let type = 'message';
+    let id = null;
+    const data = [];
+    for (const line of block.split('\n')) {
+      if (!line || line.startsWith(':')) continue;
+      const colon = line.indexOf(':');
+      const field = colon === -1 ? line : line.slice(0, colon);
+      const value = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+      if (field === 'event') type = value;
+      else if (field === 'data') data.push(value);
+      else if (field === 'id') id = value;
+      else if (field === 'retry' && /^\d+$/.test(value)) retry = Number(value);
+    }
+    if (id !== null) lastEventId = id;
+    if (data.length && handlers[type]) handlers[type](data.join('\n'));
+  };
+
+  const run = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers = { Accept: 'text/event-stream' };
+        const auth = axios.defaults.headers.common['Authorization'];
+        if (auth) headers.Authorization = auth;
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+        const response = await fetch(url, { headers, signal: controller.signal });
+        // Signed out or token expired: the periodic refetch takes over
+        if (response.status === 401 || response.status === 403) return;
+        if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          let end;
+          while ((end = buffer.indexOf('\n\n')) !== -1) {
+            dispatch(buffer.slice(0, end));
+            buffer = buffer.slice(end + 2);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, retry));
+    }
+  };
+
+  run();
+  return () => controller.abort();
+};
+
+// Keeps one catalog collection in sync through /admin/changes: the first call
+// loads everything, later calls only fetch what was written or deleted since
+// the last revision seen. `filter` and `sort` must be stable (module-level).
+const useCatalogSync = (collection, { filter, sort } = {}) => {
+  const [items, setItems] = useState([]);
+  const [loading, setLoading] = useState(true);
+  const revision = useRef(0);
+
+  const sync = useCallback(async () => {
+    try {
+      const response = await axios.get(`${API}/admin/changes`, {
+        params: { since: revision.current, collections: collection }
+      });
+      const { full, changes, deleted } = response.data;
+      revision.current = response.data.revision;
+      setItems((current) => {
+        const byId = new Map(full ? [] : current.map((item) => [item.id, item]));
+        deleted[collection].forEach((id) => byId.delete(id));
+        changes[collection].forEach((item) => {
+          if (!filter || filter(item)) {
+            byId.set(item.id, item);
+          } else {
+            byId.delete(item.id);
+          }
+        });
+        const next = Array.from(byId.values());
+        return sort ? next.sort(sort) : next;
+      });
+    } catch (error) {
+      console.error(`Error syncing ${collection}:`, error);
+    } finally {
+      setLoading(false);
+    }
+  }, [collection, filter, sort]);
+
+  useEffect(() => {
+    sync();
+  }, [sync]);
+
+  return { items, loading, sync };
+};
+
 // Sidebar Component
 const Sidebar = ({ activeTab, setActiveTab, onLogout, isMobileOpen, setIsMobileOpen }) => {
   const tabs = [
@@ -214,10 +338,32 @@ const BookingsTab = () => {
     fetchBookings();
   }, [fetchBookings]);
 
+  // Live updates instead of re-fetching the whole list
+  useEffect(() => {
+    const close = subscribeEvents(`${API}/bookings/stream`, {
+      'booking.created': (data) => {
+        const booking = JSON.parse(data);
+        setBookings(prev => prev.some(b => b.id === booking.id) ? prev : [booking, ...prev]);
+      },
+      'booking.status': (data) => {
+        const { id, status } = JSON.parse(data);
+        setBookings(prev => prev.map(b => b.id === id ? { ...b, status } : b));
+      },
+      // Sent when the server can't replay what we missed since the last event
+      resync: () => fetchBookings(),
+    });
+    const refresh = setInterval(fetchBookings, BOOKINGS_REFRESH_MS);
+
+    return () => {
+      close();
+      clearInterval(refresh);
+    };
+  }, [fetchBookings]);
+
   const updateStatus = async (bookingId, newStatus) => {
     try {
       await axios.put(`${API}/bookings/${bookingId}/status`, { status: newStatus });
-      fetchBookings();
+      setBookings(prev => prev.map(b => b.id === bookingId ? { ...b, status: newStatus } : b));
     } catch (error) {
       console.error('Error updating booking status:', error);
     }
@@ -396,26 +542,10 @@ const BookingsTab = () => {
 
 // Services Tab
 const ServicesTab = () => {
-  const [services, setServices] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: services, loading, sync: fetchServices } = useCatalogSync('services', { sort: byOrder });
   const [editingId, setEditingId] = useState(null);
   const [formData, setFormData] = useState({ title: '', description: '', image: '', price: '', order: 0 });
 
-  const fetchServices = useCallback(async () => {
-    try {
-      const response = await axios.get(`${API}/services`);
-      setServices(response.data);
-    } catch (error) {
-      console.error('Error fetching services:', error);
-    } finally {
-      setLoading(false);
-    }
-  }, []);
-
-  useEffect(() => {
-    fetchServices();
-  }, [fetchServices]);
-
   const handleSave = async () => {
     try {
       if (editingId === 'new') {
@@ -567,27 +697,11 @@ const ServicesTab = () => {
 
 // Prices Tab
 const PricesTab = () => {
-  const [prices, setPrices] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: prices, loading, sync: fetchPrices } = useCatalogSync('prices', { sort: byOrder });
   const [editingId, setEditingId] = useState(null);
-  const [formData, setFormData] = useState({ category: '', items: [], order: 0 });
+  const [formData, setFormData] = useState({ category: '', items: [], order: 0, service_type: 'salon' });
   const [newItem, setNewItem] = useState({ name: '', price: '' });
 
-  const fetchPrices = useCallback(async () => {
-    try {
-      const response = await axios.get(`${API}/prices`);
-      setPrices(response.data);
-    } catch (error) {
-      console.error('Error fetching prices:', error);
-    } finally {
-      setLoading(false);
-    }
-  }, []);
-
-  useEffect(() => {
-    fetchPrices();
-  }, [fetchPrices]);
-
   const handleSave = async () => {
     try {
       if (editingId === 'new') {
@@ -629,7 +743,8 @@ const PricesTab = () => {
     setFormData({
       category: priceCategory.category,
       items: priceCategory.items || [],
-      order: priceCategory.order || 0
+      order: priceCategory.order || 0,
+      service_type: priceCategory.service_type || 'salon'
     });
   };
 
@@ -642,7 +757,7 @@ const PricesTab = () => {
         <button
           onClick={() => {
             setEditingId('new');
-            setFormData({ category: '', items: [], order: prices.length });
+            setFormData({ category: '', items: [], order: prices.length, service_type: 'salon' });
           }}
           className="flex items-center gap-2 bg-gold-400 text-obsidian px-4 py-2 font-bold text-sm hover:bg-gold-300"
           data-testid="add-price-category-btn"
@@ -667,6 +782,15 @@ const PricesTab = () => {
             className="w-full bg-obsidian border border-white/10 px-4 py-3 text-white focus:border-gold-400 outline-none mb-4"
             data-testid="category-name-input"
           />
+          <select
+            value={formData.service_type}
+            onChange={(e) => setFormData({ ...formData, service_type: e.target.value })}
+            className="w-full bg-obsidian border border-white/10 px-4 py-3 text-white focus:border-gold-400 outline-none mb-4"
+            data-testid="category-service-type-select"
+          >
+            <option value="salon">Salon</option>
+            <option value="home">Home service</option>
+          </select>
           
           <div className="space-y-2 mb-4">
             {formData.items.map((item, index) => (
@@ -718,7 +842,12 @@ const PricesTab = () => {
         {prices.map((category) => (
           <div key={category.id} className="bg-charcoal border border-white/10 p-4">
             <div className="flex items-center justify-between mb-3">
-              <h4 className="text-gold-400 font-medium">{category.category}</h4>
+              <h4 className="text-gold-400 font-medium">
+                {category.category}
+                {category.service_type === 'home' && (
+                  <span className="ml-2 text-xs uppercase tracking-wider text-neutral-400">Home service</span>
+                )}
+              </h4>
               <div className="flex gap-2">
                 <button onClick={() => startEdit(category)} className="p-2 text-neutral-400 hover:text-gold-400">
                   <Pencil size={18} />
@@ -745,26 +874,10 @@ const PricesTab = () => {
 
 // Testimonials Tab
 const TestimonialsTab = () => {
-  const [testimonials, setTestimonials] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: testimonials, loading, sync: fetchTestimonials } = useCatalogSync('testimonials');
   const [editingId, setEditingId] = useState(null);
   const [formData, setFormData] = useState({ name: '', text: '', rating: 5 });
 
-  const fetchTestimonials = useCallback(async () => {
-    try {
-      const response = await axios.get(`${API}/testimonials`);
-      setTestimonials(response.data);
-    } catch (error) {
-      console.error('Error fetching testimonials:', error);
-    } finally {
-      setLoading(false);
-    }
-  }, []);
-
-  useEffect(() => {
-    fetchTestimonials();
-  }, [fetchTestimonials]);
-
   const handleSave = async () => {
     try {
       if (editingId === 'new') {
@@ -895,32 +1008,17 @@ const TestimonialsTab = () => {
 
 // Promotions Tab
 const PromotionsTab = () => {
-  const [promotions, setPromotions] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: promotions, loading, sync: fetchPromotions } = useCatalogSync('promotions');
   const [editingId, setEditingId] = useState(null);
-  const [formData, setFormData] = useState({ title: '', description: '', discount: '', active: true });
-
-  const fetchPromotions = useCallback(async () => {
-    try {
-      const response = await axios.get(`${API}/promotions`);
-      setPromotions(response.data);
-    } catch (error) {
-      console.error('Error fetching promotions:', error);
-    } finally {
-      setLoading(false);
-    }
-  }, []);
-
-  useEffect(() => {
-    fetchPromotions();
-  }, [fetchPromotions]);
+  const [formData, setFormData] = useState({ title: '', description: '', discount: '', active: true, starts_at: '', ends_at: '' });
 
   const handleSave = async () => {
     try {
+      const payload = { ...formData, starts_at: fromLocalInput(formData.starts_at), ends_at: fromLocalInput(formData.ends_at) };
       if (editingId === 'new') {
-        await axios.post(`${API}/promotions`, formData);
+        await axios.post(`${API}/promotions`, payload);
       } else {
-        await axios.put(`${API}/promotions/${editingId}`, formData);
+        await axios.put(`${API}/promotions/${editingId}`, payload);
       }
       setEditingId(null);
       fetchPromotions();
@@ -949,7 +1047,7 @@ const PromotionsTab = () => {
         <button
           onClick={() => {
             setEditingId('new');
-            setFormData({ title: '', description: '', discount: '', active: true });
+            setFormData({ title: '', description: '', discount: '', active: true, starts_at: '', ends_at: '' });
           }}
           className="flex items-center gap-2 bg-gold-400 text-obsidian px-4 py-2 font-bold text-sm hover:bg-gold-300"
           data-testid="add-promotion-btn"
@@ -990,6 +1088,28 @@ const PromotionsTab = () => {
               className="w-full bg-obsidian border border-white/10 px-4 py-3 text-white focus:border-gold-400 outline-none min-h-[100px]"
               data-testid="promotion-description-input"
             />
+            <div className="grid sm:grid-cols-2 gap-4">
+              <label className="block">
+                <span className="text-xs text-neutral-500 uppercase tracking-wider">Starts (optional)</span>
+                <input
+                  type="datetime-local"
+                  value={formData.starts_at}
+                  onChange={(e) => setFormData({ ...formData, starts_at: e.target.value })}
+                  className="w-full bg-obsidian border border-white/10 px-4 py-3 text-white focus:border-gold-400 outline-none mt-1"
+                  data-testid="promotion-starts-input"
+                />
+              </label>
+              <label className="block">
+                <span className="text-xs text-neutral-500 uppercase tracking-wider">Ends (optional)</span>
+                <input
+                  type="datetime-local"
+                  value={formData.ends_at}
+                  onChange={(e) => setFormData({ ...formData, ends_at: e.target.value })}
+                  className="w-full bg-obsidian border border-white/10 px-4 py-3 text-white focus:border-gold-400 outline-none mt-1"
+                  data-testid="promotion-ends-input"
+                />
+              </label>
+            </div>
             <label className="flex items-center gap-3 cursor-pointer">
               <input
                 type="checkbox"
@@ -997,7 +1117,7 @@ const PromotionsTab = () => {
                 onChange={(e) => setFormData({ ...formData, active: e.target.checked })}
                 className="w-5 h-5 accent-gold-400"
               />
-              <span className="text-neutral-300">Active (show on website)</span>
+              <span className="text-neutral-300">Enabled (show on website during its schedule)</span>
             </label>
           </div>
           <div className="flex gap-2 mt-4">
@@ -1018,18 +1138,32 @@ const PromotionsTab = () => {
               <div>
                 <div className="flex items-center gap-2 mb-2">
                   <h4 className="text-white font-medium">{promotion.title}</h4>
-                  {promotion.active && (
-                    <span className="text-xs bg-gold-400 text-obsidian px-2 py-0.5 uppercase">Active</span>
+                  {promotionStatus(promotion) && (
+                    <span className="text-xs bg-gold-400 text-obsidian px-2 py-0.5 uppercase">{promotionStatus(promotion)}</span>
                   )}
                 </div>
                 <p className="text-gold-400 text-lg font-bold mb-1">{promotion.discount}</p>
                 <p className="text-neutral-400 text-sm">{promotion.description}</p>
+                {(promotion.starts_at || promotion.ends_at) && (
+                  <p className="text-neutral-500 text-xs mt-2">
+                    {promotion.starts_at ? new Date(promotion.starts_at).toLocaleString() : 'Now'}
+                    {' – '}
+                    {promotion.ends_at ? new Date(promotion.ends_at).toLocaleString() : 'until disabled'}
+                  </p>
+                )}
               </div>
               <div className="flex gap-2">
                 <button
                   onClick={() => {
                     setEditingId(promotion.id);
-                    setFormData({ title: promotion.title, description: promotion.description, discount: promotion.discount, active: promotion.active });
+                    setFormData({
+                      title: promotion.title,
+                      description: promotion.description,
+                      discount: promotion.discount,
+                      active: promotion.active,
+                      starts_at: toLocalInput(promotion.starts_at),
+                      ends_at: toLocalInput(promotion.ends_at)
+                    });
                   }}
                   className="p-2 text-neutral-400 hover:text-gold-400"
                 >
@@ -1049,27 +1183,11 @@ const PromotionsTab = () => {
 
 // Gallery Tab
 const GalleryTab = () => {
-  const [images, setImages] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: images, loading, sync: fetchGallery } = useCatalogSync('gallery', { sort: byOrder });
   const [uploading, setUploading] = useState(false);
   const [editingId, setEditingId] = useState(null);
   const [formData, setFormData] = useState({ url: '', caption: '', order: 0 });
 
-  const fetchGallery = useCallback(async () => {
-    try {
-      const response = await axios.get(`${API}/gallery`);
-      setImages(response.data);
-    } catch (error) {
-      console.error('Error fetching gallery:', error);
-    } finally {
-      setLoading(false);
-    }
-  }, []);
-
-  useEffect(() => {
-    fetchGallery();
-  }, [fetchGallery]);
-
   const handleUpload = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
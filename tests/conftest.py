@@ -0,0 +1,32 @@
+"""
+Shared fixtures for the backend behaviour tests.
+
+The backend modules are imported straight from backend/ (it is not a
+package) and run against an in-memory mongomock-motor database, so these
+tests need no mongod. Async tests are plain `async def test_...` functions,
+run to completion on a fresh event loop.
+"""
+
+import asyncio
+import inspect
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["beautybar609_test"]
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if inspect.iscoroutinefunction(pyfuncitem.obj):
+        kwargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+        asyncio.run(pyfuncitem.obj(**kwargs))
+        return True
+    return None
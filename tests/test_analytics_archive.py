@@ -0,0 +1,120 @@
+"""Archiving old analytics events to disk and resuming (backend/analytics_archive.py)"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import analytics_archive
+from analytics_archive import AnalyticsArchiver, read_archive
+from analytics_codec import AnalyticsCodec
+
+NOW = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+OLD = NOW - timedelta(days=5)
+
+
+@pytest.fixture
+def codec(db):
+    return AnalyticsCodec(db)
+
+
+@pytest.fixture
+def archiver(db, codec, tmp_path):
+    return AnalyticsArchiver(db, codec, root=tmp_path, retention_days=1, part_size=30)
+
+
+async def add_events(db, codec, count, at=OLD):
+    for i in range(count):
+        await db.analytics.insert_one(await codec.encode({
+            "id": str(uuid.uuid4()), "page": "/", "section": "hero", "visitor_id": f"v_{i}",
+            "timestamp": at.isoformat(),
+        }))
+
+
+async def mark_converted(db):
+    await db.migrations.insert_one({"_id": "analytics_compact"})
+
+
+def archived_ids(root) -> list:
+    return [event["id"] for event in read_archive(root)]
+
+
+async def test_old_days_move_to_disk(db, codec, archiver):
+    await mark_converted(db)
+    await add_events(db, codec, 70)
+    await add_events(db, codec, 5, at=NOW)
+
+    summary = await archiver.run(NOW)
+
+    assert summary["days"] == [{"day": OLD.date().isoformat(), "archived": 70, "deleted": 70, "parts": 3}]
+    assert len(set(archived_ids(archiver.root))) == 70
+    assert await db.analytics.count_documents({}) == 5
+    assert await archiver.archived_views() == 70
+
+
+async def test_events_arriving_after_a_day_was_archived_are_kept(db, codec, archiver):
+    await mark_converted(db)
+    await add_events(db, codec, 100)
+    await archiver.run(NOW)
+    await add_events(db, codec, 100)
+
+    await archiver.run(NOW)
+
+    assert len(set(archived_ids(archiver.root))) == 200
+    assert await db.analytics.count_documents({}) == 0
+
+
+async def test_interrupted_run_resumes_without_losing_or_repeating_events(db, codec, archiver, monkeypatch):
+    await mark_converted(db)
+    await add_events(db, codec, 90)
+    write_part = analytics_archive.write_part
+    calls = []
+
+    def fails_second_part(path, events):
+        calls.append(path)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        write_part(path, events)
+
+    monkeypatch.setattr(analytics_archive, "write_part", fails_second_part)
+    with pytest.raises(OSError):
+        await archiver.run(NOW)
+    monkeypatch.setattr(analytics_archive, "write_part", write_part)
+    assert await db.analytics.count_documents({}) == 60
+
+    await archiver.run(NOW)
+
+    ids = archived_ids(archiver.root)
+    assert len(ids) == len(set(ids)) == 90
+    assert await db.analytics.count_documents({}) == 0
+    assert (await archiver.partitions())[0]["events"] == 90
+
+
+async def test_recorded_part_left_undeleted_is_only_deleted(db, codec, archiver, monkeypatch):
+    await mark_converted(db)
+    await add_events(db, codec, 30)
+    delete = archiver._delete
+
+    async def dies_before_deleting(query):
+        raise ConnectionError("worker stopped")
+
+    monkeypatch.setattr(archiver, "_delete", dies_before_deleting)
+    with pytest.raises(ConnectionError):
+        await archiver.run(NOW)
+    monkeypatch.setattr(archiver, "_delete", delete)
+
+    summary = await archiver.run(NOW)
+
+    assert summary["days"][0]["archived"] == 0
+    assert summary["days"][0]["deleted"] == 30
+    assert len(archived_ids(archiver.root)) == 30
+
+
+async def test_nothing_is_archived_until_legacy_events_are_converted(db, codec, archiver):
+    await add_events(db, codec, 10)
+
+    assert (await archiver.run(NOW))["days"] == []
+    assert await db.analytics.count_documents({}) == 10
+
+    await mark_converted(db)
+    assert (await archiver.run(NOW))["days"][0]["archived"] == 10
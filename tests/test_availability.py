@@ -0,0 +1,85 @@
+"""Stylist capacity: reserving, releasing and the one-off backfill (backend/availability.py)"""
+
+from datetime import datetime, timezone
+
+from availability import SlotCapacity
+
+SLOTS = ["9:00 AM", "10:00 AM", "11:00 AM", "12:00 PM"]
+DAY = "2030-01-15"
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+async def busy(db) -> list:
+    return (await db.slot_capacity.find_one({"_id": DAY}))["busy"]
+
+
+async def test_reserve_takes_lowest_free_stylist_until_full(db):
+    capacity = SlotCapacity(db, slots=SLOTS, stylists=2, slots_per_booking=2)
+
+    first = await capacity.reserve_booking(DAY, "10:00 AM", NOW)
+    second = await capacity.reserve_booking(DAY, "10:00", NOW)
+    third = await capacity.reserve_booking(DAY, "11:00 AM", NOW)
+
+    assert first == {"capacity_status": "held", "capacity_slot": 1, "capacity_slots": 2, "capacity_stylist": 0}
+    assert second["capacity_stylist"] == 1
+    # 11:00 overlaps both bookings' second slot
+    assert third == {"capacity_status": "conflict", "capacity_slot": 2}
+    assert await busy(db) == [0, 0b11, 0b11, 0]
+
+
+async def test_off_grid_and_past_bookings_are_untracked(db):
+    capacity = SlotCapacity(db, slots=SLOTS, stylists=2)
+
+    assert await capacity.reserve_booking(DAY, "9:30 AM", NOW) == {"capacity_status": "untracked"}
+    assert await capacity.reserve_booking("2020-01-15", "9:00 AM", NOW) == {"capacity_status": "untracked"}
+    assert await db.slot_capacity.count_documents({}) == 0
+
+
+async def test_last_slot_holds_only_what_is_left_of_the_day(db):
+    capacity = SlotCapacity(db, slots=SLOTS, stylists=1, slots_per_booking=3)
+
+    fields = await capacity.reserve_booking(DAY, "12:00 PM", NOW)
+
+    assert fields["capacity_slots"] == 1
+    assert await busy(db) == [0, 0, 0, 1]
+
+
+async def test_release_booking_frees_its_stylist_once(db):
+    capacity = SlotCapacity(db, slots=SLOTS, stylists=2, slots_per_booking=2)
+    fields = await capacity.reserve_booking(DAY, "9:00 AM", NOW)
+    await db.bookings.insert_one({"id": "b1", "preferred_date": DAY, **fields})
+    other = await capacity.reserve_booking(DAY, "9:00 AM", NOW)
+
+    booking = await db.bookings.find_one({"id": "b1"})
+    assert await capacity.release_booking(booking) is True
+    assert await capacity.release_booking(booking) is False
+
+    assert await busy(db) == [1 << other["capacity_stylist"]] * 2 + [0, 0]
+    assert (await db.bookings.find_one({"id": "b1"}))["capacity_status"] == "released"
+
+
+async def test_release_uses_the_span_stored_on_the_booking(db):
+    before = SlotCapacity(db, slots=SLOTS, stylists=1, slots_per_booking=2)
+    fields = await before.reserve_booking(DAY, "9:00 AM", NOW)
+    await db.bookings.insert_one({"id": "b1", "preferred_date": DAY, **fields})
+    # AVAILABILITY_SLOTS_PER_BOOKING changed between booking and cancelling
+    after = SlotCapacity(db, slots=SLOTS, stylists=1, slots_per_booking=3)
+    await after.reserve_booking(DAY, "11:00 AM", NOW)
+
+    await after.release_booking(await db.bookings.find_one({"id": "b1"}))
+
+    assert await busy(db) == [0, 0, 1, 1]
+
+
+async def test_backfill_runs_once(db):
+    capacity = SlotCapacity(db, slots=SLOTS, stylists=2)
+    await db.bookings.insert_one({"id": "old", "status": "confirmed", "preferred_date": DAY,
+                                  "preferred_time": "9:00 AM", "created_at": "2025-12-01"})
+
+    assert await capacity.backfill(NOW) == 1
+    assert (await db.bookings.find_one({"id": "old"}))["capacity_status"] == "held"
+
+    await db.bookings.insert_one({"id": "older", "status": "confirmed", "preferred_date": DAY,
+                                  "preferred_time": "10:00 AM", "created_at": "2025-11-01"})
+    assert await capacity.backfill(NOW) == 0
+    assert "capacity_status" not in await db.bookings.find_one({"id": "older"})
@@ -0,0 +1,113 @@
+"""Claiming and sending day-before reminders (backend/booking_reminders.py)"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from booking_reminders import (
+    BOOKING_REMINDER_MAX_ATTEMPTS, BookingReminderScheduler, reinstated_reminder_fields, reminder_fields,
+)
+
+NOW = datetime(2030, 1, 14, 9, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def scheduler(db, sent):
+    return BookingReminderScheduler(db, lambda booking: sent.append(booking["id"]) or True)
+
+
+async def add_booking(db, booking_id, status="confirmed", due=NOW - timedelta(minutes=1), **fields):
+    await db.bookings.insert_one({
+        "id": booking_id, "status": status, "preferred_date": "2030-01-15", "preferred_time": "10:00 AM",
+        "reminder_status": "pending", "reminder_due_at": due, **fields,
+    })
+
+
+async def reminder_status(db, booking_id) -> str:
+    return (await db.bookings.find_one({"id": booking_id}))["reminder_status"]
+
+
+def test_reminder_fields():
+    fields = reminder_fields("2030-01-15", "10:00 AM", NOW)
+    # 10:00 in Lagos (UTC+1), a day ahead
+    assert fields == {"reminder_status": "pending", "reminder_due_at": datetime(2030, 1, 14, 9, tzinfo=timezone.utc)}
+    assert reminder_fields("2030-01-15", "teatime", NOW) == {"reminder_status": "unscheduled"}
+    assert reminder_fields("2030-01-01", "10:00 AM", NOW) == {"reminder_status": "skipped"}
+
+
+async def test_due_reminders_are_sent_once(db, scheduler, sent):
+    await add_booking(db, "due")
+    await add_booking(db, "later", due=NOW + timedelta(hours=2))
+
+    assert await scheduler.dispatch_due(NOW) == {"sent": 1, "failed": 0, "skipped": 0}
+    assert await scheduler.dispatch_due(NOW) == {"sent": 0, "failed": 0, "skipped": 0}
+
+    assert sent == ["due"]
+    assert await reminder_status(db, "due") == "sent"
+    assert await reminder_status(db, "later") == "pending"
+
+
+async def test_reminder_claimed_by_another_worker_is_not_sent(db, scheduler, sent, monkeypatch):
+    await add_booking(db, "mine")
+    await add_booking(db, "theirs")
+    update_many = scheduler.bookings.update_many
+
+    async def another_worker_claims_first(query, update):
+        await db.bookings.update_one({"id": "theirs"}, {"$set": {
+            "reminder_status": "sending", "reminder_claim": "another-worker"}})
+        return await update_many(query, update)
+
+    monkeypatch.setattr(scheduler.bookings, "update_many", another_worker_claims_first)
+    counts = await scheduler.dispatch_due(NOW)
+
+    assert counts["sent"] == 1
+    assert sent == ["mine"]
+    assert await reminder_status(db, "theirs") == "sending"
+
+
+async def test_cancelled_booking_is_skipped(db, scheduler, sent):
+    await add_booking(db, "cancelled", status="cancelled")
+
+    assert await scheduler.dispatch_due(NOW) == {"sent": 0, "failed": 0, "skipped": 1}
+    assert sent == []
+    assert await reminder_status(db, "cancelled") == "skipped"
+
+
+async def test_failed_send_is_retried_then_given_up(db):
+    scheduler = BookingReminderScheduler(db, lambda booking: False)
+    await add_booking(db, "b1")
+
+    for attempt in range(1, BOOKING_REMINDER_MAX_ATTEMPTS):
+        await scheduler.dispatch_due(NOW)
+        booking = await db.bookings.find_one({"id": "b1"})
+        assert (booking["reminder_status"], booking["reminder_attempts"]) == ("pending", attempt)
+        await db.bookings.update_one({"id": "b1"}, {"$set": {"reminder_due_at": NOW}})
+
+    assert (await scheduler.dispatch_due(NOW))["failed"] == 1
+    assert await reminder_status(db, "b1") == "failed"
+
+
+def test_reinstated_booking_is_scheduled_again_unless_already_sent():
+    booking = {"preferred_date": "2030-01-15", "preferred_time": "10:00 AM"}
+
+    assert reinstated_reminder_fields({**booking, "reminder_status": "skipped"}, NOW)["reminder_status"] == "pending"
+    assert reinstated_reminder_fields(booking, NOW)["reminder_status"] == "pending"
+    assert reinstated_reminder_fields({**booking, "reminder_status": "sent"}, NOW) == {}
+    assert reinstated_reminder_fields({**booking, "reminder_status": "failed"}, NOW) == {}
+
+
+async def test_backfill_runs_once(db, scheduler):
+    await db.bookings.insert_one({"id": "old", "status": "pending",
+                                  "preferred_date": "2030-01-15", "preferred_time": "10:00 AM"})
+    await scheduler.backfill(NOW)
+    assert await reminder_status(db, "old") == "pending"
+
+    await db.bookings.insert_one({"id": "older", "status": "pending",
+                                  "preferred_date": "2030-01-15", "preferred_time": "10:00 AM"})
+    await scheduler.backfill(NOW)
+    assert "reminder_status" not in await db.bookings.find_one({"id": "older"})
@@ -0,0 +1,88 @@
+"""Delta sync of the admin catalog (backend/catalog_sync.py)"""
+
+from datetime import datetime, timedelta, timezone
+
+from catalog_sync import catalog_write, changes_since, record_deletion, update_with_revision
+
+
+async def create(db, collection, doc_id, **fields):
+    async with catalog_write(db) as stamp:
+        await db[collection].insert_one({"id": doc_id, **fields, **stamp})
+
+
+def ids(result, collection="services") -> list:
+    return [doc["id"] for doc in result["changes"][collection]]
+
+
+async def test_since_zero_is_a_full_snapshot(db):
+    await db.services.insert_one({"id": "before-revisions"})
+    await create(db, "services", "s1")
+    await create(db, "prices", "p1")
+
+    result = await changes_since(db, 0)
+
+    assert result["full"] is True
+    assert result["revision"] == 2
+    assert sorted(ids(result)) == ["before-revisions", "s1"]
+    assert ids(result, "prices") == ["p1"]
+
+
+async def test_delta_has_only_later_writes_and_deletions(db):
+    await create(db, "services", "s1")
+    await create(db, "services", "s2")
+    since = (await changes_since(db, 0))["revision"]
+    await update_with_revision(db.services, {"id": "s1"}, {"title": "Lashes"})
+    await db.services.delete_one({"id": "s2"})
+    await record_deletion(db, "services", "s2")
+
+    result = await changes_since(db, since)
+
+    assert result["full"] is False
+    assert ids(result) == ["s1"]
+    assert result["deleted"]["services"] == ["s2"]
+    assert result["revision"] == since + 2
+    assert ids(await changes_since(db, result["revision"])) == []
+
+
+async def test_update_of_missing_document_uses_no_revision(db):
+    await create(db, "services", "s1")
+
+    assert await update_with_revision(db.services, {"id": "missing"}, {"title": "x"}) is False
+    assert (await changes_since(db, 0))["revision"] == 1
+
+
+async def test_write_in_flight_is_not_skipped(db):
+    since = (await changes_since(db, 0))["revision"]
+    async with catalog_write(db) as slow:
+        # A later write commits while the earlier one is still in flight
+        await create(db, "services", "fast")
+        during = await changes_since(db, since)
+        await db.services.insert_one({"id": "slow", **slow})
+
+    assert ids(during) == ["fast"]
+    assert during["revision"] == since
+    assert sorted(ids(await changes_since(db, during["revision"]))) == ["fast", "slow"]
+
+
+async def test_abandoned_write_marker_stops_holding_back(db):
+    await create(db, "services", "s1")
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    await db.catalog_writes.insert_one({"floor": 0, "started_at": long_ago})
+
+    assert (await changes_since(db, 0))["revision"] == 1
+
+
+async def test_pruned_tombstones_force_a_full_snapshot(db):
+    await create(db, "services", "s1")
+    await create(db, "services", "s2")
+    await db.services.delete_one({"id": "s1"})
+    await record_deletion(db, "services", "s1")
+    since = (await changes_since(db, 1))["revision"]
+    long_ago = datetime.now(timezone.utc) - timedelta(days=365)
+    await db.catalog_tombstones.update_many({}, {"$set": {"deleted_at": long_ago}})
+    await create(db, "services", "s3")
+    await db.services.delete_one({"id": "s2"})
+    await record_deletion(db, "services", "s2")
+
+    assert (await changes_since(db, 1))["full"] is True
+    assert (await changes_since(db, since))["full"] is False
@@ -0,0 +1,86 @@
+"""Idempotency-Key claims and replays (backend/idempotency.py)"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+import idempotency
+from idempotency import IdempotencyError, IdempotencyStore
+
+BOOKING = {"name": "Ada", "service": "Classic Lashes", "preferred_date": "2030-01-15"}
+RESPONSE = {"message": "Booking request submitted successfully", "booking_id": "b1", "sms_sent": False}
+
+
+async def test_first_request_runs_and_retries_get_its_response(db):
+    store = IdempotencyStore(db)
+
+    assert await store.begin("bookings.home", "key-1", BOOKING) is None
+    await store.complete("bookings.home", "key-1", RESPONSE, result_id="b1")
+
+    assert await store.begin("bookings.home", "key-1", BOOKING) == RESPONSE
+    assert await store.begin("bookings.home", "key-1", dict(BOOKING)) == RESPONSE
+
+
+async def test_same_key_with_another_body_is_rejected(db):
+    store = IdempotencyStore(db)
+    await store.begin("bookings.home", "key-1", BOOKING)
+
+    with pytest.raises(IdempotencyError) as error:
+        await store.begin("bookings.home", "key-1", {**BOOKING, "service": "Microblading"})
+    assert error.value.status_code == 422
+
+
+async def test_retry_while_processing_gets_409(db):
+    store = IdempotencyStore(db)
+    await store.begin("bookings.home", "key-1", BOOKING)
+
+    with pytest.raises(IdempotencyError) as error:
+        await store.begin("bookings.home", "key-1", BOOKING)
+    assert error.value.status_code == 409
+
+
+async def test_released_key_runs_again(db):
+    store = IdempotencyStore(db)
+    await store.begin("bookings.home", "key-1", BOOKING)
+    await store.release("bookings.home", "key-1")
+
+    assert await store.begin("bookings.home", "key-1", BOOKING) is None
+
+
+async def test_stale_claim_is_taken_over(db):
+    store = IdempotencyStore(db)
+    await store.begin("bookings.home", "key-1", BOOKING)
+    long_ago = datetime.now(timezone.utc) - timedelta(seconds=idempotency.IDEMPOTENCY_LOCK_SECONDS + 1)
+    await db.idempotency_keys.update_one({"_id": "bookings.home:key-1"}, {"$set": {"started_at": long_ago}})
+
+    assert await store.begin("bookings.home", "key-1", BOOKING) is None
+
+
+async def test_keys_are_scoped(db):
+    store = IdempotencyStore(db)
+    await store.begin("bookings.home", "key-1", BOOKING)
+
+    assert await store.begin("bookings.salon", "key-1", BOOKING) is None
+
+
+async def test_unstored_response_is_never_run_again(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_COMPLETE_ATTEMPTS", 2)
+    store = IdempotencyStore(db)
+    await store.begin("bookings.home", "key-1", BOOKING)
+    update_one = store.collection.update_one
+
+    async def rejects_responses(query, update):
+        if update["$set"]["status"] == "completed":
+            raise AutoReconnect("primary stepped down")
+        return await update_one(query, update)
+
+    monkeypatch.setattr(store.collection, "update_one", rejects_responses)
+    await store.complete("bookings.home", "key-1", RESPONSE, result_id="b1")
+
+    long_ago = datetime.now(timezone.utc) - timedelta(seconds=idempotency.IDEMPOTENCY_LOCK_SECONDS + 1)
+    await update_one({"_id": "bookings.home:key-1"}, {"$set": {"started_at": long_ago}})
+    with pytest.raises(IdempotencyError) as error:
+        await store.begin("bookings.home", "key-1", BOOKING)
+    assert error.value.status_code == 409
+    assert "b1" in error.value.detail